@@ -13,4 +13,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LO_analysis_project.settings')
 
+# The web tier never loads the spaCy model, tagging is left to the celery workers
+os.environ.setdefault('ANALYSIS_NLP_ROLE', 'web')
+
 application = get_asgi_application()
@@ -3,6 +3,7 @@ from __future__ import absolute_import, unicode_literals
 import os
 
 from celery import Celery
+from celery.signals import worker_init
 
 # Set the default Django settings module for the celery program.
 if os.environ.get('DJANGO_ENV') == 'production':
@@ -22,6 +23,14 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_init.connect
+def preload_nlp_model(**kwargs):
+    """ Load the spaCy model once in the worker parent process, before the pool is forked,
+    so that the prefork children share its memory pages copy-on-write """
+    from analyses.nlp import nlp_manager
+    nlp_manager.preload()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print('Request: {0!r}'.format(self.request))
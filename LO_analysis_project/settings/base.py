@@ -88,6 +88,27 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory by default, the production settings use Redis when REDIS_URL is set.
+# The 'analyses' cache is shared by the web and worker processes (the progress of the analysis runs,
+# their claims and the LO rate of the chunk tasks), so it is kept in the database by default
+# (created by python manage.py createcachetable) rather than in the memory of each process
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'charts': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'charts',
+    },
+    'analyses': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'analyses_cache',
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -165,7 +186,77 @@ AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
-
-
-
-
+# Analysis settings
+
+# Number of learning outcome texts sent through nlp.pipe at a time
+ANALYSIS_NLP_BATCH_SIZE = int(os.environ.get('ANALYSIS_NLP_BATCH_SIZE', 256))
+# Number of processes used by nlp.pipe. Keep at 1 inside prefork celery workers,
+# as their daemonic child processes are not allowed to fork
+ANALYSIS_NLP_N_PROCESS = int(os.environ.get('ANALYSIS_NLP_N_PROCESS', 1))
+
+# Components of the spaCy pipeline run by each profile (None runs every component).
+# The analysis only reads the text, lemma and part of speech of each token, so the dependency
+# parser and named entity recogniser are not needed. spaCy 2 models only have the 'tagger'
+# of the 'tagger' profile (lemmas are looked up from the tags), whereas spaCy 3 models also
+# need 'tok2vec', 'attribute_ruler' (coarse-grained POS) and 'lemmatizer'.
+ANALYSIS_NLP_PIPELINE_PROFILES = {
+        'full': None,
+        'tagger': ['tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer'],
+        }
+ANALYSIS_NLP_PIPELINE_PROFILE = os.environ.get('ANALYSIS_NLP_PIPELINE_PROFILE', 'tagger')
+
+# Maximum number of tagged LO texts kept in the parse cache (least recently used are evicted)
+ANALYSIS_PARSE_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_PARSE_CACHE_MAX_ENTRIES', 100000))
+
+# Maximum number of LOs tagged and matched by each LO chunk task of a run (0 analyses all the LOs
+# of a run in a single task). Used as the initial size in adaptive mode
+ANALYSIS_LO_CHUNK_SIZE = int(os.environ.get('ANALYSIS_LO_CHUNK_SIZE', 500))
+# Adaptive mode: target number of seconds of each LO chunk task, the chunk size following the LO
+# rate observed by the workers (0 keeps the chunk size fixed)
+ANALYSIS_LO_CHUNK_SECONDS = float(os.environ.get('ANALYSIS_LO_CHUNK_SECONDS', 0))
+# Bounds of the chunk size in adaptive mode
+ANALYSIS_LO_CHUNK_MIN_SIZE = int(os.environ.get('ANALYSIS_LO_CHUNK_MIN_SIZE', 50))
+ANALYSIS_LO_CHUNK_MAX_SIZE = int(os.environ.get('ANALYSIS_LO_CHUNK_MAX_SIZE', 5000))
+
+# Cache backend shared by the web and worker processes, which keeps the progress of the analysis runs
+ANALYSIS_CACHE_ALIAS = os.environ.get('ANALYSIS_CACHE_ALIAS', 'analyses')
+# Number of seconds the progress of an analysis run is kept in the cache
+ANALYSIS_PROGRESS_TIMEOUT = int(os.environ.get('ANALYSIS_PROGRESS_TIMEOUT', 60 * 60))
+# Number of seconds between two reads of the progress by a progress stream
+ANALYSIS_PROGRESS_STREAM_INTERVAL = float(os.environ.get('ANALYSIS_PROGRESS_STREAM_INTERVAL', 0.5))
+# Maximum number of seconds a progress stream is kept open (and a web worker busy) before the
+# browser reconnects
+ANALYSIS_PROGRESS_STREAM_TIMEOUT = int(os.environ.get('ANALYSIS_PROGRESS_STREAM_TIMEOUT', 30))
+
+# Task result settings
+
+# Number of seconds the results of celery tasks are kept in the results table. Only the tasks whose
+# results are read (LO chunks, gathered by a chord, and the final callback of an analysis run,
+# whose status is polled) store them
+TASK_RESULT_TTL = int(os.environ.get('TASK_RESULT_TTL', 24 * 60 * 60))
+# Number of results deleted by each query when the table is pruned
+TASK_RESULT_PRUNE_BATCH_SIZE = int(os.environ.get('TASK_RESULT_PRUNE_BATCH_SIZE', 1000))
+# Number of seconds between two prunings of the table by celery beat
+TASK_RESULT_PRUNE_INTERVAL = int(os.environ.get('TASK_RESULT_PRUNE_INTERVAL', 60 * 60))
+
+CELERY_BEAT_SCHEDULE = {
+        'prune-task-results': {
+            'task': 'utils.tasks.prune_task_results',
+            'schedule': TASK_RESULT_PRUNE_INTERVAL,
+            },
+        }
+# The results are pruned in batches by the task above, rather than by the daily cleanup task of
+# celery beat, which deletes all the expired results in one query
+CELERY_RESULT_EXPIRES = None
+
+# Taxonomy settings
+
+# Number of seconds the statistics snapshot of a taxonomy version is kept in the cache
+TAXONOMY_STATS_CACHE_TIMEOUT = int(os.environ.get('TAXONOMY_STATS_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Chart settings
+
+# Cache backend of the JSON data of the curriculum and taxonomy chart views
+CHART_CACHE_ALIAS = os.environ.get('CHART_CACHE_ALIAS', 'charts')
+# Number of seconds chart data is kept in the cache (entries are also invalidated when their data changes)
+CHART_CACHE_TIMEOUT = int(os.environ.get('CHART_CACHE_TIMEOUT', 7 * 24 * 60 * 60))
@@ -19,6 +19,18 @@ FIXTURE_DIRS = [
 
 
 
+# Cache settings
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        alias: {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+            'KEY_PREFIX': alias,
+        }
+        for alias in ('default', 'charts', 'analyses')
+    }
+
+
 # Celery settings
 CELERY_BROKER_URL = os.environ.get('CLOUDAMQP_URL')
 BROKER_POOL_LIMIT = 1
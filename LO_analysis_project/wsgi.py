@@ -16,4 +16,7 @@ if os.environ.get('DJANGO_ENV') == 'production':
 else:
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LO_analysis_project.settings.development')
 
+# The web tier never loads the spaCy model, tagging is left to the celery workers
+os.environ.setdefault('ANALYSIS_NLP_ROLE', 'web')
+
 application = get_wsgi_application()
@@ -1,15 +1,46 @@
 from django.contrib import admin
 
 from .models import (
+        AnalysisRun,
+        AnalysisSummary,
         CurriculumAnalysis,
         StrandAnalysis,
         LearningOutcomeAnalysis,
-        LearningOutcomeCategoryHitCount,
+        SharedAnalysisResult,
         StrandCategoryHitCount,
+        TaggedText,
         )
 
+
+class AnalysisRunAdmin(admin.ModelAdmin):
+    model = AnalysisRun
+    list_display = ('curriculum_analysis', 'date_created', 'incremental', 'num_reused_learning_outcomes', 'num_recomputed_learning_outcomes', 'num_recomputed_strands')
+
+
+class AnalysisSummaryAdmin(admin.ModelAdmin):
+    model = AnalysisSummary
+    list_display = ('curriculum_analysis', 'date_updated')
+    readonly_fields = ('curriculum_analysis', 'date_updated', 'document')
+
+
+class TaggedTextAdmin(admin.ModelAdmin):
+    model = TaggedText
+    list_display = ('text_hash', 'model', 'hit_count', 'last_used')
+    readonly_fields = ('text_hash', 'model', 'tokens', 'hit_count', 'last_used')
+
+
+class SharedAnalysisResultAdmin(admin.ModelAdmin):
+    model = SharedAnalysisResult
+    list_display = ('curriculum_content_hash', 'taxonomy_content_hash', 'model', 'hit_count', 'date_created', 'last_used')
+    readonly_fields = ('curriculum_content_hash', 'taxonomy_content_hash', 'model', 'document', 'hit_count', 'date_created', 'last_used')
+    ordering = ('-hit_count',)
+
+
 admin.site.register(CurriculumAnalysis)
 admin.site.register(StrandAnalysis)
 admin.site.register(LearningOutcomeAnalysis)
-admin.site.register(LearningOutcomeCategoryHitCount)
 admin.site.register(StrandCategoryHitCount)
+admin.site.register(TaggedText, TaggedTextAdmin)
+admin.site.register(AnalysisRun, AnalysisRunAdmin)
+admin.site.register(AnalysisSummary, AnalysisSummaryAdmin)
+admin.site.register(SharedAnalysisResult, SharedAnalysisResultAdmin)
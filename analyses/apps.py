@@ -6,3 +6,4 @@ class AnalysesConfig(AppConfig):
 
     def ready(self):
         import analyses.signals
+        import analyses.checks
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_analysis_cache(app_configs, **kwargs):
+    """ Warns if the analysis cache is kept in the memory of each process, where the progress and
+    claims of the runs written by the workers never reach the web process """
+    backend = settings.CACHES.get(settings.ANALYSIS_CACHE_ALIAS, {}).get('BACKEND', '')
+    if backend.endswith(('LocMemCache', 'DummyCache')):
+        return [Warning(
+                f"The '{settings.ANALYSIS_CACHE_ALIAS}' cache backend ({backend}) is not shared across processes",
+                hint='Use a Redis, database or file based cache backend, so that the progress of analysis runs reaches the web process',
+                id='analyses.W001',
+                )]
+    return []
@@ -0,0 +1,58 @@
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LearningOutcomeChunker:
+    """
+
+    A class to split the LOs of an analysis run into the chunks tagged and matched by LO chunk tasks,
+    so that a large run costs one task message (and result) per chunk rather than per LO.
+    The chunk size is fixed (ANALYSIS_LO_CHUNK_SIZE) or, in adaptive mode (ANALYSIS_LO_CHUNK_SECONDS
+    set), the number of LOs analysed in ANALYSIS_LO_CHUNK_SECONDS at the LO rate observed by the
+    workers, within ANALYSIS_LO_CHUNK_MIN_SIZE and ANALYSIS_LO_CHUNK_MAX_SIZE.
+    The observed rate is a moving average of the rates of the chunk tasks, kept in the analysis cache
+    (ANALYSIS_CACHE_ALIAS) so that the planning task sees the rates measured by the other workers.
+    A chunk size of 0 disables chunking.
+
+    """
+    rate_key = 'analysis-lo-chunk-rate'
+    # Weight of the rate of the last chunk in the moving average
+    smoothing = 0.3
+
+    @property
+    def cache(self):
+        return caches[settings.ANALYSIS_CACHE_ALIAS]
+
+    def get_rate(self):
+        """ Returns the observed number of LOs analysed per second, or None if no chunk was analysed yet """
+        return self.cache.get(self.rate_key)
+
+    def record(self, num_learning_outcomes, seconds):
+        """ Adds the rate of an analysed chunk to the observed rate """
+        if not num_learning_outcomes or seconds <= 0:
+            return
+        rate = num_learning_outcomes / seconds
+        previous_rate = self.get_rate()
+        if previous_rate is not None:
+            rate = self.smoothing * rate + (1 - self.smoothing) * previous_rate
+        self.cache.set(self.rate_key, rate, None)
+
+    def get_chunk_size(self):
+        """ Returns the maximum number of LOs of a chunk (0 if chunking is disabled) """
+        rate = self.get_rate()
+        if settings.ANALYSIS_LO_CHUNK_SIZE == 0 or not settings.ANALYSIS_LO_CHUNK_SECONDS or rate is None:
+            return settings.ANALYSIS_LO_CHUNK_SIZE
+        chunk_size = round(rate * settings.ANALYSIS_LO_CHUNK_SECONDS)
+        return min(max(chunk_size, settings.ANALYSIS_LO_CHUNK_MIN_SIZE), settings.ANALYSIS_LO_CHUNK_MAX_SIZE)
+
+    def split(self, items):
+        """ Splits a list into chunks of similar sizes, no larger than the chunk size. A list no larger
+        than the chunk size (or any list if chunking is disabled) is kept as a single chunk """
+        chunk_size = self.get_chunk_size()
+        if chunk_size == 0 or len(items) <= chunk_size:
+            return [items] if items else []
+        num_chunks = math.ceil(len(items) / chunk_size)
+        bounds = [round(index * len(items) / num_chunks) for index in range(num_chunks + 1)]
+        return [items[start:end] for start, end in zip(bounds, bounds[1:])]
@@ -0,0 +1,302 @@
+import contextlib
+import functools
+import hashlib
+import time
+
+from django.db import transaction
+
+from learning_outcomes.models import LearningOutcome
+from utils.slugs import unique_slugify_batch
+
+from .lexicon import TaxonomyLexicon
+from .matrix import HitMatrix
+from .nlp import nlp_manager
+from .progress import AnalysisProgress
+from .models import (
+        AnalysisRun,
+        CurriculumAnalysis,
+        SharedAnalysisResult,
+        StrandAnalysis,
+        LearningOutcomeAnalysis,
+        StrandCategoryHitCount,
+        StrandCategoryDiversity,
+        StrandAverage,
+        TaggedText,
+        )
+
+
+class StrandUpdate:
+    """
+
+    A class to represent the changes to the LOs of a strand since its previous analysis.
+    The LOs are identified by the hash of their normalised text: an LO whose previous analysis was
+    made on the same text reuses it, all other LOs of the strand are recomputed.
+
+    """
+    def __init__(self, strand_analysis, los, previous_lo_analyses):
+        self.strand_analysis = strand_analysis
+        self.los = los
+        self.text_hashes = [TaggedText.get_text_hash(TaggedText.normalise(lo.text)) for lo in los]
+        indexed_text_hashes = ''.join(f"{lo.index}:{text_hash}\n" for lo, text_hash in zip(los, self.text_hashes))
+        self.text_hash = hashlib.sha256(indexed_text_hashes.encode('utf-8')).hexdigest()
+        self.reused = {}        # {position of the LO in the strand: previous LO analysis}
+        for position, (lo, text_hash) in enumerate(zip(los, self.text_hashes)):
+            lo_analysis = previous_lo_analyses.get(lo.pk)
+            if lo_analysis is not None and lo_analysis.text_hash == text_hash:
+                self.reused[position] = lo_analysis
+        self.recomputed = [position for position in range(len(los)) if position not in self.reused]
+
+    def is_changed(self):
+        """ Returns True if LOs of the strand were added, changed, moved or removed since its previous analysis """
+        return self.strand_analysis.text_hash != self.text_hash
+
+
+class AnalysisEngine:
+    """
+
+    A class to run the analysis of a curriculum within a taxonomy in a single pass.
+    The LOs of all strands are tagged together and matched against the compiled taxonomy
+    lexicon into one LO x category hit matrix, from which the strand hit counts, category
+    diversities and averages are derived. All the results, and the summary from which the charts
+    of the analysis are served, are then written in one transaction, rather than each analysis
+    stage re-reading the LO hit counts from the database.
+    In incremental mode, only the LOs which are new or changed since the previous run are tagged
+    and matched, and only the analyses of the strands with such changes are recomputed.
+    The LO results of public curricula within public taxonomies are shared across analyses of the
+    same content, which copy them rather than tag and match their LOs.
+    The number of LOs processed by each stage is reported to the progress of the run.
+    The tagging and matching of large runs can be split into chunks of LOs, analysed by separate
+    tasks, whose matches are then saved by the run. The start and end timestamps of each stage,
+    across all the tasks of the run, are recorded on the run.
+
+    """
+    def __init__(self, curriculum_analysis):
+        self.curriculum_analysis = curriculum_analysis
+        self.lexicon = TaxonomyLexicon.get(curriculum_analysis.get_taxonomy())
+        self.progress = AnalysisProgress(curriculum_analysis.pk)
+        self.stages = {}        # {stage name: [start, end] POSIX timestamps}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ Records the start and end timestamps of a stage of the run """
+        start = time.time()
+        yield
+        self.add_stage(name, start, time.time())
+
+    def add_stage(self, name, start, end):
+        """ Adds the timestamps of a stage, e.g. run by another task, to those already recorded """
+        if name in self.stages:
+            start, end = min(start, self.stages[name][0]), max(end, self.stages[name][1])
+        self.stages[name] = [start, end]
+
+    def is_incremental(self, incremental):
+        """ Returns True if an incremental run is requested and possible: the analysis was run before,
+        within the current version and content of its taxonomy. The content hash also tells apart the
+        taxonomies of an analysis switched to another taxonomy, whose versions are counted separately """
+        previous_run = self.curriculum_analysis.get_latest_run()
+        return (
+                incremental
+                and previous_run is not None
+                and previous_run.taxonomy_version == self.lexicon.version
+                and previous_run.taxonomy_content_hash == self.lexicon.get_content_hash()
+                )
+
+    def get_updates(self, incremental):
+        """ Returns the updates of the strands of the curriculum. A full run replaces any previous results """
+        if incremental:
+            strand_analyses = self.curriculum_analysis.get_or_create_strand_analyses()
+            lo_analyses = LearningOutcomeAnalysis.objects.filter(strand_analysis__curriculum_analysis=self.curriculum_analysis)
+            previous_lo_analyses = {lo_analysis.learning_outcome_id: lo_analysis for lo_analysis in lo_analyses}
+        else:
+            strand_analyses = self.curriculum_analysis.initialise()
+            previous_lo_analyses = {}
+        return [StrandUpdate(strand_analysis, list(strand_analysis.strand.learning_outcomes.all()), previous_lo_analyses) for strand_analysis in strand_analyses]
+
+    def start_progress(self, changed_updates):
+        """ Starts the progress of a run, given the updates of the strands it recomputes """
+        num_recomputed_los = sum(len(update.recomputed) for update in changed_updates)
+        self.progress.start({
+                'tagging': num_recomputed_los,
+                'matching': num_recomputed_los,
+                'saving': sum(len(update.los) for update in changed_updates),
+                })
+
+    def prepare(self, incremental=False):
+        """ Starts the progress of a run whose LOs are tagged and matched by LO chunk tasks, and returns
+        the LOs to match. Unlike a run, it leaves any previous results of a full run in place """
+        if self.is_incremental(incremental):
+            changed_updates = [update for update in self.get_updates(True) if update.is_changed()]
+            self.start_progress(changed_updates)
+            los = [update.los[position] for update in changed_updates for position in update.recomputed]
+        else:
+            los = list(LearningOutcome.objects.filter(strand__curriculum_id=self.curriculum_analysis.curriculum_id))
+            self.progress.start({'tagging': len(los), 'matching': len(los), 'saving': len(los)})
+        # The results of a public content analysed before are copied from the shared results by the run
+        if los and self.is_shared() and self.get_shared_result(self.curriculum_analysis.get_curriculum_content_hash()) is not None:
+            return []
+        return los
+
+    def is_shared(self):
+        """ Returns True if the results of the analysis are shared: its curriculum and taxonomy are public """
+        return self.curriculum_analysis.get_curriculum().public and self.curriculum_analysis.get_taxonomy().public
+
+    def get_shared_result(self, curriculum_content_hash):
+        """ Returns the shared results of the content of the curriculum within the taxonomy, None if the
+        content was not analysed before. Only shared analyses (see is_shared) read them """
+        return SharedAnalysisResult.objects.filter(
+                curriculum_content_hash=curriculum_content_hash,
+                taxonomy_content_hash=self.lexicon.get_content_hash(),
+                model=nlp_manager.get_model_id(),
+                ).first()
+
+    def get_strand_results(self, updates, matches):
+        """ Returns the [index, hit counts, non-categorised verbs] of the LOs of each strand (ordered by
+        primary key), from their reused analyses and the matches of the run """
+        strand_results = []
+        for update in sorted(updates, key=lambda update: update.strand_analysis.strand_id):
+            results = []
+            for position, lo in enumerate(update.los):
+                lo_analysis = update.reused.get(position)
+                if lo_analysis is not None:
+                    hit_counts = LearningOutcomeAnalysis.unpack_hit_counts(lo_analysis.hit_counts, len(self.lexicon))
+                    non_cat_verbs = lo_analysis.get_non_cat_verbs()
+                else:
+                    text_hash, hit_counts, non_cat_verbs = matches[lo.pk]
+                results.append([lo.index, hit_counts, list(dict.fromkeys(non_cat_verbs))])
+            strand_results.append(results)
+        return strand_results
+
+    def run(self, incremental=False, matches=None):
+        """ Runs the analysis of the curriculum and returns the summary of the run. A full run replaces
+        any previous results. An incremental run falls back to a full run if the analysis was never run,
+        or if the taxonomy has changed since the previous run.
+        matches holds the results of LOs matched beforehand by LO chunk tasks (whose progress was
+        started by prepare), as returned by match_learning_outcomes. The LOs missing from it, or whose
+        text has changed since, are tagged and matched by the run """
+        # The planning of a run whose LOs were matched by chunk tasks is recorded by the task which
+        # dispatched them
+        with self.stage('planning') if matches is None else contextlib.nullcontext():
+            incremental = self.is_incremental(incremental)
+            updates = self.get_updates(incremental)
+            changed_updates = [update for update in updates if update.is_changed()]
+        if matches is None:
+            self.start_progress(changed_updates)
+            matches = {}
+        strands = [update.los for update in sorted(updates, key=lambda update: update.strand_analysis.strand_id)]
+        curriculum_content_hash = CurriculumAnalysis.hash_curriculum_content([[(lo.index, lo.text) for lo in los] for los in strands])
+        recomputed = [(update.los[position], update.text_hashes[position]) for update in changed_updates for position in update.recomputed]
+        missing_los = [lo for lo, text_hash in recomputed if lo.pk not in matches or matches[lo.pk][0] != text_hash]
+        # The LOs of a public content analysed before are copied from the shared results rather than tagged
+        shared_result = self.get_shared_result(curriculum_content_hash) if missing_los and self.is_shared() else None
+        if shared_result is not None:
+            matches = {**matches, **shared_result.get_matches(strands)}
+            self.progress.advance('tagging', len(missing_los))
+            self.progress.advance('matching', len(missing_los))
+        elif missing_los:
+            matches = {**matches, **self.match_learning_outcomes(missing_los)}
+        hit_matrix = HitMatrix([matches[lo.pk][1] for lo, text_hash in recomputed], len(self.lexicon))
+        non_cat_verbs = [matches[lo.pk][2] for lo, text_hash in recomputed]
+        run = AnalysisRun(
+                curriculum_analysis=self.curriculum_analysis,
+                fingerprint=self.curriculum_analysis.get_fingerprint(curriculum_content_hash),
+                incremental=incremental,
+                taxonomy_version=self.lexicon.version,
+                taxonomy_content_hash=self.lexicon.get_content_hash(),
+                num_reused_learning_outcomes=sum(len(update.los) for update in updates) - len(recomputed),
+                num_recomputed_learning_outcomes=len(recomputed),
+                num_recomputed_strands=len(changed_updates),
+                )
+        with transaction.atomic():
+            with self.stage('saving'):
+                start = 0
+                for update in changed_updates:
+                    end = start + len(update.recomputed)
+                    self.save_strand_update(update, hit_matrix[start:end], non_cat_verbs[start:end])
+                    self.progress.advance('saving', len(update.los))
+                    start = end
+                if changed_updates:
+                    self.curriculum_analysis.set_non_cat_verbs(self.get_non_cat_verbs())
+            run.set_stages(self.stages)
+            run.save()
+            self.curriculum_analysis.write_summary()
+            if shared_result is not None:
+                shared_result.record_hit()
+            elif recomputed and self.is_shared():
+                SharedAnalysisResult.store(curriculum_content_hash, self.lexicon.get_content_hash(), self.get_strand_results(updates, matches))
+        self.progress.finish()
+        return run
+
+    def match_learning_outcomes(self, los):
+        """ Tags and matches a list of LOs. Returns a dictionary mapping the primary key of each LO to
+        the hash of its normalised text, its category hit counts and its non-categorised verbs """
+        with self.stage('tagging'):
+            tagged_texts = TaggedText.tag_texts([lo.text for lo in los], progress=functools.partial(self.progress.advance, 'tagging'))
+        with self.stage('matching'):
+            hit_matrix, non_cat_verbs = self.match(tagged_texts)
+        return {
+                lo.pk: (TaggedText.get_text_hash(TaggedText.normalise(lo.text)), lo_hit_counts, lo_non_cat_verbs)
+                for lo, lo_hit_counts, lo_non_cat_verbs in zip(los, hit_matrix.matrix.tolist(), non_cat_verbs)
+                }
+
+    def match(self, tagged_texts):
+        """ Matches a list of tagged texts against the taxonomy lexicon. Returns their hit matrix
+        and, for each text, the list of detected verbs which are not categorised in the taxonomy """
+        hit_counts = []
+        non_cat_verbs = []
+        for tokens in tagged_texts:
+            lo_hit_counts, lo_non_cat_verbs = self.lexicon.match(tokens)
+            hit_counts.append(lo_hit_counts)
+            non_cat_verbs.append(lo_non_cat_verbs)
+        self.progress.advance('matching', len(hit_counts))
+        return HitMatrix(hit_counts, len(self.lexicon)), non_cat_verbs
+
+    def get_non_cat_verbs(self):
+        """ Returns the non-categorised verbs detected in the LOs of the curriculum """
+        non_cat_verb_lists = LearningOutcomeAnalysis.objects.filter(strand_analysis__curriculum_analysis=self.curriculum_analysis).order_by('pk').values_list('non_cat_verb_list', flat=True)
+        return [verb for non_cat_verb_list in non_cat_verb_lists for verb in non_cat_verb_list.split(', ') if verb]
+
+    def save_strand_update(self, update, hit_matrix, non_cat_verbs):
+        """ Saves the LO analyses of a changed strand, with the results of its recomputed LOs, and
+        recomputes the analyses of the strand """
+        strand_analysis = update.strand_analysis
+        reused_lo_analyses = list(update.reused.values())
+        strand_analysis.learning_outcome_analyses.exclude(pk__in=[lo_analysis.pk for lo_analysis in reused_lo_analyses]).delete()
+        hit_counts = [None] * len(update.los)
+        moved_lo_analyses = []
+        for position, lo_analysis in update.reused.items():
+            hit_counts[position] = LearningOutcomeAnalysis.unpack_hit_counts(lo_analysis.hit_counts, len(self.lexicon))
+            if lo_analysis.index != update.los[position].index:
+                lo_analysis.index = update.los[position].index
+                moved_lo_analyses.append(lo_analysis)
+        LearningOutcomeAnalysis.objects.bulk_update(moved_lo_analyses, ['index'])
+        new_lo_analyses = []
+        for position, lo_hit_counts, lo_non_cat_verbs in zip(update.recomputed, hit_matrix.matrix.tolist(), non_cat_verbs):
+            lo = update.los[position]
+            new_lo_analyses.append(LearningOutcomeAnalysis(
+                    index=lo.index,
+                    strand_analysis=strand_analysis,
+                    learning_outcome=lo,
+                    hit_counts=LearningOutcomeAnalysis.pack_hit_counts(lo_hit_counts),
+                    text_hash=update.text_hashes[position],
+                    non_cat_verb_list=', '.join(dict.fromkeys(lo_non_cat_verbs)),
+                    ))
+            hit_counts[position] = lo_hit_counts
+        unique_slugify_batch(new_lo_analyses, [f"{strand_analysis.strand.title} {lo_analysis.index}" for lo_analysis in new_lo_analyses])
+        LearningOutcomeAnalysis.objects.bulk_create(new_lo_analyses)
+        self.save_strand_analysis(strand_analysis, HitMatrix(hit_counts, len(self.lexicon)))
+        StrandAnalysis.objects.filter(pk=strand_analysis.pk).update(text_hash=update.text_hash)
+
+    def save_strand_analysis(self, strand_analysis, hit_matrix):
+        """ Replaces the category hit counts, category diversities and averages of a strand """
+        strand_analysis.strand_category_hit_counts.all().delete()
+        strand_analysis.strand_category_diversities.all().delete()
+        StrandAverage.objects.filter(strand_analysis=strand_analysis).delete()
+        StrandCategoryHitCount.objects.bulk_create([
+                StrandCategoryHitCount(category=category, hit_count=hit_count, strand_analysis=strand_analysis)
+                for category, hit_count in zip(self.lexicon.categories, hit_matrix.get_category_hit_counts())
+                ])
+        StrandCategoryDiversity.objects.bulk_create([
+                StrandCategoryDiversity(num_categories=num_categories, num_learning_outcomes=num_los, strand_analysis=strand_analysis)
+                for num_categories, num_los in enumerate(hit_matrix.get_category_diversities())
+                ])
+        StrandAverage.objects.create(strand_analysis=strand_analysis, verbs=hit_matrix.get_verb_average(), categories=hit_matrix.get_category_average())
@@ -0,0 +1,90 @@
+import hashlib
+import json
+
+from verbs.models import Verb, NonVerb
+
+
+class TaxonomyLexicon:
+    """
+
+    A class to represent the verbs and allowed non-verbs of a taxonomy compiled into memory, so that
+    the tokens of a learning outcome can be matched against the taxonomy without database queries.
+    Each verb (by lemma) and allowed non-verb (by surface form) maps to a bitmask of the indices
+    of its verb categories, the categories being ordered by level of abstraction.
+    A lexicon is built once per taxonomy version and shared across the tasks of a worker process.
+
+    """
+    # Compiled lexicons of the current process, keyed by taxonomy primary key
+    compiled = {}
+
+    def __init__(self, taxonomy_pk, version, categories, verbs, non_verbs):
+        self.taxonomy_pk = taxonomy_pk
+        self.version = version
+        self.categories = categories    # Category titles ordered by level
+        self.verbs = verbs              # {lemma: category bitmask}
+        self.non_verbs = non_verbs      # {text: category bitmask}
+
+    def __len__(self):
+        return len(self.categories)
+
+    @classmethod
+    def get(cls, taxonomy):
+        """ Returns the compiled lexicon of a taxonomy, compiling it if the process has no lexicon
+        for the current version of the taxonomy """
+        lexicon = cls.compiled.get(taxonomy.pk)
+        if lexicon is None or lexicon.version != taxonomy.version:
+            lexicon = cls.build(taxonomy)
+            cls.compiled[taxonomy.pk] = lexicon
+        return lexicon
+
+    @classmethod
+    def build(cls, taxonomy):
+        """ Compiles the lexicon of a taxonomy from its verb categories, verbs and non-verbs """
+        categories = list(taxonomy.verb_categories.order_by('level').values_list('pk', 'title'))
+        bits = {category_pk: 1 << index for index, (category_pk, title) in enumerate(categories)}
+        verb_memberships = Verb.verb_categories.through.objects.filter(verbcategory__taxonomy=taxonomy).values_list('verb__title', 'verbcategory_id')
+        non_verb_memberships = NonVerb.verb_categories.through.objects.filter(verbcategory__taxonomy=taxonomy).values_list('nonverb__title', 'verbcategory_id')
+        return cls(
+                taxonomy_pk=taxonomy.pk,
+                version=taxonomy.version,
+                categories=[title for category_pk, title in categories],
+                verbs=cls.compile_masks(verb_memberships, bits),
+                non_verbs=cls.compile_masks(non_verb_memberships, bits),
+                )
+
+    @staticmethod
+    def compile_masks(memberships, bits):
+        """ Returns a dictionary mapping each title to the bitmask of its categories """
+        masks = {}
+        for title, category_pk in memberships:
+            masks[title] = masks.get(title, 0) | bits[category_pk]
+        return masks
+
+    def get_content_hash(self):
+        """ Returns the sha256 hash of the categories of the taxonomy and of the category memberships of
+        its verbs and non-verbs, which only changes when the matches of the taxonomy may change """
+        if not hasattr(self, '_content_hash'):
+            content = json.dumps([self.categories, sorted(self.verbs.items()), sorted(self.non_verbs.items())])
+            self._content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return self._content_hash
+
+    def match(self, tokens):
+        """ Matches a list of tagged (text, lemma, pos) tokens against the lexicon.
+        Returns the number of hits of each category (ordered by level) and the list of
+        detected verbs which are not categorised in the taxonomy """
+        hit_counts = [0] * len(self.categories)
+        non_cat_verbs = []
+        for text, lemma, pos in tokens:
+            if pos == "VERB":
+                mask = self.verbs.get(lemma, 0)
+                if not mask:
+                    non_cat_verbs.append(lemma)
+            else:
+                mask = self.non_verbs.get(text, 0)
+            index = 0
+            while mask:
+                if mask & 1:
+                    hit_counts[index] += 1
+                mask >>= 1
+                index += 1
+        return hit_counts, non_cat_verbs
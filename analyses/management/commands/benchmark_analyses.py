@@ -0,0 +1,286 @@
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from celery.signals import task_prerun
+
+from curricula.models import Curriculum
+from learning_outcomes.models import LearningOutcome
+from taxonomies.models import CustomUserTaxonomy as Taxonomy
+from analyses.chunks import LearningOutcomeChunker
+from analyses.engine import AnalysisEngine
+from analyses.models import CurriculumAnalysis, TaggedText
+from analyses.nlp import NLPModelManager, nlp_manager, tag_text, tag_texts
+from analyses.tasks import analyse_curriculum
+from LO_analysis_project.celery import app
+from utils.slugs import unique_slugify_batch
+from verbs.models import NonCatVerb
+
+# Script run in a fresh interpreter to measure the startup of a web or worker process
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+if sys.argv[1] == 'web':
+    from LO_analysis_project.wsgi import application
+else:
+    import django
+    django.setup()
+    from analyses.nlp import nlp_manager
+    nlp_manager.preload()
+from analyses.nlp import nlp_manager
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'model_loaded': nlp_manager.is_loaded(),
+    }))
+"""
+
+
+class Command(BaseCommand):
+    """
+
+    Benchmarks the stages of the curriculum analysis pipeline, e.g.
+        python manage.py benchmark_analyses tagging --curriculum 1 --repeat 20
+
+    """
+    help = 'Benchmarks the stages of the curriculum analysis pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=self.get_benchmarks().keys())
+        parser.add_argument('--curriculum', type=int, default=None, help='Primary key of the curriculum whose LOs are used (default: all LOs)')
+        parser.add_argument('--repeat', type=int, default=1, help='Number of times the LO texts are repeated')
+        parser.add_argument('--batch-size', type=int, default=settings.ANALYSIS_NLP_BATCH_SIZE)
+        parser.add_argument('--n-process', type=int, default=settings.ANALYSIS_NLP_N_PROCESS)
+        parser.add_argument('--taxonomy', type=int, default=None, help='Primary key of the taxonomy of the analysis (default: first taxonomy)')
+        parser.add_argument('--rows', type=int, default=5000, help='Number of rows created by the slugs benchmark')
+        parser.add_argument('--chunk-sizes', default='0,10,50,200,adaptive', help='Comma separated LO chunk sizes compared by the chunks benchmark (0: no chunking)')
+        parser.add_argument('--chunk-seconds', type=float, default=settings.ANALYSIS_LO_CHUNK_SECONDS or 1, help='Target seconds per chunk of the adaptive chunk size')
+
+    def get_benchmarks(self):
+        """ Returns a dictionary mapping benchmark names to their methods """
+        return {
+                'tagging': self.benchmark_tagging,
+                'startup': self.benchmark_startup,
+                'pipeline': self.benchmark_pipeline,
+                'engine': self.benchmark_engine,
+                'storage': self.benchmark_storage,
+                'incremental': self.benchmark_incremental,
+                'slugs': self.benchmark_slugs,
+                'chunks': self.benchmark_chunks,
+                }
+
+    def handle(self, *args, **options):
+        self.get_benchmarks()[options['benchmark']](**options)
+
+    def get_learning_outcome_texts(self, curriculum=None, repeat=1, **kwargs):
+        """ Returns the LO texts of a curriculum (or of all curricula) repeated a number of times """
+        los = LearningOutcome.objects.all()
+        if curriculum is not None:
+            los = los.filter(strand__curriculum__pk=curriculum)
+        texts = [lo.text for lo in los] * repeat
+        if not texts:
+            raise CommandError('No learning outcomes to benchmark')
+        return texts
+
+    def report(self, label, num_los, seconds):
+        """ Writes the LO throughput of a benchmarked stage """
+        self.stdout.write(f"{label:<40} {num_los:>7} LOs {seconds:>9.3f} s {num_los / seconds:>10.1f} LOs/s")
+
+    def benchmark_tagging(self, batch_size, n_process, **options):
+        """ Compares the LO throughput of one nlp call per LO with batched nlp.pipe tagging """
+        texts = self.get_learning_outcome_texts(**options)
+        tag_text(texts[0])  # Warm up the pipeline
+
+        start = time.perf_counter()
+        for text in texts:
+            tag_text(text)
+        self.report('nlp(text) per LO', len(texts), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        tag_texts(texts, batch_size=batch_size, n_process=n_process)
+        self.report(f'nlp.pipe (batch={batch_size}, n_process={n_process})', len(texts), time.perf_counter() - start)
+
+    def benchmark_startup(self, **options):
+        """ Measures the startup time and peak RSS of a web process (which never loads the
+        spaCy model) and of a worker parent process (which preloads it before forking) """
+        for role in ('web', 'worker'):
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+            env.pop('ANALYSIS_NLP_ROLE', None)
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, role], env=env,
+                    cwd=settings.BASE_DIR, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            self.stdout.write(f"{role:<8} startup {result['seconds']:>7.3f} s  max RSS {result['max_rss_kb'] / 1024:>8.1f} MiB  model loaded: {result['model_loaded']}")
+
+    def benchmark_pipeline(self, batch_size, n_process, **options):
+        """ Compares the per-LO tagging latency of the full spaCy pipeline with the configured
+        pipeline profile, checking that both give identical tokens """
+        texts = self.get_learning_outcome_texts(**options)
+        results = []
+        for profile in ('full', settings.ANALYSIS_NLP_PIPELINE_PROFILE):
+            manager = NLPModelManager(profile=profile)
+            tag_text(texts[0], manager=manager)  # Load and warm up the pipeline
+            start = time.perf_counter()
+            results.append(tag_texts(texts, batch_size=batch_size, n_process=n_process, manager=manager))
+            seconds = time.perf_counter() - start
+            components = ', '.join(manager.load().pipe_names)
+            self.stdout.write(f"{profile:<8} {seconds / len(texts) * 1000:>8.3f} ms/LO  components: {components}")
+        self.stdout.write(f"Identical tokens: {results[0] == results[1]}")
+
+    def benchmark_engine(self, curriculum, taxonomy, **options):
+        """ Compares the four analysis stages, each reading the results of the previous one from the
+        database, with the single pass analysis engine. Nothing is kept in the database """
+        curriculum, taxonomy = self.get_curriculum_and_taxonomy(curriculum, taxonomy)
+        num_los = curriculum.get_num_learning_outcomes()
+        with self.tagged_learning_outcomes(curriculum):
+            self.run_analysis(curriculum, taxonomy, self.run_analysis_stages, 'Analysis stages', num_los)
+            self.run_analysis(curriculum, taxonomy, lambda analysis: AnalysisEngine(analysis).run(), 'Analysis engine', num_los)
+
+    def benchmark_storage(self, curriculum, taxonomy, repeat, **options):
+        """ Measures the number of rows stored by a number of analyses of a curriculum, and the time
+        taken to delete them. Nothing is kept in the database """
+        curriculum, taxonomy = self.get_curriculum_and_taxonomy(curriculum, taxonomy)
+        analysis_models = list(apps.get_app_config('analyses').get_models())
+        with transaction.atomic():
+            num_rows = {model: model.objects.count() for model in analysis_models}
+            analyses = [CurriculumAnalysis.objects.create(title='benchmark', curriculum=curriculum, taxonomy=taxonomy) for _ in range(repeat)]
+            for analysis in analyses:
+                AnalysisEngine(analysis).run()
+            for model in analysis_models:
+                self.stdout.write(f"{model.__name__:<40} {model.objects.count() - num_rows[model]:>7} rows")
+            start = time.perf_counter()
+            for analysis in analyses:
+                analysis.delete()
+            self.stdout.write(f"Deleted {repeat} analyses in {time.perf_counter() - start:.3f} s")
+            transaction.set_rollback(True)
+
+    def benchmark_incremental(self, curriculum, taxonomy, **options):
+        """ Compares a full run of an analysis with incremental re-runs, without changes and after
+        changing the text of one LO. Nothing is kept in the database """
+        curriculum, taxonomy = self.get_curriculum_and_taxonomy(curriculum, taxonomy)
+        num_los = curriculum.get_num_learning_outcomes()
+        with transaction.atomic():
+            analysis = CurriculumAnalysis.objects.create(title='benchmark', curriculum=curriculum, taxonomy=taxonomy)
+            for label, incremental in (('Full run', False), ('Incremental run (no changes)', True), ('Incremental run (1 LO changed)', True)):
+                if label.endswith('(1 LO changed)'):
+                    lo = LearningOutcome.objects.filter(strand__curriculum=curriculum).first()
+                    LearningOutcome.objects.filter(pk=lo.pk).update(text=f"{lo.text} (changed)")
+                start = time.perf_counter()
+                run = AnalysisEngine(analysis).run(incremental=incremental)
+                self.report(label, num_los, time.perf_counter() - start)
+                self.stdout.write(f"{'':<40} {run.get_summary()}")
+            transaction.set_rollback(True)
+
+    def benchmark_slugs(self, rows, **options):
+        """ Compares the creation of rows with repeated titles (50 rows for each title), each saved
+        with its own unique slug lookups, with the batch slug allocation and a single bulk_create.
+        The titles share no common prefix, as the verbs of a taxonomy. Nothing is kept in the database """
+        titles = [f"{index % max(rows // 50, 1)} benchmark verb" for index in range(rows)]
+        for label in ('save() per row', 'unique_slugify_batch + bulk_create'):
+            # Queries are counted rather than captured, the query log being limited in size
+            num_queries = []
+            def count_query(execute, *args):
+                num_queries.append(1)
+                return execute(*args)
+            with transaction.atomic():
+                with connection.execute_wrapper(count_query):
+                    start = time.perf_counter()
+                    if label == 'save() per row':
+                        for title in titles:
+                            NonCatVerb.objects.create(title=title)
+                    else:
+                        verbs = [NonCatVerb(title=title) for title in titles]
+                        unique_slugify_batch(verbs, titles)
+                        NonCatVerb.objects.bulk_create(verbs)
+                    seconds = time.perf_counter() - start
+                transaction.set_rollback(True)
+            self.stdout.write(f"{label:<40} {rows:>7} rows {seconds:>9.3f} s {len(num_queries):>9} queries")
+
+    def benchmark_chunks(self, curriculum, taxonomy, chunk_sizes, chunk_seconds, **options):
+        """ Compares full runs of the analysis task with the LOs split into chunks of several sizes,
+        reporting their end-to-end time and number of task messages. The tasks run eagerly in this
+        process, so that the time excludes the broker latency of each message. The adaptive size follows
+        the LO rate observed by the chunk tasks of the previous runs. Nothing is kept in the database """
+        curriculum, taxonomy = self.get_curriculum_and_taxonomy(curriculum, taxonomy)
+        num_los = curriculum.get_num_learning_outcomes()
+        num_messages = []
+        def count_message(**kwargs):
+            num_messages.append(1)
+        task_prerun.connect(count_message)
+        task_always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        try:
+            configurations = []
+            for chunk_size in chunk_sizes.split(','):
+                if chunk_size == 'adaptive':
+                    configurations.append({'ANALYSIS_LO_CHUNK_SIZE': settings.ANALYSIS_LO_CHUNK_SIZE, 'ANALYSIS_LO_CHUNK_SECONDS': chunk_seconds})
+                else:
+                    configurations.append({'ANALYSIS_LO_CHUNK_SIZE': int(chunk_size), 'ANALYSIS_LO_CHUNK_SECONDS': 0})
+            with self.tagged_learning_outcomes(curriculum):
+                for chunk_settings in configurations:
+                    with override_settings(**chunk_settings):
+                        size = LearningOutcomeChunker().get_chunk_size()
+                        label = f"chunk size {size}" + (f" (adaptive, {chunk_seconds} s)" if chunk_settings['ANALYSIS_LO_CHUNK_SECONDS'] else '')
+                        num_messages.clear()
+                        with transaction.atomic():
+                            analysis = CurriculumAnalysis.objects.create(title='benchmark', curriculum=curriculum, taxonomy=taxonomy)
+                            start = time.perf_counter()
+                            analyse_curriculum.delay(analysis.pk).get()
+                            seconds = time.perf_counter() - start
+                            transaction.set_rollback(True)
+                    self.report(label, num_los, seconds)
+                    self.stdout.write(f"{'':<40} {len(num_messages):>7} task messages")
+        finally:
+            app.conf.task_always_eager = task_always_eager
+            task_prerun.disconnect(count_message)
+
+    def get_curriculum_and_taxonomy(self, curriculum, taxonomy):
+        """ Returns the curriculum and taxonomy to analyse (by default the first ones) """
+        curriculum = Curriculum.objects.get(pk=curriculum) if curriculum is not None else Curriculum.objects.first()
+        taxonomy = Taxonomy.objects.get(pk=taxonomy) if taxonomy is not None else Taxonomy.objects.first()
+        if curriculum is None or taxonomy is None:
+            raise CommandError('A curriculum and a taxonomy are needed to benchmark the analysis')
+        return curriculum, taxonomy
+
+    @contextlib.contextmanager
+    def tagged_learning_outcomes(self, curriculum):
+        """ Tags the LOs of a curriculum before the benchmarked runs, outside of their rolled back
+        transactions, so that every run finds them in the tagged text cache. The entries added to the
+        cache are deleted afterwards """
+        texts = list(LearningOutcome.objects.filter(strand__curriculum=curriculum).values_list('text', flat=True))
+        entries = TaggedText.objects.filter(model=nlp_manager.get_model_id(), text_hash__in={TaggedText.get_text_hash(TaggedText.normalise(text)) for text in texts})
+        previous_entries = list(entries.values_list('pk', flat=True))
+        TaggedText.tag_texts(texts)
+        try:
+            yield
+        finally:
+            entries.exclude(pk__in=previous_entries).delete()
+
+    def run_analysis_stages(self, analysis):
+        """ Runs the analysis stages one after the other """
+        analysis.initialise()
+        analysis.learning_outcome_category_hit_count_analyses()
+        analysis.strand_category_hit_count_analyses()
+        analysis.strand_category_diversity_analyses()
+        analysis.strand_average_analyses()
+
+    def run_analysis(self, curriculum, taxonomy, run, label=None, num_los=None):
+        """ Runs an analysis of a curriculum in a rolled back transaction and reports its throughput
+        and number of queries """
+        with transaction.atomic():
+            analysis = CurriculumAnalysis.objects.create(title='benchmark', curriculum=curriculum, taxonomy=taxonomy)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                run(analysis)
+                seconds = time.perf_counter() - start
+            transaction.set_rollback(True)
+        if label is not None:
+            self.report(label, num_los, seconds)
+            self.stdout.write(f"{'':<40} {len(queries):>7} queries")
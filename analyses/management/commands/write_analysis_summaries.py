@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from analyses.models import CurriculumAnalysis
+
+
+class Command(BaseCommand):
+    """
+
+    Writes the summaries of the analyses which have none (e.g. created before summaries were stored),
+    so that their chart views only read summaries, e.g.
+        python manage.py write_analysis_summaries
+        python manage.py write_analysis_summaries --all
+
+    """
+    help = 'Writes the summaries of the curriculum analyses which have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rewrite the summaries of all the analyses')
+
+    def handle(self, *args, **options):
+        analyses = CurriculumAnalysis.objects.all()
+        if not options['all']:
+            analyses = analyses.filter(summary__isnull=True)
+        num_written = 0
+        for analysis in analyses.iterator():
+            analysis.write_summary()
+            num_written += 1
+        self.stdout.write(f"Wrote {num_written} summaries")
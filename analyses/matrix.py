@@ -0,0 +1,39 @@
+import numpy as np
+
+
+class HitMatrix:
+    """
+
+    A class to represent the category hit counts of a collection of learning outcomes as a
+    matrix, with one row per LO and one column per verb category (ordered by level).
+    The strand analyses are all derived from the matrix with vectorized reductions.
+
+    """
+    def __init__(self, hit_counts, num_categories):
+        self.matrix = np.array(hit_counts, dtype=np.int64).reshape(len(hit_counts), num_categories)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def __getitem__(self, rows):
+        return HitMatrix(self.matrix[rows], self.matrix.shape[1])
+
+    def get_category_hit_counts(self):
+        """ Returns the number of LOs hitting each category at least once """
+        return (self.matrix > 0).sum(axis=0).tolist()
+
+    def get_category_diversities(self):
+        """ Returns the number of LOs hitting 0, 1, 2, ..., n categories (mutually exclusive) """
+        return np.bincount((self.matrix > 0).sum(axis=1), minlength=self.matrix.shape[1] + 1).tolist()
+
+    def get_verb_average(self):
+        """ Returns the average number of verb hits per LO """
+        if not len(self):
+            return 0
+        return round(int(self.matrix.sum()) / len(self), 2)
+
+    def get_category_average(self):
+        """ Returns the average number of categories hit per LO """
+        if not len(self):
+            return 0
+        return round(sum(num_categories * num_los for num_categories, num_los in enumerate(self.get_category_diversities())) / len(self), 2)
@@ -0,0 +1,31 @@
+# Generated by Django 3.0.5 on 2026-10-18 09:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0019_auto_20200522_2239'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaggedText',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('tokens', models.TextField()),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Tagged Text',
+                'verbose_name_plural': 'Tagged Texts',
+                'unique_together': {('text_hash', 'model')},
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.0.5 on 2026-10-18 09:45
+
+import json
+
+from django.db import migrations, models
+
+
+def get_taxonomy_categories(apps):
+    """ Returns a dictionary mapping each taxonomy pk to its category titles ordered by level """
+    VerbCategory = apps.get_model('verb_categories', 'VerbCategory')
+    categories = {}
+    for taxonomy_id, title in VerbCategory.objects.order_by('taxonomy_id', 'level').values_list('taxonomy_id', 'title'):
+        categories.setdefault(taxonomy_id, []).append(title)
+    return categories
+
+
+def pack_hit_counts(apps, schema_editor):
+    """ Packs the category hit count rows of each LO analysis into a list ordered by category level """
+    LearningOutcomeAnalysis = apps.get_model('analyses', 'LearningOutcomeAnalysis')
+    LearningOutcomeCategoryHitCount = apps.get_model('analyses', 'LearningOutcomeCategoryHitCount')
+    categories = get_taxonomy_categories(apps)
+    hit_counts = {}
+    for lo_analysis_id, category, hit_count in LearningOutcomeCategoryHitCount.objects.values_list('learning_outcome_analysis_id', 'category', 'hit_count').iterator():
+        hit_counts.setdefault(lo_analysis_id, {})[category] = hit_count
+    # LO analyses sharing the same hit counts are updated together
+    packed_lo_analyses = {}
+    lo_analyses = LearningOutcomeAnalysis.objects.values_list('pk', 'strand_analysis__curriculum_analysis__taxonomy_id')
+    for pk, taxonomy_id in lo_analyses.iterator():
+        if pk in hit_counts:
+            packed = json.dumps([hit_counts[pk].get(title, 0) for title in categories.get(taxonomy_id, [])], separators=(',', ':'))
+            packed_lo_analyses.setdefault(packed, []).append(pk)
+    for packed, pks in packed_lo_analyses.items():
+        for start in range(0, len(pks), 500):
+            LearningOutcomeAnalysis.objects.filter(pk__in=pks[start:start + 500]).update(hit_counts=packed)
+
+
+def unpack_hit_counts(apps, schema_editor):
+    """ Recreates one category hit count row per category for each LO analysis """
+    LearningOutcomeAnalysis = apps.get_model('analyses', 'LearningOutcomeAnalysis')
+    LearningOutcomeCategoryHitCount = apps.get_model('analyses', 'LearningOutcomeCategoryHitCount')
+    categories = get_taxonomy_categories(apps)
+    lo_analyses = LearningOutcomeAnalysis.objects.values_list('pk', 'strand_analysis__curriculum_analysis__taxonomy_id', 'hit_counts')
+    rows = []
+    for pk, taxonomy_id, packed in lo_analyses.iterator():
+        hit_counts = json.loads(packed)
+        if hit_counts:
+            rows += [LearningOutcomeCategoryHitCount(learning_outcome_analysis_id=pk, category=title, hit_count=hit_count) for title, hit_count in zip(categories.get(taxonomy_id, []), hit_counts)]
+    LearningOutcomeCategoryHitCount.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verb_categories', '0005_auto_20200603_1324'),
+        ('analyses', '0020_taggedtext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningoutcomeanalysis',
+            name='hit_counts',
+            field=models.TextField(default='[]'),
+        ),
+        migrations.RunPython(pack_hit_counts, unpack_hit_counts),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.0.5 on 2026-10-18 09:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0021_learningoutcomeanalysis_hit_counts'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='LearningOutcomeCategoryHitCount',
+        ),
+    ]
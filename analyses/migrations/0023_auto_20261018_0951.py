@@ -0,0 +1,46 @@
+# Generated by Django 3.0.5 on 2026-10-18 09:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0022_delete_learningoutcomecategoryhitcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningoutcomeanalysis',
+            name='non_cat_verb_list',
+            field=models.TextField(default=''),
+        ),
+        migrations.AddField(
+            model_name='learningoutcomeanalysis',
+            name='text_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='strandanalysis',
+            name='text_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='AnalysisRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('incremental', models.BooleanField(default=False)),
+                ('taxonomy_version', models.PositiveIntegerField(default=0)),
+                ('num_reused_learning_outcomes', models.PositiveIntegerField(default=0)),
+                ('num_recomputed_learning_outcomes', models.PositiveIntegerField(default=0)),
+                ('num_recomputed_strands', models.PositiveIntegerField(default=0)),
+                ('curriculum_analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='analyses.CurriculumAnalysis')),
+            ],
+            options={
+                'verbose_name': 'Analysis Run',
+                'verbose_name_plural': 'Analysis Runs',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.5 on 2026-10-18 10:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0023_auto_20261018_0951'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('document', models.TextField(default='{}')),
+                ('curriculum_analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='analyses.CurriculumAnalysis')),
+            ],
+            options={
+                'verbose_name': 'Analysis Summary',
+                'verbose_name_plural': 'Analysis Summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0024_analysissummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='stages',
+            field=models.TextField(default='{}'),
+        ),
+    ]
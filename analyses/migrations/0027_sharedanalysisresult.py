@@ -0,0 +1,32 @@
+# Generated by Django 3.0.5 on 2026-10-18 10:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0026_analysisrun_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharedAnalysisResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('curriculum_content_hash', models.CharField(max_length=64)),
+                ('taxonomy_content_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=100)),
+                ('document', models.TextField(default='[]')),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('last_used', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Shared Analysis Result',
+                'verbose_name_plural': 'Shared Analysis Results',
+                'unique_together': {('curriculum_content_hash', 'taxonomy_content_hash', 'model')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0027_sharedanalysisresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisrun',
+            name='taxonomy_content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.5 on 2026-10-18 11:20
+
+from django.db import migrations
+
+
+def reset_fingerprints(apps, schema_editor):
+    """ Clears the fingerprints of the runs recorded without a taxonomy content hash. Such runs may
+    have reused the results of another taxonomy (after the analysis was switched to a taxonomy at the
+    same version), so they are not trusted to be up to date """
+    AnalysisRun = apps.get_model('analyses', 'AnalysisRun')
+    AnalysisRun.objects.filter(taxonomy_content_hash='').exclude(fingerprint='').update(fingerprint='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyses', '0028_analysisrun_taxonomy_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_fingerprints, migrations.RunPython.noop),
+    ]
@@ -1,24 +1,32 @@
+import hashlib
+import json
+from datetime import datetime
+
 from django.urls import reverse
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.utils import timezone
 
-from utils.slugs import unique_slugify
+from utils.slugs import unique_slugify, unique_slugify_batch
+from utils.cache import chart_cache
 from utils.get import (
         CurriculumAnalysisGetMethods,
         StrandAnalysisGetMethods,
         LearningOutcomeAnalysisGetMethods,
         )
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 
 from curricula.models import Curriculum
 from strands.models import Strand
 from learning_outcomes.models import LearningOutcome
 from taxonomies.models import CustomUserTaxonomy as Taxonomy
-from verbs.models import Verb, NonVerb, NonCatVerb
-
-import spacy
+from verbs.models import NonCatVerb
+from verb_categories.models import VerbCategory
 
-nlp = spacy.load('en_core_web_sm')
+from .nlp import nlp_manager, tag_texts
+from .lexicon import TaxonomyLexicon
+from .matrix import HitMatrix
 
 # The following models are defined in order to separate a curriculum from its' analysis.
 # For instance, this allows for a curriculum to have multiple analyses within different taxonomies,
@@ -82,6 +90,61 @@ class CurriculumAnalysis(models.Model, CurriculumAnalysisGetMethods):
         """ Returns True if at least 1 categorised verb in the analysis """
         return self.non_cat_verbs.all().count() > 0
 
+    def add_non_cat_verbs(self, verbs):
+        """ Adds a collection of non-categorised verbs to the analysis, creating those which
+        do not exist yet. The number of queries does not depend on the number of verbs """
+        verbs = list(dict.fromkeys(verbs))
+        if not verbs:
+            return
+        non_cat_verb_pks = {}
+        for pk, title in NonCatVerb.objects.filter(title__in=verbs).order_by('pk').values_list('pk', 'title'):
+            non_cat_verb_pks.setdefault(title, pk)
+        new_non_cat_verbs = [NonCatVerb(title=verb) for verb in verbs if verb not in non_cat_verb_pks]
+        if new_non_cat_verbs:
+            unique_slugify_batch(new_non_cat_verbs, [verb.title for verb in new_non_cat_verbs])
+            NonCatVerb.objects.bulk_create(new_non_cat_verbs)
+            # The primary keys of bulk created rows are not set on all databases
+            for pk, title in NonCatVerb.objects.filter(slug__in=[verb.slug for verb in new_non_cat_verbs]).values_list('pk', 'title'):
+                non_cat_verb_pks[title] = pk
+        self.non_cat_verbs.add(*non_cat_verb_pks.values())
+
+    def set_non_cat_verbs(self, verbs):
+        """ Sets the non-categorised verbs of the analysis, removing those which are not in verbs """
+        verbs = list(dict.fromkeys(verbs))
+        NonCatVerb.curriculum_analyses.through.objects.filter(curriculumanalysis=self).exclude(noncatverb__title__in=verbs).delete()
+        self.add_non_cat_verbs(verbs)
+
+    def get_latest_run(self):
+        """ Returns the latest completed run of the analysis, None if it was never run """
+        return self.runs.order_by('-date_created', '-pk').first()
+
+    @staticmethod
+    def hash_curriculum_content(strands):
+        """ Returns the sha256 hash of the content of a curriculum, given the (index, text) pairs of the
+        LOs of each of its strands, the strands being ordered by primary key. The hash only depends on
+        the number of strands and the indices and normalised texts of their LOs """
+        content = ''.join(
+                'strand\n' + ''.join(f"{index}:{TaggedText.get_text_hash(TaggedText.normalise(text))}\n" for index, text in sorted(los))
+                for los in strands
+                )
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get_curriculum_content_hash(self):
+        """ Returns the content hash of the curriculum of the analysis """
+        strands = {strand_pk: [] for strand_pk in Strand.objects.filter(curriculum_id=self.curriculum_id).order_by('pk').values_list('pk', flat=True)}
+        for strand_pk, index, text in LearningOutcome.objects.filter(strand__curriculum_id=self.curriculum_id).values_list('strand_id', 'index', 'text'):
+            strands[strand_pk].append((index, text))
+        return self.hash_curriculum_content(strands.values())
+
+    def get_fingerprint(self, curriculum_content_hash=None):
+        """ Returns the fingerprint of the inputs of a run of the analysis: the LO texts of the curriculum
+        and the verb and category memberships of the taxonomy. Runs with the same fingerprint give the
+        same results """
+        if curriculum_content_hash is None:
+            curriculum_content_hash = self.get_curriculum_content_hash()
+        taxonomy_content_hash = TaxonomyLexicon.get(self.get_taxonomy()).get_content_hash()
+        return hashlib.sha256(f"{curriculum_content_hash}:{taxonomy_content_hash}".encode('utf-8')).hexdigest()
+
     def initialise(self):
         """  Initialisation called for every new analysis """
         self.initialise_non_cat_verbs()
@@ -101,14 +164,70 @@ class CurriculumAnalysis(models.Model, CurriculumAnalysisGetMethods):
         StrandAnalysis.objects.filter(curriculum_analysis=self).delete()
         return [StrandAnalysis.objects.create(title=f"{self.title}-{strand.title}", curriculum_analysis=self, strand=strand) for strand in self.curriculum.strands.all()]
 
+    def get_or_create_strand_analyses(self):
+        """ Returns the strand analyses of the analysis, one for each strand of the curriculum, creating
+        those of the strands added since the previous run """
+        strand_analyses = {strand_analysis.strand_id: strand_analysis for strand_analysis in self.strand_analyses.all()}
+        return [strand_analyses.get(strand.pk) or StrandAnalysis.objects.create(title=f"{self.title}-{strand.title}", curriculum_analysis=self, strand=strand) for strand in self.curriculum.strands.all()]
+
+    def get_summary(self):
+        """ Returns the summary of the analysis results, written when the analysis is created and by
+        its runs. Nothing is written here, so an analysis without a summary (created before summaries
+        and not backfilled by the write_analysis_summaries command) gets an unsaved summary instead """
+        try:
+            return self.summary
+        except AnalysisSummary.DoesNotExist:
+            return AnalysisSummary(curriculum_analysis=self, document=json.dumps(self.get_summary_document()), date_updated=self.date_created)
+
+    def write_summary(self):
+        """ Writes (or rewrites) the summary of the analysis results and returns it """
+        summary, created = AnalysisSummary.objects.update_or_create(curriculum_analysis=self, defaults={'document': json.dumps(self.get_summary_document())})
+        self.summary = summary
+        self.invalidate_chart_cache()
+        return summary
+
+    def invalidate_chart_cache(self):
+        """ Invalidates the cached chart data of the analysis and of the dashboard of its curriculum """
+        chart_cache.invalidate(('analysis', self.pk), ('curriculum', self.curriculum_id))
+
+    def get_summary_document(self):
+        """ Returns the results of the analysis as a single dictionary, with the strands ordered by
+        date creation (inverse to curriculum grid side-bar) and the verb categories by level """
+        strands = list(Strand.objects.filter(curriculum_id=self.curriculum_id).order_by('date_created').values_list('pk', 'title', 'colour'))
+        labels = list(VerbCategory.objects.filter(taxonomy_id=self.taxonomy_id).order_by('level').values_list('title', flat=True))
+        diversity_labels = list(range(0, len(labels) + 1))
+        strand_analyses = self.strand_analyses.select_related('strand_average').prefetch_related('strand_category_hit_counts', 'strand_category_diversities')
+        strand_analyses = {strand_analysis.strand_id: strand_analysis for strand_analysis in strand_analyses}
+        # Only the strands analysed in the last run have results, so only they are labelled
+        strands = [(strand_pk, title, colour) for strand_pk, title, colour in strands if strand_pk in strand_analyses]
+        strand_analyses = [strand_analyses[strand_pk] for strand_pk, title, colour in strands]
+        hit_counts = [{hit_count.category: hit_count.hit_count for hit_count in strand_analysis.strand_category_hit_counts.all()} for strand_analysis in strand_analyses]
+        diversities = [{diversity.num_categories: diversity.num_learning_outcomes for diversity in strand_analysis.strand_category_diversities.all()} for strand_analysis in strand_analyses]
+        averages = [getattr(strand_analysis, 'strand_average', None) for strand_analysis in strand_analyses]
+        return {
+                'labels': labels,
+                'strands': [title for strand_pk, title, colour in strands],
+                'colours': [colour for strand_pk, title, colour in strands],
+                'hitCounts': [[strand.get(label) for label in labels] for strand in hit_counts],
+                'diversities': [[strand.get(label) for label in diversity_labels] for strand in diversities],
+                'verbAverages': [average.verbs if average is not None else None for average in averages],
+                'categoryAverages': [average.categories if average is not None else None for average in averages],
+                'numLOs': LearningOutcome.objects.filter(strand__curriculum_id=self.curriculum_id).count(),
+                }
+
     def learning_outcome_category_hit_count_analyses(self):
-        """ Generates all the LearningOutcomeCategoryHitCount objects for the
+        """ Generates the category hit counts of all the LO analyses for the
         analysis of the curriculum within the taxonomy (over all strands). These are the central
-        objects from which all other analyses are derived """
+        results from which all other analyses are derived.
+        The LOs of all strands are tagged together in a single batched nlp pass """
         StrandAnalysis.objects.filter(curriculum_analysis=self).delete()
-        for strand in self.curriculum.strands.all():
+        strands = list(self.curriculum.strands.all())
+        strand_los = [list(strand.learning_outcomes.all()) for strand in strands]
+        tagged_texts = iter(TaggedText.tag_texts([lo.text for los in strand_los for lo in los]))
+        for strand, los in zip(strands, strand_los):
             strand_analysis = StrandAnalysis.objects.create(title=f"{self.title}-{strand.title}", curriculum_analysis=self, strand=strand)
-            strand_analysis.learning_outcome_category_hit_count_analyses()
+            tagged_los = [(lo, next(tagged_texts)) for lo in los]
+            strand_analysis.learning_outcome_category_hit_count_analyses(tagged_los)
 
     def strand_category_hit_count_analyses(self):
         """ Generates all the StrandCategoryHitCount objects for the
@@ -127,6 +246,8 @@ class CurriculumAnalysis(models.Model, CurriculumAnalysisGetMethods):
         analysis of the curriculum within the taxonomy . """
         for strand_analysis in self.strand_analyses.all():
             strand_analysis.strand_average_analysis()
+        # The averages are the last stage of the analysis
+        self.write_summary()
 
     def get_category_hit_counts(self):
         """ Returns a list of dictionaries, one for each strand, whose keys are the verb category names
@@ -165,6 +286,7 @@ class StrandAnalysis(models.Model, StrandAnalysisGetMethods):
     curriculum_analysis = models.ForeignKey(CurriculumAnalysis, on_delete=models.CASCADE, related_name='strand_analyses')
     strand = models.ForeignKey(Strand, on_delete=models.CASCADE, related_name='strand_analyses')
     slug = models.SlugField(max_length=250, blank=True, unique=True)
+    text_hash = models.CharField(max_length=64, blank=True)  # Hash of the indexed LO texts last analysed
 
 
     class Meta:
@@ -204,64 +326,57 @@ class StrandAnalysis(models.Model, StrandAnalysisGetMethods):
         LearningOutcomeAnalysis.objects.filter(strand_analysis=self).delete()
         return [LearningOutcomeAnalysis.objects.create(index=lo.index, strand_analysis=self, learning_outcome=lo) for lo in self.strand.learning_outcomes.all()]
 
-    def learning_outcome_category_hit_count_analyses(self):
-        """ Calculates how many times each category appears in a given LO, for all LOs in the strand """
-        los = self.strand.learning_outcomes.all()
-        for lo in los:
-            lo_analysis = LearningOutcomeAnalysis.objects.create(index=lo.index, strand_analysis=self, learning_outcome=lo)
-            lo_analysis.hit_count_analysis()
-
-    def initialise_strand_category_hit_counts(self):
-        """ Deletes any pre-existing category_hit_count objects and returns a fresh collection """
-        self.strand_category_hit_counts.all().delete()
-        categories = self.get_taxonomy().verb_categories.all()
-        return [StrandCategoryHitCount.objects.create(category=category.title, strand_analysis=self) for category in categories]
+    def learning_outcome_category_hit_count_analyses(self, tagged_los=None):
+        """ Calculates how many times each category appears in a given LO, for all LOs in the strand.
+        tagged_los is an optional list of (LO, tagged tokens) pairs, otherwise the LOs of the strand
+        are tagged in a single batched nlp pass """
+        if tagged_los is None:
+            los = list(self.strand.learning_outcomes.all())
+            tagged_los = zip(los, TaggedText.tag_texts([lo.text for lo in los]))
+        tagged_los = list(tagged_los)
+        with transaction.atomic():
+            lo_analyses = [LearningOutcomeAnalysis.objects.create(index=lo.index, strand_analysis=self, learning_outcome=lo) for lo, tokens in tagged_los]
+            self.hit_count_analyses(zip(lo_analyses, [tokens for lo, tokens in tagged_los]))
+
+    def hit_count_analyses(self, tagged_lo_analyses):
+        """ Calculates the category hit counts of a collection of (LO analysis, tagged tokens) pairs
+        of the strand. The hit counts of all the LOs are accumulated in memory and written with a
+        single bulk_update, in one transaction """
+        lexicon = TaxonomyLexicon.get(self.get_taxonomy())
+        lo_analyses = []
+        non_cat_verbs = []
+        for lo_analysis, tokens in tagged_lo_analyses:
+            hit_counts, lo_non_cat_verbs = lexicon.match(tokens)
+            lo_analysis.set_hit_counts(hit_counts)
+            lo_analyses.append(lo_analysis)
+            non_cat_verbs += lo_non_cat_verbs
+        with transaction.atomic():
+            LearningOutcomeAnalysis.objects.bulk_update(lo_analyses, ['hit_counts'])
+            self.curriculum_analysis.add_non_cat_verbs(non_cat_verbs)
+
+    def get_hit_matrix(self):
+        """ Returns the LO x category hit matrix of the strand, read from the packed hit counts
+        of its LO analyses in a single query """
+        num_categories = len(TaxonomyLexicon.get(self.get_taxonomy()))
+        hit_counts = self.learning_outcome_analyses.values_list('hit_counts', flat=True)
+        return HitMatrix([LearningOutcomeAnalysis.unpack_hit_counts(packed, num_categories) for packed in hit_counts], num_categories)
 
     def strand_category_hit_count_analysis(self):
         """ Calculates the number of LOs in each category across the strand """
-        strand_cat_hit_counts = self.initialise_strand_category_hit_counts()
-        lo_analyses = self.learning_outcome_analyses.all()
-        categories = self.get_taxonomy().verb_categories.all()
-        for cat_index, category in enumerate(categories):
-            for lo_analysis in lo_analyses:
-                lo_cat_hit_count = lo_analysis.learning_outcome_category_hit_counts.get(category=category)
-                if lo_cat_hit_count.hit_count > 0:
-                    strand_cat_hit_counts[cat_index].hit_count += 1
-                    strand_cat_hit_counts[cat_index].save()
+        self.strand_category_hit_counts.all().delete()
+        categories = TaxonomyLexicon.get(self.get_taxonomy()).categories
+        hit_counts = self.get_hit_matrix().get_category_hit_counts()
+        StrandCategoryHitCount.objects.bulk_create([StrandCategoryHitCount(category=category, hit_count=hit_count, strand_analysis=self) for category, hit_count in zip(categories, hit_counts)])
 
     def delete_strand_category_diversities(self):
         """ Deletes any pre-existing strand_category_diversity """
         self.strand_category_diversities.all().delete()
 
-    def initialise_strand_category_diversities(self):
-        """ Deletes any pre-existing category_diversity objects and returns a fresh collection """
-        self.strand_category_diversities.all().delete()
-        categories = self.get_taxonomy().verb_categories.all()
-        return [StrandCategoryDiversity.objects.create(num_categories=index+1, strand_analysis=self) for index, category in enumerate(categories)]
-
-
     def strand_category_diversity_analysis(self):
-        """ Calculates the number of LOs hitting 1, 2, 3 ..., n categories (mutually exclusive) """
+        """ Calculates the number of LOs hitting 0, 1, 2, ..., n categories (mutually exclusive) """
         self.delete_strand_category_diversities()
-        lo_analyses = self.learning_outcome_analyses.all()
-        category_diversities = [0 for _ in lo_analyses]   # List of category numbers reached by each LO in the strand
-        for lo_index, lo_analysis in enumerate(lo_analyses):
-            for cat_hit_count in lo_analysis.learning_outcome_category_hit_counts.all():
-                if cat_hit_count.hit_count > 0:
-                    category_diversities[lo_index] += 1
-        # Create object in the database
-        self.create_strand_category_diversity(category_diversities)
-
-    def create_strand_category_diversity(self, category_diversities):
-        """ Creates the StrandCategorydiversity objects in the database from the category_diversities
-        generated in the category_diversity_analysis method """
-
-        print(category_diversities)
-        total_num_categories = self.get_taxonomy().verb_categories.count()
-        for category_num_to_check in range(0, total_num_categories + 1):
-            strand_category_diversity = StrandCategoryDiversity.objects.create(strand_analysis=self, num_categories=category_num_to_check)
-            strand_category_diversity.num_learning_outcomes = category_diversities.count(category_num_to_check)
-            strand_category_diversity.save()
+        category_diversities = self.get_hit_matrix().get_category_diversities()
+        StrandCategoryDiversity.objects.bulk_create([StrandCategoryDiversity(num_categories=num_categories, num_learning_outcomes=num_los, strand_analysis=self) for num_categories, num_los in enumerate(category_diversities)])
 
 
     def initialise_strand_average(self):
@@ -277,14 +392,7 @@ class StrandAnalysis(models.Model, StrandAnalysisGetMethods):
 
     def strand_verb_average_analysis(self):
         """ Calculates the average number of verbs per LO in the strand """
-        total_verb_hits = 0
-        total_los = self.get_num_learning_outcomes()
-        lo_analyses = self.learning_outcome_analyses.all()
-        for lo_analysis in lo_analyses:
-            lo_cat_hit_counts = lo_analysis.learning_outcome_category_hit_counts.all()
-            total_verb_hits += sum(cat_hit_count.hit_count for cat_hit_count in lo_cat_hit_counts)
-        average = round(total_verb_hits / total_los, 2)
-        self.set_verb_average(average)
+        self.set_verb_average(self.get_hit_matrix().get_verb_average())
 
     def set_verb_average(self, average):
         """ Updates the StrandAverage object in the database with the computed verb average generated
@@ -331,7 +439,10 @@ class StrandAnalysis(models.Model, StrandAnalysisGetMethods):
 class LearningOutcomeAnalysis(models.Model, LearningOutcomeAnalysisGetMethods):
     """
 
-    A class to manage the analysis of a learning outcome of a curriculums' strand, within a given taxonomy
+    A class to manage the analysis of a learning outcome of a curriculums' strand, within a given taxonomy.
+    The verb category hit counts of the LO (the number of verbs from each category appearing in the LO)
+    are packed in a single field, as a JSON list ordered by category level.
+    E.g. [1, 1, 2, 0, 0, 0] for the 6 categories of Bloom's taxonomy.
 
     """
     index = models.PositiveIntegerField(default=0)
@@ -339,6 +450,9 @@ class LearningOutcomeAnalysis(models.Model, LearningOutcomeAnalysisGetMethods):
     strand_analysis = models.ForeignKey(StrandAnalysis, on_delete=models.CASCADE, related_name='learning_outcome_analyses')
     learning_outcome = models.ForeignKey(LearningOutcome, on_delete=models.CASCADE, related_name='learning_outcome_analyses')
     slug = models.SlugField(max_length=250, blank=True, unique=True)
+    hit_counts = models.TextField(default='[]')
+    text_hash = models.CharField(max_length=64, blank=True)  # Hash of the normalised LO text analysed
+    non_cat_verb_list = models.TextField(default='')
 
 
     class Meta:
@@ -381,82 +495,62 @@ class LearningOutcomeAnalysis(models.Model, LearningOutcomeAnalysisGetMethods):
     #    """ Returns the verb category objects of the taxonomy ordered by level of abstraction """
     #    return VerbCategory.objects.filter(taxonomy=self.get_taxonomy()).order_by('level').all()
 
-    def hit_count_analysis(self):
-        """ Initialises a collection of category_hit_count objects for the LO analysis, then
-        calculates the number of category hits using the spaCy nlp toolkit """
-        self.initialise_category_hit_counts()
-        all_allowed_non_verbs = [non_verb.title for non_verb in NonVerb.objects.all()]
-        lo_text = self.get_learning_outcome().text
-        tokenised_LO = nlp(lo_text)
-        for token in tokenised_LO:
-            if token.pos_ == "VERB":
-                self.handle_detected_verb(token.lemma_)
-            elif token.text in all_allowed_non_verbs:
-                self.handle_detected_allowed_non_verb(token.text)
-
-    def handle_detected_verb(self, verb_title):
-        taxonomy = self.get_taxonomy()
-        verb = Verb.objects.filter(title=verb_title).filter(verb_categories__taxonomy=taxonomy).first()
-        if verb:
-            target_verb_categories = verb.verb_categories.filter(taxonomy=taxonomy)
-            for verb_category in target_verb_categories.all():
-                target = self.learning_outcome_category_hit_counts.get(category=verb_category.title)
-                target.hit_count += 1
-                target.save()
-        else:
-            self.add_verb_to_non_cat_verbs(verb_title)
-
-    def handle_detected_allowed_non_verb(self, non_verb_title):
-        taxonomy = self.get_taxonomy()
-        non_verb = NonVerb.objects.filter(title=non_verb_title).first()
-        if non_verb:
-            target_verb_categories = non_verb.verb_categories.filter(taxonomy=taxonomy)
-            for verb_category in target_verb_categories.all():
-                target = self.learning_outcome_category_hit_counts.get(category=verb_category.title)
-                target.hit_count += 1
-                target.save()
-
-    def initialise_category_hit_counts(self):
-        """ Deletes any pre-existing category_hit_count objects and creates a fresh collection """
-        self.learning_outcome_category_hit_counts.all().delete()
-        target_taxonomy = self.get_taxonomy()
-        for verb_category in target_taxonomy.verb_categories.all():
-            LearningOutcomeCategoryHitCount.objects.create(category=verb_category.title, learning_outcome_analysis=self)
-
-
-    def add_verb_to_non_cat_verbs(self, verb):
-        """ Creates a non-categorised verb/ Adds the curriculum analysis
-        to a pre-existing non-cat verb """
-        curriculum_analysis = self.strand_analysis.curriculum_analysis
-        if verb not in [non_cat_verb.title for non_cat_verb in NonCatVerb.objects.all()]:
-            non_cat_verb = NonCatVerb.objects.create(title=verb)
-        else:
-            non_cat_verb = NonCatVerb.objects.filter(title=verb).first()
-        non_cat_verb.curriculum_analyses.add(curriculum_analysis)
-        non_cat_verb.save()
-
+    @staticmethod
+    def pack_hit_counts(hit_counts):
+        """ Returns the packed representation of a list of category hit counts """
+        return json.dumps([int(hit_count) for hit_count in hit_counts], separators=(',', ':'))
 
+    @staticmethod
+    def unpack_hit_counts(packed, num_categories):
+        """ Returns the list of category hit counts of a packed representation, with no hits if the
+        LO has not been analysed yet """
+        return json.loads(packed) or [0] * num_categories
 
+    def set_hit_counts(self, hit_counts):
+        """ Sets the category hit counts (ordered by category level) of the LO analysis """
+        self.hit_counts = self.pack_hit_counts(hit_counts)
 
+    def get_hit_counts(self):
+        """ Returns the list of category hit counts of the LO analysis, ordered by category level """
+        return self.unpack_hit_counts(self.hit_counts, len(TaxonomyLexicon.get(self.get_taxonomy())))
 
-class LearningOutcomeCategoryHitCount(models.Model):
-    """
+    def get_category_hit_counts(self):
+        """ Returns a dictionary whose keys are the verb category names and values are the
+        number of verbs from that category in the LO """
+        return dict(zip(TaxonomyLexicon.get(self.get_taxonomy()).categories, self.get_hit_counts()))
 
-    A class to represent the verb category hit count of a learning outcome within a given taxonomy.
-    A LearningOutcomeAnalysis instance has a collection of LearningOutcomeCategoryHitCount instances,
-    one for each category of the taxonomy.
-    Each instance pertains to a specific learning outcome and verb category.
-    Each instance stores the number of verbs from said category appearing in said learning outcome.
-    E.g. for 6 verb categories, 3 curriculum strands with 22, 15 and 18
-        learning outcomes, then 6*(22+15+18) objects are created.
-    fields: - category : the title of the verb category of a taxonomy
-            - hit_count: the number of verb hits from said category in said LO
+    def get_non_cat_verbs(self):
+        """ Returns the list of non-categorised verbs detected in the LO """
+        return [verb for verb in self.non_cat_verb_list.split(', ') if verb]
+
+    def hit_count_analysis(self, tokens=None, lexicon=None):
+        """ Calculates the number of category hits of the LO, using the spaCy nlp toolkit, and stores
+        them in the packed hit counts of the LO analysis.
+        tokens is an optional list of pre-tagged (text, lemma, pos) tuples for the LO text and
+        lexicon the optional compiled lexicon of the taxonomy, against which tokens are matched """
+        if tokens is None:
+            tokens = TaggedText.tag_texts([self.get_learning_outcome().text])[0]
+        if lexicon is None:
+            lexicon = TaxonomyLexicon.get(self.get_taxonomy())
+        hit_counts, non_cat_verbs = lexicon.match(tokens)
+        with transaction.atomic():
+            self.initialise_category_hit_counts(hit_counts)
+            self.strand_analysis.curriculum_analysis.add_non_cat_verbs(non_cat_verbs)
+
+    def initialise_category_hit_counts(self, hit_counts=None):
+        """ Resets the category hit counts of the LO analysis, to hit_counts (ordered by category level)
+        if given and otherwise to no hits in each category of the taxonomy """
+        if hit_counts is None:
+            hit_counts = [0] * len(TaxonomyLexicon.get(self.get_taxonomy()))
+        self.set_hit_counts(hit_counts)
+        if self.pk is not None:
+            LearningOutcomeAnalysis.objects.filter(pk=self.pk).update(hit_counts=self.hit_counts)
 
-    """
 
-    category = models.CharField(max_length=150)
-    hit_count = models.PositiveIntegerField(default=0)
-    learning_outcome_analysis = models.ForeignKey(LearningOutcomeAnalysis, on_delete=models.CASCADE, related_name='learning_outcome_category_hit_counts')
+    def add_verb_to_non_cat_verbs(self, verb):
+        """ Creates a non-categorised verb/ Adds the curriculum analysis
+        to a pre-existing non-cat verb """
+        self.strand_analysis.curriculum_analysis.add_non_cat_verbs([verb])
 
 
 class StrandCategoryHitCount(models.Model):
@@ -509,3 +603,324 @@ class StrandAverage(models.Model):
     verbs = models.FloatField(default=0)
     categories = models.FloatField(default=0)
     strand_analysis = models.OneToOneField(StrandAnalysis, on_delete=models.CASCADE, related_name='strand_average')
+
+
+class TaggedText(models.Model):
+    """
+
+    A class to represent a persistent cache of tagged learning outcome texts, so that the same
+    text is not re-tagged every time an analysis is re-run or run within another taxonomy.
+    Entries are keyed by the hash of the normalised text and by the spaCy model name and version,
+    and the least recently used entries are evicted beyond ANALYSIS_PARSE_CACHE_MAX_ENTRIES.
+    fields: - text_hash: sha256 hash of the normalised text
+            - model: spaCy model name and version, e.g. en_core_web_sm-2.2.0
+            - tokens: JSON list of [text, lemma, pos] tokens
+            - hit_count: number of times the entry was read from the cache
+
+    """
+    text_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+    tokens = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # Hit/miss counters of the current process
+    hits = 0
+    misses = 0
+
+
+    class Meta:
+        verbose_name = 'Tagged Text'
+        verbose_name_plural = 'Tagged Texts'
+        unique_together = ('text_hash', 'model')
+
+
+    def __str__(self):
+        return f"{self.model}: {self.text_hash}"
+
+    @staticmethod
+    def normalise(text):
+        """ Returns the text with surrounding whitespace removed and inner whitespace collapsed """
+        return ' '.join(text.split())
+
+    @staticmethod
+    def get_text_hash(normalised_text):
+        """ Returns the sha256 hash of a normalised text """
+        return hashlib.sha256(normalised_text.encode('utf-8')).hexdigest()
+
+    def get_tokens(self):
+        """ Returns the tokens of the entry as a list of (text, lemma, pos) tuples """
+        return [tuple(token) for token in json.loads(self.tokens)]
+
+    @classmethod
+    def tag_texts(cls, texts, progress=None):
+        """ Returns, for each text, a list of (text, lemma, pos) tuples. Texts found in the cache
+        are not tagged again, the remaining ones are tagged in a single batched nlp pass.
+        progress is an optional callable, called with the number of texts found or tagged """
+        model = nlp_manager.get_model_id()
+        normalised_texts = [cls.normalise(text) for text in texts]
+        hashes = [cls.get_text_hash(text) for text in normalised_texts]
+        entries = {entry.text_hash: entry for entry in cls.objects.filter(model=model, text_hash__in=set(hashes))}
+        tokens = {text_hash: entry.get_tokens() for text_hash, entry in entries.items()}
+        if entries:
+            cls.objects.filter(pk__in=[entry.pk for entry in entries.values()]).update(last_used=timezone.now(), hit_count=F('hit_count') + 1)
+
+        # Tag each distinct missing text once
+        missing = {text_hash: text for text_hash, text in zip(hashes, normalised_texts) if text_hash not in tokens}
+        if progress is not None:
+            progress(len(texts) - len(missing))
+        if missing:
+            tagged_texts = tag_texts(list(missing.values()), progress=progress)
+            tokens.update(zip(missing.keys(), tagged_texts))
+            cls.objects.bulk_create([cls(text_hash=text_hash, model=model, tokens=json.dumps(tagged, separators=(',', ':')))
+                for text_hash, tagged in zip(missing.keys(), tagged_texts)], ignore_conflicts=True)
+            cls.evict()
+
+        cls.hits += len(texts) - len(missing)
+        cls.misses += len(missing)
+        return [tokens[text_hash] for text_hash in hashes]
+
+    @classmethod
+    def evict(cls):
+        """ Deletes the least recently used entries beyond the maximum size of the cache """
+        excess = cls.objects.count() - settings.ANALYSIS_PARSE_CACHE_MAX_ENTRIES
+        if excess > 0:
+            oldest = cls.objects.order_by('last_used', 'pk').values_list('pk', flat=True)[:excess]
+            cls.objects.filter(pk__in=list(oldest)).delete()
+
+    @classmethod
+    def get_stats(cls):
+        """ Returns the hit/miss counters of the current process and the size of the cache """
+        return {
+                'hits': cls.hits,
+                'misses': cls.misses,
+                'entries': cls.objects.count(),
+                }
+
+
+class AnalysisRun(models.Model):
+    """
+
+    A class to represent the summary of a completed run of a curriculum analysis.
+    In an incremental run, the LOs whose text is unchanged since the previous run (within the same
+    version and content of the taxonomy) reuse their previous results, and only the strands with new, changed,
+    moved or removed LOs have their analyses recomputed.
+    fields: - incremental: whether the run reused the results of the previous run
+            - taxonomy_version: the version of the taxonomy the LOs were matched against
+            - taxonomy_content_hash: the content hash of the taxonomy lexicon the LOs were matched
+              against (the version alone is a per-taxonomy counter, unchanged when the analysis is
+              switched to another taxonomy)
+            - num_reused_learning_outcomes: the number of LOs whose previous results were reused
+            - num_recomputed_learning_outcomes: the number of LOs which were tagged and matched
+            - num_recomputed_strands: the number of strands whose analyses were recomputed
+            - stages: the JSON dictionary of the start and end timestamps of each stage of the
+              run (planning, tagging, matching and saving), across all the tasks of the run
+            - fingerprint: the fingerprint of the LO texts and taxonomy memberships analysed by
+              the run (see CurriculumAnalysis.get_fingerprint)
+
+    """
+    stage_names = ('planning', 'tagging', 'matching', 'saving')
+    curriculum_analysis = models.ForeignKey(CurriculumAnalysis, on_delete=models.CASCADE, related_name='runs')
+    date_created = models.DateTimeField(auto_now_add=True)
+    incremental = models.BooleanField(default=False)
+    taxonomy_version = models.PositiveIntegerField(default=0)
+    taxonomy_content_hash = models.CharField(max_length=64, blank=True)
+    num_reused_learning_outcomes = models.PositiveIntegerField(default=0)
+    num_recomputed_learning_outcomes = models.PositiveIntegerField(default=0)
+    num_recomputed_strands = models.PositiveIntegerField(default=0)
+    stages = models.TextField(default='{}')
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+
+
+    class Meta:
+        verbose_name = 'Analysis Run'
+        verbose_name_plural = 'Analysis Runs'
+
+
+    def __str__(self):
+        return f"{self.curriculum_analysis} ({self.date_created:%Y-%m-%d %H:%M})"
+
+    def set_stages(self, stages):
+        """ Sets the stages of the run from a dictionary of [start, end] POSIX timestamps """
+        self.stages = json.dumps(stages)
+
+    def get_stages(self):
+        """ Returns the (name, start, end) datetimes of the stages of the run, in pipeline order """
+        stages = json.loads(self.stages)
+        return [
+                (name, datetime.fromtimestamp(stages[name][0], tz=timezone.utc), datetime.fromtimestamp(stages[name][1], tz=timezone.utc))
+                for name in self.stage_names if name in stages
+                ]
+
+    def get_stage_durations(self):
+        """ Returns a dictionary of the number of seconds taken by each stage of the run """
+        return {name: (end - start).total_seconds() for name, start, end in self.get_stages()}
+
+    def get_summary(self):
+        """ Returns a one line summary of the run """
+        mode = 'incremental' if self.incremental else 'full'
+        return f"{mode} run: {self.num_reused_learning_outcomes} LOs reused, {self.num_recomputed_learning_outcomes} LOs recomputed, {self.num_recomputed_strands} strands recomputed"
+
+
+class AnalysisSummary(models.Model):
+    """
+
+    A class to represent the denormalised results of a curriculum analysis, so that the data of its
+    charts is served with a single lookup rather than aggregated from its strand analyses on every
+    request. The summary is written when the analysis completes and rewritten when a strand of the
+    curriculum is added, renamed, recoloured or deleted.
+    fields: - document: JSON document of the results, with the strands ordered by date creation
+            and the verb categories by level:
+                - labels: the verb category titles
+                - strands, colours: the titles and colours of the strands
+                - hitCounts: the strand x category hit count matrix
+                - diversities: the strand x number of categories diversity matrix
+                - verbAverages, categoryAverages: the averages of each strand
+                - numLOs: the number of LOs in the curriculum
+
+    """
+    curriculum_analysis = models.OneToOneField(CurriculumAnalysis, on_delete=models.CASCADE, related_name='summary')
+    date_updated = models.DateTimeField(auto_now=True)
+    document = models.TextField(default='{}')
+
+
+    class Meta:
+        verbose_name = 'Analysis Summary'
+        verbose_name_plural = 'Analysis Summaries'
+
+
+    def __str__(self):
+        return f"{self.curriculum_analysis} summary"
+
+    @classmethod
+    def rewrite_curriculum_summaries(cls, curriculum_pk):
+        """ Rewrites the existing summaries of the analyses of a curriculum. Summaries are updated in
+        place, so that none is created for an analysis being deleted with its curriculum """
+        for summary in cls.objects.filter(curriculum_analysis__curriculum_id=curriculum_pk).select_related('curriculum_analysis'):
+            document = json.dumps(summary.curriculum_analysis.get_summary_document())
+            cls.objects.filter(pk=summary.pk).update(document=document, date_updated=timezone.now())
+            summary.curriculum_analysis.invalidate_chart_cache()
+
+    def get_document(self):
+        """ Returns the (decoded) document of the summary """
+        if not hasattr(self, '_document'):
+            self._document = json.loads(self.document)
+        return self._document
+
+    def get_hit_count_data(self):
+        """ Returns the data of the curriculum hit count chart """
+        document = self.get_document()
+        return {
+                'labels': document['labels'],
+                'colours': document['colours'],
+                'data': document['hitCounts'],
+                'numLOs': document['numLOs'],
+                'analysisPk': self.curriculum_analysis_id,
+                }
+
+    def get_diversity_data(self):
+        """ Returns the data of the curriculum diversity chart, labelled by number of categories """
+        document = self.get_document()
+        return {
+                'labels': list(range(0, len(document['labels']) + 1)),
+                'colours': document['colours'],
+                'data': document['diversities'],
+                'numLOs': document['numLOs'],
+                'analysisPk': self.curriculum_analysis_id,
+                }
+
+    def get_average_verbs_data(self):
+        """ Returns the data of the average verbs per LO chart """
+        document = self.get_document()
+        return {
+                'colours': document['colours'],
+                'labels': ["" for _ in document['verbAverages']],    # Blank but needed for chartjs
+                'data': document['verbAverages'],
+                'analysisPk': self.curriculum_analysis_id,
+                }
+
+    def get_average_categories_data(self):
+        """ Returns the data of the average categories per LO chart """
+        document = self.get_document()
+        return {
+                'colours': document['colours'],
+                'labels': ["" for _ in document['categoryAverages']],    # Blank but needed for chartjs
+                'data': document['categoryAverages'],
+                'analysisPk': self.curriculum_analysis_id,
+                }
+
+    def get_chart_data(self):
+        """ Returns the data of the four charts of the analysis, keyed as in the curriculum dashboard """
+        return {
+                'hitCount': self.get_hit_count_data(),
+                'diversity': self.get_diversity_data(),
+                'averageVerbs': self.get_average_verbs_data(),
+                'averageCategories': self.get_average_categories_data(),
+                }
+
+
+class SharedAnalysisResult(models.Model):
+    """
+
+    A class to represent the LO results of the analysis of a public curriculum within a public
+    taxonomy, shared across users, so that the analyses of the same content (e.g. of a national
+    curriculum within a staff taxonomy) copy the results rather than run the NLP pipeline again.
+    Entries are keyed by the content hashes of the curriculum and of the taxonomy (see
+    CurriculumAnalysis.get_fingerprint) and by the spaCy model which tagged the LOs.
+    fields: - curriculum_content_hash: hash of the indices and normalised texts of the LOs of each strand
+            - taxonomy_content_hash: hash of the categories and memberships of the taxonomy
+            - model: spaCy model name and version, e.g. en_core_web_sm-2.2.0
+            - document: the JSON list, for each strand (ordered by primary key), of the
+              [index, category hit counts, non-categorised verbs] of its LOs
+            - hit_count: number of analysis runs populated from the entry
+
+    """
+    curriculum_content_hash = models.CharField(max_length=64)
+    taxonomy_content_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+    document = models.TextField(default='[]')
+    hit_count = models.PositiveIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+    class Meta:
+        verbose_name = 'Shared Analysis Result'
+        verbose_name_plural = 'Shared Analysis Results'
+        unique_together = ('curriculum_content_hash', 'taxonomy_content_hash', 'model')
+
+
+    def __str__(self):
+        return f"{self.model}: {self.curriculum_content_hash[:12]} / {self.taxonomy_content_hash[:12]}"
+
+    @classmethod
+    def store(cls, curriculum_content_hash, taxonomy_content_hash, strands):
+        """ Stores (or replaces) the shared results of a content, given the [index, hit counts,
+        non-categorised verbs] of the LOs of each strand """
+        cls.objects.update_or_create(
+                curriculum_content_hash=curriculum_content_hash,
+                taxonomy_content_hash=taxonomy_content_hash,
+                model=nlp_manager.get_model_id(),
+                defaults={'document': json.dumps(strands, separators=(',', ':'))},
+                )
+
+    def get_document(self):
+        """ Returns the [index, hit counts, non-categorised verbs] of the LOs of each strand """
+        return json.loads(self.document)
+
+    def get_matches(self, strands):
+        """ Returns the results of the LOs of each strand (ordered by primary key) of a curriculum of the
+        same content, as a dictionary mapping the primary key of each LO to the hash of its normalised
+        text, its category hit counts and its non-categorised verbs """
+        matches = {}
+        for los, results in zip(strands, self.get_document()):
+            results = {index: (hit_counts, non_cat_verbs) for index, hit_counts, non_cat_verbs in results}
+            for lo in los:
+                hit_counts, non_cat_verbs = results[lo.index]
+                matches[lo.pk] = (TaggedText.get_text_hash(TaggedText.normalise(lo.text)), hit_counts, non_cat_verbs)
+        return matches
+
+    def record_hit(self):
+        """ Counts a run populated from the entry """
+        SharedAnalysisResult.objects.filter(pk=self.pk).update(hit_count=F('hit_count') + 1, last_used=timezone.now())
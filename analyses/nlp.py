@@ -0,0 +1,123 @@
+import importlib.metadata
+import os
+import time
+
+from django.conf import settings
+
+
+class NLPModelUnavailable(RuntimeError):
+    """ Raised when a process which must not load the spaCy model (e.g. the web tier) tries to tag text """
+    pass
+
+
+class NLPModelManager:
+    """
+
+    A class to manage the lifecycle of the spaCy model used to tag learning outcomes.
+    The model is loaded at most once per process, with a behaviour depending on the process role:
+        - web: never loads the model, tagging is left to the celery workers.
+        - worker: loads the model in the parent process before forking (see the worker_init
+          signal in LO_analysis_project.celery), so that prefork children share its memory
+          pages copy-on-write.
+        - command (default, e.g. manage.py commands and tests): loads the model on first use.
+    The role is read from the ANALYSIS_NLP_ROLE environment variable, which the wsgi/asgi
+    entry points set to 'web'.
+    Only the components of the pipeline profile (ANALYSIS_NLP_PIPELINE_PROFILE setting) are kept
+    in the loaded pipeline, the analysis only needing the part of speech and lemma of each token.
+
+    """
+    WEB = 'web'
+    WORKER = 'worker'
+    COMMAND = 'command'
+
+    def __init__(self, model_name='en_core_web_sm', profile=None):
+        self.model_name = model_name
+        self.profile = profile
+        self.load_time = None
+        self._role = None
+        self._model_id = None
+        self._nlp = None
+
+    def get_role(self):
+        """ Returns the role of the current process, read when first needed as the wsgi
+        entry point may only set it after the models are imported (e.g. with runserver) """
+        return self._role or os.environ.get('ANALYSIS_NLP_ROLE', self.COMMAND)
+
+    def set_role(self, role):
+        """ Sets the role of the current process """
+        self._role = role
+
+    def get_profile(self):
+        """ Returns the name of the pipeline profile """
+        return self.profile or settings.ANALYSIS_NLP_PIPELINE_PROFILE
+
+    def get_profile_components(self):
+        """ Returns the names of the pipeline components to run, None for the full pipeline """
+        return settings.ANALYSIS_NLP_PIPELINE_PROFILES[self.get_profile()]
+
+    def is_loaded(self):
+        """ Returns True if the model has been loaded in the current process """
+        return self._nlp is not None
+
+    def load(self):
+        """ Loads the model if not already loaded and returns it """
+        if self._nlp is None:
+            if self.get_role() == self.WEB:
+                raise NLPModelUnavailable(f"The spaCy model '{self.model_name}' is not loaded in web processes")
+            import spacy
+            start = time.perf_counter()
+            nlp = spacy.load(self.model_name)
+            self.apply_profile(nlp)
+            self._nlp = nlp
+            self.load_time = time.perf_counter() - start
+        return self._nlp
+
+    def apply_profile(self, nlp):
+        """ Removes the pipeline components which are not part of the profile """
+        components = self.get_profile_components()
+        if components is not None:
+            for name in [name for name in nlp.pipe_names if name not in components]:
+                nlp.remove_pipe(name)
+
+    def get_model_id(self):
+        """ Returns the name and version of the model, e.g. 'en_core_web_sm-2.2.0'. The version is
+        read from the installed package where possible, to avoid loading the model """
+        if self._model_id is None:
+            try:
+                version = importlib.metadata.version(self.model_name)
+            except importlib.metadata.PackageNotFoundError:
+                version = self.load().meta['version']
+            self._model_id = f"{self.model_name}-{version}"
+        return self._model_id
+
+    def preload(self):
+        """ Loads the model in a worker parent process, before the pool children are forked """
+        self.set_role(self.WORKER)
+        return self.load()
+
+
+nlp_manager = NLPModelManager()
+
+
+def tag_texts(texts, batch_size=None, n_process=None, manager=nlp_manager, progress=None):
+    """ Tags a collection of texts with nlp.pipe and returns, for each text (in the same order),
+    a list of (text, lemma, part of speech) tuples, one for each token.
+    Learning outcomes are tagged in batches rather than with one nlp(text) call each,
+    which removes most of the per-call overhead of the spaCy pipeline.
+    progress is an optional callable, called with the number of texts tagged after each batch """
+    batch_size = batch_size or settings.ANALYSIS_NLP_BATCH_SIZE
+    n_process = n_process or settings.ANALYSIS_NLP_N_PROCESS
+    docs = manager.load().pipe(texts, batch_size=batch_size, n_process=n_process)
+    tagged_texts = []
+    for doc in docs:
+        tagged_texts.append([(token.text, token.lemma_, token.pos_) for token in doc])
+        if progress is not None and len(tagged_texts) % batch_size == 0:
+            progress(batch_size)
+    if progress is not None and len(tagged_texts) % batch_size:
+        progress(len(tagged_texts) % batch_size)
+    return tagged_texts
+
+
+def tag_text(text, manager=nlp_manager):
+    """ Tags a single text, returning a list of (text, lemma, part of speech) tuples """
+    return [(token.text, token.lemma_, token.pos_) for token in manager.load()(text)]
@@ -0,0 +1,104 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class AnalysisProgress:
+    """
+
+    A class to track the progress of a run of a curriculum analysis, as the number of processed and
+    total LOs of each stage of the run, in the cache backend named by ANALYSIS_CACHE_ALIAS rather
+    than in the celery result backend. The backend is shared by the web and worker processes (Redis
+    in production, the database otherwise), so that the web process sees the progress reported by
+    the workers.
+    The processed counters are incremented atomically, so that several workers may report the
+    progress of the same run, and reading the progress of a run makes no database query.
+    The status of a run is 'queued' until a worker starts it, then 'running' and finally 'done'
+    or 'failed'. While a run is queued or running, it is claimed by the fingerprint of its inputs,
+    so that requests for a run of the same inputs follow it rather than queue a duplicate.
+
+    """
+    stages = ('tagging', 'matching', 'saving')
+
+    def __init__(self, analysis_pk):
+        self.analysis_pk = analysis_pk
+
+    @property
+    def cache(self):
+        return caches[settings.ANALYSIS_CACHE_ALIAS]
+
+    def get_key(self, name):
+        """ Returns the cache key of a value of the progress, e.g. 'tagging-done' """
+        return f"analysis-progress-{self.analysis_pk}-{name}"
+
+    def queue(self, fingerprint=None):
+        """ Resets the progress when the run is sent to the workers, given the fingerprint of its inputs """
+        self.cache.delete_many([self.get_key(f"{stage}-{name}") for stage in self.stages for name in ('done', 'total')])
+        self.cache.set_many({self.get_key('status'): 'queued', self.get_key('started'): None, self.get_key('fingerprint'): fingerprint}, settings.ANALYSIS_PROGRESS_TIMEOUT)
+
+    def claim(self, fingerprint, task_id, is_failed=None):
+        """ Claims the run of a fingerprint for the final task with the given id, and queues it. If a run
+        of the same fingerprint is already queued or running, returns the id of its final task instead,
+        unless is_failed (an optional callable given the id of the claimed final task) tells it failed
+        without releasing its claim, e.g. when its worker was lost.
+        Returns the id of the final task to follow and True if the run was claimed """
+        key = self.get_key(f"run-{fingerprint}")
+        # Only one of concurrent requests adds the key, which is deleted when the run finishes
+        if not self.cache.add(key, task_id, settings.ANALYSIS_PROGRESS_TIMEOUT):
+            claimed_task_id = self.cache.get(key)
+            if claimed_task_id is not None and not (is_failed is not None and is_failed(claimed_task_id)):
+                return claimed_task_id, False
+            self.cache.set(key, task_id, settings.ANALYSIS_PROGRESS_TIMEOUT)
+        self.queue(fingerprint)
+        return task_id, True
+
+    def start(self, totals):
+        """ Starts the progress of the run, given the total number of LOs of each stage """
+        values = {self.get_key('status'): 'running', self.get_key('started'): time.time()}
+        for stage in self.stages:
+            values[self.get_key(f"{stage}-done")] = 0
+            values[self.get_key(f"{stage}-total")] = totals.get(stage, 0)
+        self.cache.set_many(values, settings.ANALYSIS_PROGRESS_TIMEOUT)
+
+    def advance(self, stage, num_learning_outcomes):
+        """ Adds a number of processed LOs to a stage of the run """
+        if not num_learning_outcomes:
+            return
+        try:
+            self.cache.incr(self.get_key(f"{stage}-done"), num_learning_outcomes)
+        except ValueError:
+            # The progress has expired or was not started
+            pass
+
+    def finish(self, status='done'):
+        """ Ends the progress of the run, with the status 'done' or 'failed', and releases its claim """
+        self.cache.set(self.get_key('status'), status, settings.ANALYSIS_PROGRESS_TIMEOUT)
+        fingerprint = self.cache.get(self.get_key('fingerprint'))
+        if fingerprint is not None:
+            self.cache.delete(self.get_key(f"run-{fingerprint}"))
+
+    def get(self):
+        """ Returns the progress of the run: its status, the processed and total LOs of each stage
+        and overall, and the estimated number of seconds left (None if unknown) """
+        names = ['status', 'started'] + [f"{stage}-{name}" for stage in self.stages for name in ('done', 'total')]
+        values = self.cache.get_many([self.get_key(name) for name in names])
+
+        def get(name, default=None):
+            return values.get(self.get_key(name), default)
+
+        stages = [{'name': stage, 'done': get(f"{stage}-done", 0), 'total': get(f"{stage}-total", 0)} for stage in self.stages]
+        done = sum(stage['done'] for stage in stages)
+        total = sum(stage['total'] for stage in stages)
+        eta = None
+        if get('status') == 'running' and get('started') is not None and 0 < done < total:
+            eta = round((time.time() - get('started')) * (total - done) / done, 1)
+        elif get('status') == 'done':
+            eta = 0
+        return {
+                'status': get('status'),
+                'stages': stages,
+                'done': done,
+                'total': total,
+                'eta': eta,
+                }
@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from strands.models import Strand
+from strands.signals import strand_saved
+from .models import AnalysisSummary, CurriculumAnalysis
+
 #from .models import CurriculumAnalysis
 #from .tasks import analyse_curriculum
 #
@@ -11,3 +15,26 @@ from django.dispatch import receiver
 #        analyse_curriculum.delay(instance.pk)
 #
 
+@receiver(strand_saved, sender=Strand)
+def rewrite_summaries_on_strand_save(sender, instance, created, **kwargs):
+    """ Signal to rewrite the analysis summaries of the curriculum when a strand is added, renamed or
+    recoloured, once the LOs of the strand are generated so that they are counted """
+    if created or instance.has_changed('title') or instance.has_changed('colour'):
+        AnalysisSummary.rewrite_curriculum_summaries(instance.curriculum_id)
+
+@receiver(post_delete, sender=Strand)
+def rewrite_summaries_on_strand_delete(sender, instance, **kwargs):
+    """ Signal to rewrite the analysis summaries of the curriculum when a strand is deleted """
+    AnalysisSummary.rewrite_curriculum_summaries(instance.curriculum_id)
+
+@receiver(post_save, sender=CurriculumAnalysis)
+def write_summary_on_analysis_create(sender, instance, created, raw=False, **kwargs):
+    """ Signal to write the (empty) summary of a new analysis, so that its charts only read summaries """
+    if created and not raw:
+        instance.write_summary()
+
+@receiver(post_save, sender=CurriculumAnalysis)
+@receiver(post_delete, sender=CurriculumAnalysis)
+def invalidate_chart_cache_on_analysis_change(sender, instance, **kwargs):
+    """ Signal to invalidate the cached chart data of an analysis (and of its curriculum dashboard) when it is added, edited or deleted """
+    instance.invalidate_chart_cache()
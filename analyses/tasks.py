@@ -1,87 +1,101 @@
 from __future__ import absolute_import, unicode_literals
+import time
+
 from django.http import Http404
 
-from .models import (
-        CurriculumAnalysis,
-        StrandAnalysis,
-        LearningOutcomeAnalysis
-        )
+from learning_outcomes.models import LearningOutcome
+
+from .models import CurriculumAnalysis
+from .chunks import LearningOutcomeChunker
+from .engine import AnalysisEngine
+from .progress import AnalysisProgress
 
 from LO_analysis_project.celery import app
-from celery.utils import uuid
-from celery import signature, chain, group, chord, current_task
+from celery import chord
 
-@app.task
-def analyse_curriculum(analysis_id, ignore_result=True):
+@app.task(ignore_result=True)
+def analyse_curriculum(analysis_id, incremental=False, final_task_id=None):
     # Get the curriculum analysis or generate a 404 error
     try:
         curr_analysis = CurriculumAnalysis.objects.get(pk=analysis_id)
     except CurriculumAnalysis.DoesNotExist:
         raise Http404('The curriculum analysis does not exist!')
     else:
-        # initialises non categorised verbs and strand analyses
-        strand_analyses = curr_analysis.initialise()
-
-        # Generate group (parallel) tasks carried over all the strands, using signatures
-        lo_tasks = group(single_strand_lo_hit_count_analyses.si(strand_analysis.pk) for strand_analysis in strand_analyses)
-        category_tasks = group(single_strand_category_hit_count_analysis.si(strand_analysis.pk) for strand_analysis in strand_analyses)
-        diversity_tasks = group(single_strand_category_diversity_analysis.si(strand_analysis.pk) for strand_analysis in strand_analyses)
-        average_tasks = group(single_strand_average_analysis.si(strand_analysis.pk) for strand_analysis in strand_analyses)
-
-        # chain the group tasks i.e chord
-        chain_tasks = chain(lo_tasks, category_tasks, diversity_tasks, average_tasks)
-
-        result_chain = chain_tasks.apply_async()
-
-
-@app.task(bind=True, name="analyses.tasks.task_complete")
-def task_complete( self, results=None, *args, **kwargs ):
-    return results
-
-@app.task
-def single_strand_category_diversity_analysis(analysis_id):
-    try:
-        strand_analysis = StrandAnalysis.objects.get(pk=analysis_id)
-    except StrandAnaysis.DoesNotExist:
-        raise Http404('The strand analysis does not exist!')
-    else:
-        strand_analysis.strand_category_diversity_analysis()
+        # Plan the run: split the LOs to tag and match into chunks, each analysed by its own task
+        engine = AnalysisEngine(curr_analysis)
+        try:
+            with engine.stage('planning'):
+                # The progress of the run is started by the planning, even if chunking is disabled
+                chunks = LearningOutcomeChunker().split([lo.pk for lo in engine.prepare(incremental=incremental)])
+        except Exception:
+            AnalysisProgress(analysis_id).finish('failed')
+            raise
+        # The results are saved by a final callback, which only fires once every chunk is matched,
+        # under the task id (if any) given to the client to follow the completion of the run
+        callback = save_curriculum_analysis.s(analysis_id, incremental=incremental, stages=engine.stages)
+        if final_task_id is not None:
+            callback = callback.set(task_id=final_task_id)
+        if len(chunks) > 1:
+            chord(analyse_learning_outcome_chunk.s(analysis_id, chunk) for chunk in chunks)(callback)
+            return f"{sum(len(chunk) for chunk in chunks)} LOs dispatched in {len(chunks)} chunks"
+        # The LOs of a single chunk are tagged and matched by the callback itself
+        callback.delay([])
+        return f"{sum(len(chunk) for chunk in chunks)} LOs dispatched to the final callback"
 
+# The results of the LO chunks are gathered by the chord of the run, and the status of its final
+# callback is polled by the client, so both are stored (and pruned by utils.tasks.prune_task_results)
 @app.task
-def single_strand_category_hit_count_analysis(analysis_id):
-    try:
-        strand_analysis = StrandAnalysis.objects.get(pk=analysis_id)
-    except StrandAnaysis.DoesNotExist:
-        raise Http404('The strand analysis does not exist!')
-    else:
-        strand_analysis.strand_category_hit_count_analysis()
-
-@app.task
-def single_strand_average_analysis(analysis_id):
-    try:
-        strand_analysis = StrandAnalysis.objects.get(pk=analysis_id)
-    except StrandAnaysis.DoesNotExist:
-        raise Http404('The strand analysis does not exist!')
-    else:
-        strand_analysis.strand_average_analysis()
-
-@app.task
-def single_strand_lo_hit_count_analyses(analysis_id):
+def analyse_learning_outcome_chunk(analysis_id, lo_ids):
+    # Get the curriculum analysis or generate a 404 error
     try:
-        strand_analysis = StrandAnalysis.objects.get(pk=analysis_id)
-    except StrandAnaysis.DoesNotExist:
-        raise Http404('The strand analysis does not exist!')
+        curr_analysis = CurriculumAnalysis.objects.get(pk=analysis_id)
+    except CurriculumAnalysis.DoesNotExist:
+        raise Http404('The curriculum analysis does not exist!')
     else:
-        lo_analyses = strand_analysis.initialise_learning_outcome_analyses()
-        group(single_lo_hit_count_analysis.si(lo_analysis.pk) for lo_analysis in lo_analyses)()
+        engine = AnalysisEngine(curr_analysis)
+        try:
+            start = time.perf_counter()
+            matches = engine.match_learning_outcomes(list(LearningOutcome.objects.filter(pk__in=lo_ids)))
+            LearningOutcomeChunker().record(len(matches), time.perf_counter() - start)
+        except Exception:
+            AnalysisProgress(analysis_id).finish('failed')
+            raise
+        # The matches are only valid for the taxonomy version and content they were made with
+        return {
+                'taxonomy_version': engine.lexicon.version,
+                'taxonomy_content_hash': engine.lexicon.get_content_hash(),
+                'matches': [[lo_id, text_hash, hit_counts, non_cat_verbs] for lo_id, (text_hash, hit_counts, non_cat_verbs) in matches.items()],
+                'stages': engine.stages,
+                }
 
 @app.task
-def single_lo_hit_count_analysis(analysis_id):
+def save_curriculum_analysis(chunks, analysis_id, incremental=False, stages=None):
+    # Get the curriculum analysis or generate a 404 error
     try:
-        lo_analysis = LearningOutcomeAnalysis.objects.get(pk=analysis_id)
-    except LearningOutcomeAnalysis.DoesNotExist:
-        raise Http404('The learning outcome analysis does not exist!')
+        curr_analysis = CurriculumAnalysis.objects.get(pk=analysis_id)
+    except CurriculumAnalysis.DoesNotExist:
+        raise Http404('The curriculum analysis does not exist!')
     else:
-        lo_analysis.hit_count_analysis()
-
+        engine = AnalysisEngine(curr_analysis)
+        # Record the stages of the tasks which planned the run and matched its chunks
+        for name, (start, end) in (stages or {}).items():
+            engine.add_stage(name, start, end)
+        for chunk in chunks:
+            for name, (start, end) in chunk['stages'].items():
+                engine.add_stage(name, start, end)
+        matches = {
+                lo_id: (text_hash, hit_counts, non_cat_verbs)
+                for chunk in chunks
+                if chunk['taxonomy_version'] == engine.lexicon.version and chunk['taxonomy_content_hash'] == engine.lexicon.get_content_hash()
+                for lo_id, text_hash, hit_counts, non_cat_verbs in chunk['matches']
+                }
+        try:
+            run = engine.run(incremental=incremental, matches=matches)
+        except Exception:
+            AnalysisProgress(analysis_id).finish('failed')
+            raise
+        return run.get_summary()
 
+@app.task(bind=True, name="analyses.tasks.task_complete", ignore_result=True)
+def task_complete( self, results=None, *args, **kwargs ):
+    return results
@@ -0,0 +1,184 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from analyses.chunks import LearningOutcomeChunker
+from analyses.engine import AnalysisEngine
+from analyses.models import CurriculumAnalysis
+from analyses.progress import AnalysisProgress
+from analyses.tasks import analyse_curriculum, analyse_learning_outcome_chunk, save_curriculum_analysis
+from analyses.tests.test_models import SetUp
+from learning_outcomes.models import LearningOutcome
+from verb_categories.models import VerbCategory
+
+
+@override_settings(ANALYSIS_LO_CHUNK_SIZE=20, ANALYSIS_LO_CHUNK_SECONDS=0, ANALYSIS_LO_CHUNK_MIN_SIZE=10, ANALYSIS_LO_CHUNK_MAX_SIZE=40)
+class TestLearningOutcomeChunker(TestCase):
+
+    def setUp(self):
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        self.chunker = LearningOutcomeChunker()
+
+    def test_split_fixed_size(self):
+        chunks = self.chunker.split(list(range(59)))
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 19, 20])
+        self.assertEqual([item for chunk in chunks for item in chunk], list(range(59)))
+
+    def test_split_small_list(self):
+        self.assertEqual(self.chunker.split(list(range(20))), [list(range(20))])
+        self.assertEqual(self.chunker.split([]), [])
+
+    @override_settings(ANALYSIS_LO_CHUNK_SIZE=0)
+    def test_split_disabled(self):
+        self.assertEqual(len(self.chunker.split(list(range(1000)))), 1)
+
+    @override_settings(ANALYSIS_LO_CHUNK_SECONDS=2)
+    def test_adaptive_chunk_size(self):
+        # The fixed size is used until a chunk rate is observed
+        self.assertEqual(self.chunker.get_chunk_size(), 20)
+        self.chunker.record(30, 4)
+        self.assertEqual(self.chunker.get_chunk_size(), 15)
+        # The rate is a moving average of the chunk rates
+        self.chunker.record(100, 4)
+        self.assertAlmostEqual(self.chunker.get_rate(), 0.3 * 25 + 0.7 * 7.5)
+        self.assertEqual(self.chunker.get_chunk_size(), 26)
+
+    @override_settings(ANALYSIS_LO_CHUNK_SECONDS=2)
+    def test_rate_shared_by_workers(self):
+        # The rate is kept in the analysis cache, shared by the web and worker processes
+        self.chunker.record(30, 4)
+        self.assertEqual(caches['analyses'].get(LearningOutcomeChunker.rate_key), 7.5)
+        self.assertEqual(LearningOutcomeChunker().get_chunk_size(), 15)
+
+    @override_settings(ANALYSIS_LO_CHUNK_SECONDS=2)
+    def test_adaptive_chunk_size_bounds(self):
+        self.chunker.record(1, 10)
+        self.assertEqual(self.chunker.get_chunk_size(), 10)
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        self.chunker.record(1000, 1)
+        self.assertEqual(self.chunker.get_chunk_size(), 40)
+
+
+@override_settings(ANALYSIS_LO_CHUNK_SIZE=20, ANALYSIS_LO_CHUNK_SECONDS=0)
+class TestChunkedAnalysis(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        self.generate_children()
+        # Fetch the analysis again, as the tasks do, with the current taxonomy version
+        self.curr_analysis = CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)
+
+    def dispatch(self, incremental=False):
+        """ Runs the analyse_curriculum task and the LO chunk tasks it dispatched. Returns the results
+        of the chunks and the final callback """
+        with mock.patch('analyses.tasks.chord') as mock_chord:
+            analyse_curriculum(self.curr_analysis.pk, incremental=incremental)
+        header, = mock_chord.call_args[0]
+        callback, = mock_chord.return_value.call_args[0]
+        return [analyse_learning_outcome_chunk(*signature.args) for signature in header], callback
+
+    def save(self, chunks, callback):
+        """ Runs the final callback of a run with the results of its chunks """
+        return save_curriculum_analysis(chunks, *callback.args, **callback.kwargs)
+
+    def assert_results_match_single_task(self):
+        """ Asserts that the results of the analysis are those of a run analysing all LOs in one task """
+        single_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        AnalysisEngine(single_analysis).run()
+        self.curr_analysis.refresh_from_db()
+        self.assertEqual(self.curr_analysis.get_summary_document(), single_analysis.get_summary_document())
+        self.assertEqual(sorted(self.curr_analysis.get_non_cat_verbs().split(', ')), sorted(single_analysis.get_non_cat_verbs().split(', ')))
+
+    def test_chunked_run(self):
+        chunks, callback = self.dispatch()
+        self.assertEqual([len(chunk['matches']) for chunk in chunks], [20, 19, 20])
+        run = self.save(chunks, callback)
+        self.assertIn('59 LOs recomputed', run)
+        self.assert_results_match_single_task()
+
+    def test_final_callback_records_stages(self):
+        chunks, callback = self.dispatch()
+        self.save(chunks, callback)
+        stages = self.curr_analysis.get_latest_run().get_stages()
+        self.assertEqual([name for name, start, end in stages], ['planning', 'tagging', 'matching', 'saving'])
+        (planning, tagging, matching, saving) = [(start, end) for name, start, end in stages]
+        # The chunks are dispatched once planned, and saved once they are all matched (the tagging
+        # and matching of the chunks overlap)
+        self.assertLessEqual(planning[1], tagging[0])
+        self.assertLessEqual(max(tagging[1], matching[1]), saving[0])
+        self.assertLessEqual(saving[0], saving[1])
+
+    def test_final_callback_task_id(self):
+        with mock.patch('analyses.tasks.chord') as mock_chord:
+            analyse_curriculum(self.curr_analysis.pk, final_task_id='final-task')
+        callback, = mock_chord.return_value.call_args[0]
+        self.assertEqual(callback.options['task_id'], 'final-task')
+
+    def test_only_read_results_are_stored(self):
+        self.assertTrue(analyse_curriculum.ignore_result)
+        self.assertFalse(analyse_learning_outcome_chunk.ignore_result)
+        self.assertFalse(save_curriculum_analysis.ignore_result)
+
+    def test_small_run_is_not_chunked(self):
+        with override_settings(ANALYSIS_LO_CHUNK_SIZE=100), mock.patch('analyses.tasks.chord') as mock_chord:
+            with mock.patch.object(save_curriculum_analysis, 'apply_async') as mock_apply_async:
+                analyse_curriculum(self.curr_analysis.pk)
+        mock_chord.assert_not_called()
+        # The LOs are matched by the final callback
+        args, kwargs = mock_apply_async.call_args[0]
+        self.assertEqual(args, ([], self.curr_analysis.pk))
+        save_curriculum_analysis(*args, **kwargs)
+        self.assertEqual(self.curr_analysis.runs.get().num_recomputed_learning_outcomes, 59)
+
+    @override_settings(ANALYSIS_LO_CHUNK_SIZE=0)
+    def test_unchunked_run_starts_progress(self):
+        with mock.patch.object(save_curriculum_analysis, 'apply_async') as mock_apply_async:
+            analyse_curriculum(self.curr_analysis.pk)
+        progress = AnalysisProgress(self.curr_analysis.pk)
+        self.assertEqual(progress.get()['status'], 'running')
+        self.assertEqual(progress.get()['total'], 3 * 59)
+        args, kwargs = mock_apply_async.call_args[0]
+        save_curriculum_analysis(*args, **kwargs)
+        self.assertEqual(progress.get()['done'], 3 * 59)
+
+    def test_incremental_run_only_dispatches_changed_learning_outcomes(self):
+        AnalysisEngine(self.curr_analysis).run()
+        los = list(LearningOutcome.objects.filter(strand__curriculum=self.curr)[:25])
+        for lo in los:
+            LearningOutcome.objects.filter(pk=lo.pk).update(text=f"{lo.text} and evaluate")
+        chunks, callback = self.dispatch(incremental=True)
+        self.assertEqual(sorted(match[0] for chunk in chunks for match in chunk['matches']), sorted(lo.pk for lo in los))
+        self.save(chunks, callback)
+        self.assert_results_match_single_task()
+
+    def test_learning_outcome_changed_after_dispatch_is_recomputed(self):
+        chunks, callback = self.dispatch()
+        lo = LearningOutcome.objects.filter(strand__curriculum=self.curr).first()
+        LearningOutcome.objects.filter(pk=lo.pk).update(text='Describe and evaluate algorithms')
+        with mock.patch.object(AnalysisEngine, 'match_learning_outcomes', wraps=AnalysisEngine(self.curr_analysis).match_learning_outcomes) as mock_match:
+            self.save(chunks, callback)
+        self.assertEqual([matched_lo.pk for matched_lo in mock_match.call_args[0][0]], [lo.pk])
+        self.assert_results_match_single_task()
+
+    def test_matches_of_previous_taxonomy_version_are_discarded(self):
+        chunks, callback = self.dispatch()
+        self.tax.bump_version()
+        self.save(chunks, callback)
+        self.assertEqual(self.curr_analysis.get_latest_run().taxonomy_version, self.tax.version)
+        self.assert_results_match_single_task()
+
+    def test_matches_of_other_taxonomy_are_discarded(self):
+        chunks, callback = self.dispatch()
+        # Switch the analysis to another taxonomy at the version the chunks were matched with
+        other_tax = self.create_other_taxonomy(chunks[0]['taxonomy_version'])
+        # The categories of the other taxonomy are in reverse order, so the matches differ
+        for verb_cat in other_tax.verb_categories.all():
+            VerbCategory.objects.filter(pk=verb_cat.pk).update(level=100 - verb_cat.level)
+        CurriculumAnalysis.objects.filter(pk=self.curr_analysis.pk).update(taxonomy=other_tax)
+        self.save(chunks, callback)
+        self.curr_analysis = CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)
+        self.curr_analysis_params['taxonomy'] = other_tax
+        self.assert_results_match_single_task()
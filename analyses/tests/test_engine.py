@@ -0,0 +1,239 @@
+from unittest import mock
+
+from analyses.engine import AnalysisEngine
+from analyses.models import CurriculumAnalysis, LearningOutcomeAnalysis, SharedAnalysisResult
+from analyses.tests.test_models import SetUp
+from curricula.models import Curriculum
+from learning_outcomes.models import LearningOutcome
+from taxonomies.models import CustomUserTaxonomy as Taxonomy
+
+
+class TestAnalysisEngine(SetUp):
+
+    def get_results(self, curr_analysis):
+        """ Returns the strand results of a curriculum analysis, independently of its title """
+        return [(
+                strand_analysis.get_category_hit_counts(),
+                strand_analysis.get_category_diversities(),
+                list(strand_analysis.get_verb_average().values()),
+                list(strand_analysis.get_category_average().values()),
+                ) for strand_analysis in curr_analysis.strand_analyses.order_by('strand__pk')]
+
+    def test_run_matches_analysis_stages(self):
+        self.generate_children()
+        # Analysis stages run one after the other, each reading the results of the previous one
+        self.curr_analysis.learning_outcome_category_hit_count_analyses()
+        self.curr_analysis.strand_category_hit_count_analyses()
+        self.curr_analysis.strand_category_diversity_analyses()
+        self.curr_analysis.strand_average_analyses()
+        # Single pass engine
+        engine_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        AnalysisEngine(engine_analysis).run()
+        self.assertEqual(self.get_results(engine_analysis), self.get_results(self.curr_analysis))
+        self.assertEqual(sorted(engine_analysis.get_non_cat_verbs().split(', ')), sorted(self.curr_analysis.get_non_cat_verbs().split(', ')))
+
+    def test_run_replaces_previous_results(self):
+        self.generate_children()
+        engine = AnalysisEngine(self.curr_analysis)
+        engine.run()
+        num_lo_analyses = LearningOutcomeAnalysis.objects.count()
+        engine.run()
+        self.assertEqual(self.curr_analysis.strand_analyses.count(), 3)
+        self.assertEqual(LearningOutcomeAnalysis.objects.count(), num_lo_analyses)
+
+    def assert_results_match_full_run(self, curr_analysis):
+        """ Asserts that the results of an analysis are those of a full run on a fresh analysis """
+        full_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        AnalysisEngine(full_analysis).run()
+        self.assertEqual(self.get_results(curr_analysis), self.get_results(full_analysis))
+        self.assertEqual(sorted(curr_analysis.get_non_cat_verbs().split(', ')), sorted(full_analysis.get_non_cat_verbs().split(', ')))
+
+    def test_incremental_run_without_previous_run_is_full(self):
+        self.generate_children()
+        run = AnalysisEngine(self.curr_analysis).run(incremental=True)
+        self.assertFalse(run.incremental)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 59)
+        self.assertEqual(run.num_reused_learning_outcomes, 0)
+
+    def test_incremental_run_without_changes(self):
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        run = AnalysisEngine(self.curr_analysis).run(incremental=True)
+        self.assertTrue(run.incremental)
+        self.assertEqual(run.num_reused_learning_outcomes, 59)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 0)
+        self.assertEqual(run.num_recomputed_strands, 0)
+        self.assert_results_match_full_run(self.curr_analysis)
+
+    def test_incremental_run_recomputes_changed_learning_outcome(self):
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        lo = self.strands[1].learning_outcomes.first()
+        LearningOutcome.objects.filter(pk=lo.pk).update(text='Describe and evaluate algorithms')
+        run = AnalysisEngine(self.curr_analysis).run(incremental=True)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 1)
+        self.assertEqual(run.num_reused_learning_outcomes, 58)
+        self.assertEqual(run.num_recomputed_strands, 1)
+        self.assert_results_match_full_run(self.curr_analysis)
+
+    def test_incremental_run_recomputes_strand_with_removed_learning_outcome(self):
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        self.strands[2].learning_outcomes.order_by('-index').first().delete()
+        run = AnalysisEngine(self.curr_analysis).run(incremental=True)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 0)
+        self.assertEqual(run.num_recomputed_strands, 1)
+        self.assert_results_match_full_run(self.curr_analysis)
+
+    def test_incremental_run_after_taxonomy_change_is_full(self):
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        self.tax.bump_version()
+        run = AnalysisEngine(self.curr_analysis).run(incremental=True)
+        self.assertFalse(run.incremental)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 59)
+
+    def test_incremental_run_after_taxonomy_switch_is_full(self):
+        self.generate_children()
+        previous_run = AnalysisEngine(self.curr_analysis).run()
+        # Switch the analysis to another taxonomy at the same version
+        other_tax = self.create_other_taxonomy(previous_run.taxonomy_version)
+        CurriculumAnalysis.objects.filter(pk=self.curr_analysis.pk).update(taxonomy=other_tax)
+        curr_analysis = CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)
+        run = AnalysisEngine(curr_analysis).run(incremental=True)
+        self.assertFalse(run.incremental)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 59)
+        self.assertEqual(sorted(curr_analysis.strand_analyses.first().get_category_hit_counts()), sorted(verb_cat.title for verb_cat in other_tax.verb_categories.all()))
+        full_analysis = CurriculumAnalysis.objects.create(**dict(self.curr_analysis_params, taxonomy=other_tax))
+        AnalysisEngine(full_analysis).run()
+        self.assertEqual(self.get_results(curr_analysis), self.get_results(full_analysis))
+
+    def test_incremental_run_after_strand_edit(self):
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        # Editing one LO of the strand keeps the other LOs, so their analyses are reused
+        strand = self.strands[0]
+        learning_outcomes = strand.get_cleaned_learning_outcomes()
+        learning_outcomes[3] = 'Describe and evaluate algorithms'
+        strand.learning_outcome_list = '\r\n'.join(learning_outcomes)
+        strand.save()
+        run = AnalysisEngine(self.curr_analysis).run(incremental=True)
+        self.assertEqual(run.num_recomputed_learning_outcomes, 1)
+        self.assertEqual(run.num_recomputed_strands, 1)
+        self.assert_results_match_full_run(self.curr_analysis)
+
+    def test_run_records_stages(self):
+        self.generate_children()
+        run = AnalysisEngine(self.curr_analysis).run()
+        stages = run.get_stages()
+        self.assertEqual([name for name, start, end in stages], ['planning', 'tagging', 'matching', 'saving'])
+        for (name, start, end), (next_name, next_start, next_end) in zip(stages, stages[1:]):
+            self.assertLessEqual(start, end)
+            self.assertLessEqual(end, next_start)
+        self.assertEqual(list(run.get_stage_durations()), ['planning', 'tagging', 'matching', 'saving'])
+
+    def test_run_records_fingerprint(self):
+        self.generate_children()
+        run = AnalysisEngine(self.curr_analysis).run()
+        self.assertEqual(run.fingerprint, self.curr_analysis.get_fingerprint())
+        # The fingerprint only depends on the inputs of the analysis
+        other_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        self.assertEqual(other_analysis.get_fingerprint(), run.fingerprint)
+        self.tax.bump_version()
+        self.assertEqual(CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk).get_fingerprint(), run.fingerprint)
+
+    def test_fingerprint_changes_with_inputs(self):
+        self.generate_children()
+        fingerprint = self.curr_analysis.get_fingerprint()
+        lo = self.strands[1].learning_outcomes.first()
+        LearningOutcome.objects.filter(pk=lo.pk).update(text=f"  {lo.text} ")
+        self.assertEqual(self.curr_analysis.get_fingerprint(), fingerprint)
+        LearningOutcome.objects.filter(pk=lo.pk).update(text='Describe and evaluate algorithms')
+        changed_fingerprint = self.curr_analysis.get_fingerprint()
+        self.assertNotEqual(changed_fingerprint, fingerprint)
+        # Adding a verb to a category of the taxonomy changes its memberships
+        verb_cat = self.tax.verb_categories.first()
+        verb_cat.verb_list += ', frobnicate'
+        verb_cat.save()
+        self.assertNotEqual(CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk).get_fingerprint(), changed_fingerprint)
+
+
+class TestSharedAnalysisResults(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.generate_children()
+        Curriculum.objects.filter(pk=self.curr.pk).update(public=True)
+        Taxonomy.objects.filter(pk=self.tax.pk).update(public=True)
+        self.curr.refresh_from_db()
+        self.tax.refresh_from_db()
+        # Fetch the analysis again, with the public curriculum and taxonomy
+        self.curr_analysis = CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)
+
+    def get_summary(self, curr_analysis):
+        """ Returns the summary and non-categorised verbs of a curriculum analysis """
+        curr_analysis.refresh_from_db()
+        return curr_analysis.get_summary_document(), sorted(curr_analysis.get_non_cat_verbs().split(', '))
+
+    def test_public_analysis_is_shared(self):
+        AnalysisEngine(self.curr_analysis).run()
+        shared_result = SharedAnalysisResult.objects.get()
+        self.assertEqual(shared_result.curriculum_content_hash, self.curr_analysis.get_curriculum_content_hash())
+        self.assertEqual(shared_result.hit_count, 0)
+        self.assertEqual([len(results) for results in shared_result.get_document()], [strand.learning_outcomes.count() for strand in self.strands])
+
+    def test_private_analysis_is_not_shared(self):
+        Taxonomy.objects.filter(pk=self.tax.pk).update(public=False)
+        self.tax.refresh_from_db()
+        AnalysisEngine(CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)).run()
+        self.assertFalse(SharedAnalysisResult.objects.exists())
+
+    def test_private_analysis_does_not_read_shared_results(self):
+        AnalysisEngine(self.curr_analysis).run()
+        Taxonomy.objects.filter(pk=self.tax.pk).update(public=False)
+        self.tax.refresh_from_db()
+        other_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        engine = AnalysisEngine(other_analysis)
+        self.assertEqual(len(engine.prepare(False)), 59)
+        with mock.patch.object(AnalysisEngine, 'match_learning_outcomes', wraps=engine.match_learning_outcomes) as mock_match:
+            AnalysisEngine(other_analysis).run()
+        self.assertEqual(len(mock_match.call_args[0][0]), 59)
+        self.assertEqual(SharedAnalysisResult.objects.get().hit_count, 0)
+
+    def test_analysis_of_shared_content_copies_results(self):
+        AnalysisEngine(self.curr_analysis).run()
+        other_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        with mock.patch.object(AnalysisEngine, 'match_learning_outcomes') as mock_match:
+            run = AnalysisEngine(other_analysis).run()
+        mock_match.assert_not_called()
+        self.assertEqual(run.num_recomputed_learning_outcomes, 59)
+        self.assertEqual(SharedAnalysisResult.objects.get().hit_count, 1)
+        self.assertEqual(self.get_summary(other_analysis), self.get_summary(self.curr_analysis))
+
+    def test_changed_content_is_not_copied(self):
+        AnalysisEngine(self.curr_analysis).run()
+        lo = self.strands[1].learning_outcomes.first()
+        LearningOutcome.objects.filter(pk=lo.pk).update(text='Describe and evaluate algorithms')
+        other_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        with mock.patch.object(AnalysisEngine, 'match_learning_outcomes', wraps=AnalysisEngine(other_analysis).match_learning_outcomes) as mock_match:
+            AnalysisEngine(other_analysis).run()
+        self.assertEqual(len(mock_match.call_args[0][0]), 59)
+        self.assertEqual(SharedAnalysisResult.objects.count(), 2)
+        self.assertEqual(SharedAnalysisResult.objects.filter(hit_count=0).count(), 2)
+
+    def test_incremental_run_shares_reused_results(self):
+        AnalysisEngine(self.curr_analysis).run()
+        lo = self.strands[1].learning_outcomes.first()
+        LearningOutcome.objects.filter(pk=lo.pk).update(text='Describe and evaluate algorithms')
+        AnalysisEngine(self.curr_analysis).run(incremental=True)
+        # The entry of the changed content is complete, so a full run of it copies every LO
+        other_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        with mock.patch.object(AnalysisEngine, 'match_learning_outcomes') as mock_match:
+            AnalysisEngine(other_analysis).run()
+        mock_match.assert_not_called()
+        self.assertEqual(self.get_summary(other_analysis), self.get_summary(self.curr_analysis))
+
+    def test_prepare_skips_chunks_of_shared_content(self):
+        AnalysisEngine(self.curr_analysis).run()
+        other_analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        self.assertEqual(AnalysisEngine(other_analysis).prepare(False), [])
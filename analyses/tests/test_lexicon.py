@@ -0,0 +1,65 @@
+from django.test import TestCase
+
+from analyses.lexicon import TaxonomyLexicon
+from taxonomies.models import CustomUserTaxonomy as Taxonomy
+from verb_categories.models import VerbCategory
+
+
+class TestTaxonomyLexicon(TestCase):
+
+    fixtures = [
+            "yvan.json",
+            "blooms_updated.json",
+            "blooms_updated_knowledge.json",
+            "blooms_updated_comprehension.json",
+            "blooms_updated_application.json",
+            "blooms_updated_analysis.json",
+            "blooms_updated_synthesis.json",
+            "blooms_updated_evaluation.json",
+            ]
+
+    def setUp(self):
+        # Taxonomy
+        self.tax = Taxonomy.objects.get(pk=1)
+        # Verb categories, with their verbs generated (bumping the taxonomy version)
+        self.verb_cats = [VerbCategory.objects.get(pk=index) for index in range(1, 7)]
+        for verb_cat in self.verb_cats:
+            verb_cat.generate_verb_objects(verb_cat.get_cleaned_verbs())
+        self.tax.bump_version()
+        TaxonomyLexicon.compiled.clear()
+
+    def test_categories_ordered_by_level(self):
+        lexicon = TaxonomyLexicon.get(self.tax)
+        self.assertEqual(lexicon.categories, [verb_cat.title for verb_cat in sorted(self.verb_cats, key=lambda verb_cat: verb_cat.level)])
+
+    def test_match(self):
+        lexicon = TaxonomyLexicon.get(self.tax)
+        tokens = [('Describe', 'describe', 'VERB'), ('and', 'and', 'CCONJ'), ('solve', 'solve', 'VERB'), ('frobnicate', 'frobnicate', 'VERB')]
+        hit_counts, non_cat_verbs = lexicon.match(tokens)
+        self.assertEqual(hit_counts, [1, 1, 1, 0, 0, 0])
+        self.assertEqual(non_cat_verbs, ['frobnicate'])
+
+    def test_match_without_queries(self):
+        lexicon = TaxonomyLexicon.get(self.tax)
+        with self.assertNumQueries(0):
+            lexicon.match([('describe', 'describe', 'VERB')] * 100)
+
+    def test_get_reuses_compiled_lexicon(self):
+        lexicon = TaxonomyLexicon.get(self.tax)
+        with self.assertNumQueries(0):
+            self.assertIs(TaxonomyLexicon.get(self.tax), lexicon)
+
+    def test_get_rebuilds_on_version_change(self):
+        lexicon = TaxonomyLexicon.get(self.tax)
+        self.verb_cats[0].verb_list += ', frobnicate'
+        self.verb_cats[0].save()
+        self.tax.refresh_from_db()
+        rebuilt = TaxonomyLexicon.get(self.tax)
+        self.assertIsNot(rebuilt, lexicon)
+        self.assertIn('frobnicate', rebuilt.verbs)
+
+    def test_version_bumped_on_category_delete(self):
+        version = self.tax.version
+        self.verb_cats[-1].delete()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.version, version + 1)
@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+from analyses.matrix import HitMatrix
+
+
+class TestHitMatrix(SimpleTestCase):
+
+    def setUp(self):
+        # 4 LOs, 3 categories
+        self.hit_matrix = HitMatrix([
+                [1, 0, 2],
+                [0, 0, 0],
+                [1, 1, 1],
+                [0, 3, 0],
+                ], 3)
+
+    def test_len(self):
+        self.assertEqual(len(self.hit_matrix), 4)
+
+    def test_slice(self):
+        self.assertEqual(self.hit_matrix[1:3].matrix.tolist(), [[0, 0, 0], [1, 1, 1]])
+
+    def test_get_category_hit_counts(self):
+        self.assertEqual(self.hit_matrix.get_category_hit_counts(), [2, 2, 2])
+
+    def test_get_category_diversities(self):
+        self.assertEqual(self.hit_matrix.get_category_diversities(), [1, 1, 1, 1])
+
+    def test_get_verb_average(self):
+        self.assertEqual(self.hit_matrix.get_verb_average(), 2.25)
+
+    def test_get_category_average(self):
+        self.assertEqual(self.hit_matrix.get_category_average(), 1.5)
+
+    def test_empty_matrix(self):
+        hit_matrix = HitMatrix([], 3)
+        self.assertEqual(hit_matrix.get_category_hit_counts(), [0, 0, 0])
+        self.assertEqual(hit_matrix.get_category_diversities(), [0, 0, 0, 0])
+        self.assertEqual(hit_matrix.get_verb_average(), 0)
+        self.assertEqual(hit_matrix.get_category_average(), 0)
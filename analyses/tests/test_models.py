@@ -1,4 +1,7 @@
-from django.test import TestCase
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
 
 from django.urls import reverse
 
@@ -8,11 +11,14 @@ from analyses.models import (
         CurriculumAnalysis,
         StrandAnalysis,
         LearningOutcomeAnalysis,
-        LearningOutcomeCategoryHitCount,
         StrandCategoryHitCount,
         StrandCategoryDiversity,
         StrandAverage,
+        TaggedText,
+        AnalysisSummary,
         )
+from analyses.engine import AnalysisEngine
+from analyses.lexicon import TaxonomyLexicon
 
 from curricula.models import Curriculum
 from strands.models import Strand
@@ -52,6 +58,8 @@ class SetUp(TestCase):
         self.tax = Taxonomy.objects.get(pk=1)
         # Verb categories
         self.verb_cats = [VerbCategory.objects.get(pk=index) for index in range(1, 7)]
+        # Taxonomy versions are rolled back between tests, so lexicons compiled by a previous test may be stale
+        TaxonomyLexicon.compiled.clear()
 
         # Create curriculum analysis
         self.curr_analysis_params = {
@@ -63,6 +71,24 @@ class SetUp(TestCase):
         # Create strand analyses
         self.strand_analyses = [StrandAnalysis.objects.create(title=f"strand_analysis_{strand.title}", curriculum_analysis=self.curr_analysis, strand=strand) for strand in self.strands]
 
+    def generate_children(self):
+        """ Generates the LOs of the strands and the verbs of the taxonomy, which are not
+        created when loading the fixtures """
+        for strand in self.strands:
+            strand.generate_learning_outcomes(strand.get_cleaned_learning_outcomes())
+        for verb_cat in self.verb_cats:
+            verb_cat.generate_verb_objects(verb_cat.get_cleaned_verbs())
+
+    def create_other_taxonomy(self, version):
+        """ Returns a copy of the taxonomy with renamed verb categories, at the given version """
+        other_tax = Taxonomy.objects.create(title='Other taxonomy', author=self.author)
+        for verb_cat in self.tax.verb_categories.all():
+            other_verb_cat = VerbCategory.objects.create(title=f"Other {verb_cat.title}", level=verb_cat.level, taxonomy=other_tax, verb_list=verb_cat.verb_list)
+            other_verb_cat.generate_verb_objects(other_verb_cat.get_cleaned_verbs())
+        Taxonomy.objects.filter(pk=other_tax.pk).update(version=version)
+        other_tax.refresh_from_db()
+        return other_tax
+
 #        # Create LO analyses
 #        self.los = LearningOutcome.objects.filter(strand=self.strand).all()
 #        self.lo_analyses = []
@@ -101,9 +127,9 @@ class TestCurriculumAnalysis(SetUp):
             estimated_hit_counts.append([0 for _ in range(6)])
             lo_analyses = strand_analysis.learning_outcome_analyses.all()
             for lo_analysis in lo_analyses:
-                lo_category_hit_counts = lo_analysis.learning_outcome_category_hit_counts.all()
+                lo_category_hit_counts = lo_analysis.get_category_hit_counts()
                 for cat_index, category in enumerate(self.verb_cats):
-                    estimated_hit_counts[index][cat_index] += lo_category_hit_counts.get(category=category.title).hit_count
+                    estimated_hit_counts[index][cat_index] += lo_category_hit_counts[category.title]
         self.assertEqual(estimated_hit_counts, target_hit_counts)
 
     def test_strand_category_hit_count_analyses(self):
@@ -165,20 +191,37 @@ class TestStrandAnalysis(SetUp):
     def test_get_num_learning_outcomes(self):
         self.assertEqual(self.strand_analyses[0].get_num_learning_outcomes(), 23)
 
-    def test_initialse_strand_category_hit_counts_created(self):
-        self.strand_analyses[0].initialise_strand_category_hit_counts()
-        num_cat_hit_counts = StrandCategoryHitCount.objects.filter(strand_analysis=self.strand_analyses[0]).count()
-        self.assertEqual(num_cat_hit_counts, 6)
-
-
     def test_learning_outcome_category_hit_count_analyses(self):
         target_hit_counts = [13, 10, 21, 7, 4, 6] # The total number of verb hits for each category
         total_hit_counts = []
         self.strand_analyses[0].learning_outcome_category_hit_count_analyses()
+        los_category_hit_counts = [lo_analysis.get_category_hit_counts() for lo_analysis in LearningOutcomeAnalysis.objects.all()]
         for category in self.verb_cats:
-            los_category_hit_counts = LearningOutcomeCategoryHitCount.objects.filter(category=category.title).all()
-            total_hit_counts.append(sum(lo_cat_hit_count.hit_count for lo_cat_hit_count in los_category_hit_counts))
+            total_hit_counts.append(sum(lo_cat_hit_counts[category.title] for lo_cat_hit_counts in los_category_hit_counts))
+        self.assertEqual(total_hit_counts, target_hit_counts)
+
+    def test_hit_count_analyses(self):
+        target_hit_counts = [2, 2, 2, 0, 0, 0] # describe -> knowledge, comprehension; solve -> application
+        self.generate_children()
+        lo_analyses = self.strand_analyses[0].initialise_learning_outcome_analyses()[:2]
+        tokens = [('describe', 'describe', 'VERB'), ('solve', 'solve', 'VERB'), ('frobnicate', 'frobnicate', 'VERB')]
+        self.strand_analyses[0].hit_count_analyses([(lo_analysis, tokens) for lo_analysis in lo_analyses])
+        los_category_hit_counts = [lo_analysis.get_category_hit_counts() for lo_analysis in LearningOutcomeAnalysis.objects.all()]
+        total_hit_counts = [sum(lo_cat_hit_counts[category.title] for lo_cat_hit_counts in los_category_hit_counts) for category in self.verb_cats]
         self.assertEqual(total_hit_counts, target_hit_counts)
+        self.assertEqual(self.curr_analysis.get_non_cat_verbs(), 'frobnicate')
+
+    def test_hit_count_analyses_num_queries(self):
+        # Hit counts and non-categorised verbs are written with a constant number of queries,
+        # whatever the number of LOs in the strand
+        self.generate_children()
+        lo_analyses = self.strand_analyses[0].initialise_learning_outcome_analyses()
+        tokens = [('describe', 'describe', 'VERB'), ('frobnicate', 'frobnicate', 'VERB')]
+        self.strand_analyses[0].hit_count_analyses([(lo_analyses[0], tokens)])  # Compile the taxonomy lexicon and create the non-categorised verb
+        for num_los in (1, len(lo_analyses)):
+            with self.assertNumQueries(5):
+                self.strand_analyses[0].hit_count_analyses([(lo_analysis, tokens) for lo_analysis in lo_analyses[:num_los]])
+        self.assertEqual([lo_analysis.get_hit_counts() for lo_analysis in LearningOutcomeAnalysis.objects.all()], [[1, 1, 0, 0, 0, 0]] * len(lo_analyses))
 
     def test_strand_category_hit_count_analysis(self):
         target_hit_counts = [11, 9, 13, 7, 3, 6] # The total number of LOs hitting each category
@@ -284,14 +327,147 @@ class TestLearningOutcomeAnalysis(SetUp):
         lo = self.strands[0].learning_outcomes.first()
         lo_analysis = LearningOutcomeAnalysis.objects.create(strand_analysis=self.strand_analyses[0], learning_outcome=lo)
         lo_analysis.initialise_category_hit_counts()
-        num_cat_hit_counts = LearningOutcomeCategoryHitCount.objects.filter(learning_outcome_analysis=lo_analysis).count()
-        self.assertEqual(num_cat_hit_counts, 6)
+        lo_analysis.refresh_from_db()
+        self.assertEqual(lo_analysis.get_hit_counts(), [0, 0, 0, 0, 0, 0])
 
     def test_hit_count_analysis(self):
         target_hit_count = [1, 1, 1, 0, 1, 0] # The target number of verb hits for the LO across the 6 categories
         lo = self.strands[0].learning_outcomes.first()
         lo_analysis = LearningOutcomeAnalysis.objects.create(strand_analysis=self.strand_analyses[0], learning_outcome=lo)
         lo_analysis.hit_count_analysis()
-        lo_cat_hits = LearningOutcomeCategoryHitCount.objects.filter(learning_outcome_analysis=lo_analysis).all()
-        estimated_hit_count = [lo_cat_hits.get(category=category.title).hit_count for category in self.verb_cats]
+        lo_analysis.refresh_from_db()
+        lo_cat_hits = lo_analysis.get_category_hit_counts()
+        estimated_hit_count = [lo_cat_hits[category.title] for category in self.verb_cats]
+        self.assertEqual(estimated_hit_count, target_hit_count)
+
+    def test_hit_count_analysis_with_tagged_tokens(self):
+        target_hit_count = [1, 1, 1, 0, 0, 0] # describe -> knowledge, comprehension; solve -> application
+        self.generate_children()
+        tokens = [('Students', 'student', 'NOUN'), ('can', 'can', 'AUX'), ('describe', 'describe', 'VERB'),
+                ('and', 'and', 'CCONJ'), ('solve', 'solve', 'VERB'), ('problems', 'problem', 'NOUN')]
+        lo = self.strands[0].learning_outcomes.first()
+        lo_analysis = LearningOutcomeAnalysis.objects.create(strand_analysis=self.strand_analyses[0], learning_outcome=lo)
+        lo_analysis.hit_count_analysis(tokens)
+        lo_analysis.refresh_from_db()
+        lo_cat_hits = lo_analysis.get_category_hit_counts()
+        estimated_hit_count = [lo_cat_hits[category.title] for category in self.verb_cats]
         self.assertEqual(estimated_hit_count, target_hit_count)
+
+    def test_hit_count_analysis_skips_nlp_on_cache_hit(self):
+        target_hit_count = [1, 1, 1, 0, 0, 0]
+        self.generate_children()
+        lo = self.strands[0].learning_outcomes.first()
+        tokens = [['describe', 'describe', 'VERB'], ['solve', 'solve', 'VERB']]
+        with mock.patch('analyses.models.nlp_manager.get_model_id', return_value='test-model'):
+            TaggedText.objects.create(text_hash=TaggedText.get_text_hash(TaggedText.normalise(lo.text)), model='test-model', tokens=json.dumps(tokens))
+            lo_analysis = LearningOutcomeAnalysis.objects.create(strand_analysis=self.strand_analyses[0], learning_outcome=lo)
+            with mock.patch('analyses.models.tag_texts') as tag_texts:
+                lo_analysis.hit_count_analysis()
+                tag_texts.assert_not_called()
+        lo_analysis.refresh_from_db()
+        lo_cat_hits = lo_analysis.get_category_hit_counts()
+        estimated_hit_count = [lo_cat_hits[category.title] for category in self.verb_cats]
+        self.assertEqual(estimated_hit_count, target_hit_count)
+
+
+@mock.patch('analyses.models.nlp_manager.get_model_id', return_value='test-model')
+@mock.patch('analyses.models.tag_texts', side_effect=lambda texts, progress=None: [[(word, word.lower(), 'VERB') for word in text.split()] for text in texts])
+class TestTaggedText(TestCase):
+
+    def setUp(self):
+        TaggedText.hits = TaggedText.misses = 0
+
+    def test_cache_miss_tags_and_stores_texts(self, tag_texts, get_model_id):
+        tokens = TaggedText.tag_texts(["Students can solve", "Students can read"])
+        self.assertEqual(tokens[0], [('Students', 'students', 'VERB'), ('can', 'can', 'VERB'), ('solve', 'solve', 'VERB')])
+        self.assertEqual(TaggedText.objects.filter(model='test-model').count(), 2)
+        tag_texts.assert_called_once_with(["Students can solve", "Students can read"], progress=None)
+
+    def test_cache_hit_skips_tagging(self, tag_texts, get_model_id):
+        first = TaggedText.tag_texts(["Students can solve"])
+        tag_texts.reset_mock()
+        second = TaggedText.tag_texts(["Students can solve"])
+        tag_texts.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(TaggedText.objects.get().hit_count, 1)
+
+    def test_texts_are_normalised(self, tag_texts, get_model_id):
+        TaggedText.tag_texts(["  Students can   solve "])
+        TaggedText.tag_texts(["Students can solve"])
+        self.assertEqual(TaggedText.objects.count(), 1)
+
+    def test_duplicate_texts_tagged_once(self, tag_texts, get_model_id):
+        tokens = TaggedText.tag_texts(["Students can solve", "Students can solve"])
+        self.assertEqual(tokens[0], tokens[1])
+        tag_texts.assert_called_once_with(["Students can solve"], progress=None)
+
+    def test_entries_keyed_by_model(self, tag_texts, get_model_id):
+        TaggedText.tag_texts(["Students can solve"])
+        get_model_id.return_value = 'other-model'
+        TaggedText.tag_texts(["Students can solve"])
+        self.assertEqual(tag_texts.call_count, 2)
+
+    @override_settings(ANALYSIS_PARSE_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entries_evicted(self, tag_texts, get_model_id):
+        TaggedText.tag_texts(["first"])
+        TaggedText.tag_texts(["second"])
+        TaggedText.tag_texts(["first"])     # first is now more recently used than second
+        TaggedText.tag_texts(["third"])
+        hashes = set(TaggedText.objects.values_list('text_hash', flat=True))
+        self.assertEqual(hashes, {TaggedText.get_text_hash("first"), TaggedText.get_text_hash("third")})
+
+    def test_hit_and_miss_counters(self, tag_texts, get_model_id):
+        TaggedText.tag_texts(["Students can solve", "Students can read"])
+        TaggedText.tag_texts(["Students can solve"])
+        self.assertEqual(TaggedText.get_stats(), {'hits': 1, 'misses': 2, 'entries': 2})
+
+
+class TestAnalysisSummary(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+
+    def get_document(self):
+        """ Returns the document of the summary of the analysis, as stored """
+        return json.loads(AnalysisSummary.objects.get(curriculum_analysis=self.curr_analysis).document)
+
+    def test_written_on_run(self):
+        document = self.get_document()
+        strand_analyses = [self.curr_analysis.strand_analyses.get(strand=strand) for strand in self.strands]
+        self.assertEqual(document['labels'], [verb_cat.title for verb_cat in sorted(self.verb_cats, key=lambda verb_cat: verb_cat.level)])
+        self.assertEqual(document['colours'], [strand.colour for strand in self.strands])
+        self.assertEqual(document['hitCounts'], [[strand_analysis.get_category_hit_counts()[label] for label in document['labels']] for strand_analysis in strand_analyses])
+        self.assertEqual(document['verbAverages'], [list(strand_analysis.get_verb_average().values())[0] for strand_analysis in strand_analyses])
+        self.assertEqual(document['numLOs'], 59)
+
+    def test_not_written_on_read(self):
+        AnalysisSummary.objects.all().delete()
+        curr_analysis = CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)
+        self.assertEqual(curr_analysis.get_summary().get_document()['numLOs'], 59)
+        self.assertEqual(AnalysisSummary.objects.count(), 0)
+
+    def test_rewritten_on_strand_colour_change(self):
+        strand = Strand.objects.get(pk=self.strands[1].pk)
+        strand.colour = '#123456'
+        strand.save()
+        self.assertEqual(self.get_document()['colours'][1], '#123456')
+
+    def test_rewritten_on_strand_create(self):
+        Strand.objects.create(title='New strand', curriculum=self.curr, learning_outcome_list="Left alone\r\nCan use skills of logic")
+        self.assertEqual(self.get_document()['numLOs'], 61)
+
+    def test_rewritten_on_strand_delete(self):
+        Strand.objects.get(pk=self.strands[2].pk).delete()
+        document = self.get_document()
+        self.assertEqual(len(document['colours']), 2)
+        self.assertEqual(len(document['hitCounts']), 2)
+
+    def test_not_rewritten_on_learning_outcome_change(self):
+        # Results only change when the analysis is run again
+        document = self.get_document()
+        strand = Strand.objects.get(pk=self.strands[0].pk)
+        strand.learning_outcome_list += '\r\nDescribe and evaluate algorithms'
+        strand.save()
+        self.assertEqual(self.get_document(), document)
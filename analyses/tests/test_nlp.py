@@ -0,0 +1,89 @@
+from django.test import SimpleTestCase
+
+from unittest import mock
+
+from analyses.nlp import (
+        NLPModelManager,
+        NLPModelUnavailable,
+        tag_text,
+        tag_texts,
+        )
+
+
+class TestNLPModelManager(SimpleTestCase):
+
+    def test_model_not_loaded_on_creation(self):
+        self.assertFalse(NLPModelManager().is_loaded())
+
+    def test_default_role(self):
+        with mock.patch.dict('os.environ', clear=True):
+            self.assertEqual(NLPModelManager().get_role(), NLPModelManager.COMMAND)
+
+    def test_role_from_environment(self):
+        with mock.patch.dict('os.environ', {'ANALYSIS_NLP_ROLE': 'web'}):
+            self.assertEqual(NLPModelManager().get_role(), NLPModelManager.WEB)
+
+    def test_web_process_never_loads_model(self):
+        manager = NLPModelManager()
+        manager.set_role(NLPModelManager.WEB)
+        with mock.patch('spacy.load') as spacy_load:
+            with self.assertRaises(NLPModelUnavailable):
+                manager.load()
+            spacy_load.assert_not_called()
+        self.assertFalse(manager.is_loaded())
+
+    def test_model_loaded_once_on_first_use(self):
+        manager = NLPModelManager()
+        manager.set_role(NLPModelManager.COMMAND)
+        with mock.patch('spacy.load') as spacy_load:
+            manager.load()
+            manager.load()
+            spacy_load.assert_called_once_with(manager.model_name)
+        self.assertTrue(manager.is_loaded())
+
+    def test_profile_removes_unused_components(self):
+        manager = NLPModelManager(profile='tagger')
+        nlp = mock.Mock(pipe_names=['tagger', 'parser', 'ner'])
+        manager.apply_profile(nlp)
+        self.assertEqual(nlp.remove_pipe.call_args_list, [mock.call('parser'), mock.call('ner')])
+
+    def test_full_profile_keeps_all_components(self):
+        manager = NLPModelManager(profile='full')
+        nlp = mock.Mock(pipe_names=['tagger', 'parser', 'ner'])
+        manager.apply_profile(nlp)
+        nlp.remove_pipe.assert_not_called()
+
+    def test_preload_sets_worker_role(self):
+        manager = NLPModelManager()
+        with mock.patch('spacy.load'):
+            manager.preload()
+        self.assertEqual(manager.get_role(), NLPModelManager.WORKER)
+        self.assertTrue(manager.is_loaded())
+
+
+class TestTagging(SimpleTestCase):
+
+    texts = [
+            "Students can describe a systematic process for solving problems and making decisions",
+            "Students can solve problems using skills of logic",
+            "Students can evaluate alternative solutions to computational problems",
+            ]
+
+    def test_tag_texts_returns_one_token_list_per_text(self):
+        self.assertEqual(len(tag_texts(self.texts, batch_size=2)), len(self.texts))
+
+    def test_tag_texts_matches_single_text_tagging(self):
+        self.assertEqual(tag_texts(self.texts, batch_size=2), [tag_text(text) for text in self.texts])
+
+    def test_tag_texts_reports_progress_per_batch(self):
+        progress = mock.Mock()
+        tag_texts(self.texts, batch_size=2, progress=progress)
+        self.assertEqual(progress.call_args_list, [mock.call(2), mock.call(1)])
+
+    def test_tagged_tokens(self):
+        text, lemma, pos = tag_texts(["Students can solve problems"])[0][2]
+        self.assertEqual((text, lemma, pos), ("solve", "solve", "VERB"))
+
+    def test_tagger_profile_matches_full_pipeline(self):
+        full, tagger = NLPModelManager(profile='full'), NLPModelManager(profile='tagger')
+        self.assertEqual(tag_texts(self.texts, manager=tagger), tag_texts(self.texts, manager=full))
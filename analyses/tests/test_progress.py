@@ -0,0 +1,182 @@
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from analyses.checks import check_analysis_cache
+from analyses.engine import AnalysisEngine
+from analyses.progress import AnalysisProgress
+from analyses.tasks import analyse_curriculum, save_curriculum_analysis
+from analyses.tests.test_models import SetUp
+from learning_outcomes.models import LearningOutcome
+
+
+class TestAnalysisProgress(TestCase):
+
+    def setUp(self):
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        self.progress = AnalysisProgress(1)
+
+    def test_queued(self):
+        self.progress.queue()
+        state = self.progress.get()
+        self.assertEqual(state['status'], 'queued')
+        self.assertEqual((state['done'], state['total'], state['eta']), (0, 0, None))
+
+    def test_advance(self):
+        self.progress.start({'tagging': 10, 'matching': 10, 'saving': 20})
+        self.progress.advance('tagging', 4)
+        self.progress.advance('tagging', 6)
+        self.progress.advance('matching', 10)
+        state = self.progress.get()
+        self.assertEqual(state['status'], 'running')
+        self.assertEqual(state['stages'], [
+                {'name': 'tagging', 'done': 10, 'total': 10},
+                {'name': 'matching', 'done': 10, 'total': 10},
+                {'name': 'saving', 'done': 0, 'total': 20},
+                ])
+        self.assertEqual((state['done'], state['total']), (20, 40))
+        self.assertIsNotNone(state['eta'])
+
+    def test_advance_without_start(self):
+        self.progress.advance('tagging', 1)
+        self.assertEqual(self.progress.get()['status'], None)
+
+    def test_finish(self):
+        self.progress.start({'tagging': 1})
+        self.progress.finish()
+        self.assertEqual(self.progress.get()['eta'], 0)
+        self.progress.queue()
+        self.assertEqual(self.progress.get()['stages'][0], {'name': 'tagging', 'done': 0, 'total': 0})
+
+
+    def test_claim(self):
+        self.assertEqual(self.progress.claim('inputs', 'task-1'), ('task-1', True))
+        self.assertEqual(self.progress.get()['status'], 'queued')
+        # A run of the same inputs is followed, a run of other inputs is claimed
+        self.assertEqual(self.progress.claim('inputs', 'task-2'), ('task-1', False))
+        self.assertEqual(self.progress.claim('other-inputs', 'task-3'), ('task-3', True))
+
+    def test_claim_released_when_finished(self):
+        self.progress.claim('inputs', 'task-1')
+        self.progress.finish('failed')
+        self.assertEqual(self.progress.claim('inputs', 'task-2'), ('task-2', True))
+
+    def test_claim_of_failed_task_taken_over(self):
+        self.progress.claim('inputs', 'task-1')
+        self.assertEqual(self.progress.claim('inputs', 'task-2', is_failed=lambda task_id: False), ('task-1', False))
+        self.assertEqual(self.progress.claim('inputs', 'task-3', is_failed=lambda task_id: task_id == 'task-1'), ('task-3', True))
+
+    def test_kept_in_analysis_cache(self):
+        self.progress.start({'tagging': 10})
+        self.assertEqual(caches['analyses'].get(self.progress.get_key('status')), 'running')
+        self.assertIsNone(caches['default'].get(self.progress.get_key('status')))
+
+    def test_process_local_cache_warning(self):
+        self.assertEqual(check_analysis_cache(None), [])
+        with override_settings(ANALYSIS_CACHE_ALIAS='default'):
+            self.assertEqual([warning.id for warning in check_analysis_cache(None)], ['analyses.W001'])
+
+
+class TestAnalysisProgressTracking(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        self.generate_children()
+        self.progress = AnalysisProgress(self.curr_analysis.pk)
+        self.client.force_login(self.author)
+        self.url = reverse('curricula:analyses:progress_stream', kwargs={'slug_curriculum': self.curr.slug, 'pk_curriculum': self.curr.pk, 'slug_curriculum_analysis': self.curr_analysis.slug})
+
+    def get_events(self, response):
+        """ Returns the data of the server-sent events of a streamed response """
+        content = b''.join(response.streaming_content).decode('utf-8')
+        return [json.loads(line[len('data: '):]) for line in content.split('\n') if line.startswith('data: ')]
+
+    def test_engine_reports_progress(self):
+        AnalysisEngine(self.curr_analysis).run()
+        state = self.progress.get()
+        self.assertEqual(state['status'], 'done')
+        self.assertEqual(state['stages'], [{'name': stage, 'done': 59, 'total': 59} for stage in AnalysisProgress.stages])
+
+    def test_incremental_run_without_changes(self):
+        AnalysisEngine(self.curr_analysis).run()
+        AnalysisEngine(self.curr_analysis).run(incremental=True)
+        state = self.progress.get()
+        self.assertEqual(state['status'], 'done')
+        self.assertEqual(state['total'], 0)
+
+    def test_failed_task(self):
+        with mock.patch.object(AnalysisEngine, 'prepare', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                analyse_curriculum(self.curr_analysis.pk)
+        self.assertEqual(self.progress.get()['status'], 'failed')
+
+    def test_failed_final_callback(self):
+        with mock.patch.object(AnalysisEngine, 'run', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                save_curriculum_analysis([], self.curr_analysis.pk)
+        self.assertEqual(self.progress.get()['status'], 'failed')
+
+    @override_settings(ANALYSIS_CACHE_ALIAS='default')
+    def test_stream_ends_with_run(self):
+        AnalysisEngine(self.curr_analysis).run()
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # The progress is read from the cache only, which is outside the database here (as in Redis)
+        with self.assertNumQueries(0):
+            events = self.get_events(response)
+        self.assertEqual([event['status'] for event in events], ['done'])
+        self.assertEqual(events[0]['done'], events[0]['total'])
+
+    def test_stream_follows_progress(self):
+        self.progress.queue()
+        states = iter([{'tagging': 59}, None])
+
+        def advance(seconds):
+            """ Starts and then finishes the run while the stream waits """
+            totals = next(states)
+            if totals is not None:
+                self.progress.start(totals)
+            else:
+                self.progress.finish()
+
+        with mock.patch('analyses.views.time.sleep', side_effect=advance):
+            events = self.get_events(self.client.get(self.url))
+        self.assertEqual([event['status'] for event in events], ['queued', 'running', 'done'])
+
+    def start_analysis(self):
+        """ Requests the start of the analysis. Returns the response and the mocked analysis task """
+        url = reverse('curricula:analyses:progress', kwargs={'slug_curriculum': self.curr.slug, 'pk_curriculum': self.curr.pk, 'slug_curriculum_analysis': self.curr_analysis.slug})
+        with mock.patch('analyses.views.analyse_curriculum') as mock_task:
+            response = self.client.get(url)
+        return response, mock_task
+
+    def test_start_analysis_follows_final_callback(self):
+        response, mock_task = self.start_analysis()
+        mock_task.delay.assert_called_once_with(self.curr_analysis.pk, incremental=True, final_task_id=response.context['task_id'])
+        self.assertEqual(self.progress.get()['status'], 'queued')
+
+    def test_start_analysis_attaches_to_run_in_flight(self):
+        response, mock_task = self.start_analysis()
+        attached_response, attached_mock_task = self.start_analysis()
+        attached_mock_task.delay.assert_not_called()
+        self.assertEqual(attached_response.context['task_id'], response.context['task_id'])
+
+    def test_start_analysis_of_unchanged_inputs(self):
+        AnalysisEngine(self.curr_analysis).run()
+        response, mock_task = self.start_analysis()
+        mock_task.delay.assert_not_called()
+        self.assertRedirects(response, self.curr.get_absolute_url(), fetch_redirect_response=False)
+        # A change of the LO texts requires a new run
+        lo = self.strands[0].learning_outcomes.first()
+        LearningOutcome.objects.filter(pk=lo.pk).update(text='Describe and evaluate algorithms')
+        response, mock_task = self.start_analysis()
+        mock_task.delay.assert_called_once()
+
+    def test_stream_forbidden(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
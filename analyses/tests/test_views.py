@@ -0,0 +1,218 @@
+import io
+import json
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.core.cache import caches
+from django.conf import settings
+
+from analyses.engine import AnalysisEngine
+from analyses.models import AnalysisSummary, CurriculumAnalysis
+from analyses.progress import AnalysisProgress
+from analyses.tests.test_models import SetUp
+from learning_outcomes.models import LearningOutcome
+from strands.models import Strand
+
+
+class TestCurriculumAnalysisProgressView(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        self.generate_children()
+        self.run = AnalysisEngine(self.curr_analysis).run()
+        self.client.force_login(self.author)
+        self.url = reverse('curricula:analyses:progress', kwargs={'slug_curriculum': self.curr.slug, 'pk_curriculum': self.curr.pk, 'slug_curriculum_analysis': self.curr_analysis.slug})
+
+    def test_unchanged_inputs_are_not_run(self):
+        with mock.patch('analyses.views.analyse_curriculum.delay') as mock_delay:
+            response = self.client.get(self.url)
+        self.assertRedirects(response, self.curr.get_absolute_url(), fetch_redirect_response=False)
+        mock_delay.assert_not_called()
+
+    def test_run_in_progress_is_followed(self):
+        LearningOutcome.objects.filter(strand=self.strands[0]).update(text='Describe and evaluate algorithms')
+        AnalysisProgress(self.curr_analysis.pk).claim(self.curr_analysis.get_fingerprint(), 'task-1')
+        with mock.patch('analyses.views.AsyncResult') as mock_result, mock.patch('analyses.views.analyse_curriculum.delay') as mock_delay:
+            mock_result.return_value.failed.return_value = False
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['task_id'], 'task-1')
+        mock_delay.assert_not_called()
+
+    def test_failed_run_is_not_followed(self):
+        LearningOutcome.objects.filter(strand=self.strands[0]).update(text='Describe and evaluate algorithms')
+        AnalysisProgress(self.curr_analysis.pk).claim(self.curr_analysis.get_fingerprint(), 'task-1')
+        # The final task failed without releasing the claim, e.g. its worker was lost
+        with mock.patch('analyses.views.AsyncResult') as mock_result, mock.patch('analyses.views.analyse_curriculum.delay') as mock_delay:
+            mock_result.return_value.failed.return_value = True
+            response = self.client.get(self.url)
+        mock_result.assert_called_once_with('task-1')
+        self.assertNotEqual(response.context['task_id'], 'task-1')
+        mock_delay.assert_called_once()
+
+    def test_taxonomy_switch_is_run(self):
+        # Switch the analysis to another taxonomy at the same version
+        other_tax = self.create_other_taxonomy(self.run.taxonomy_version)
+        CurriculumAnalysis.objects.filter(pk=self.curr_analysis.pk).update(taxonomy=other_tax)
+        with mock.patch('analyses.views.analyse_curriculum.delay') as mock_delay:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        mock_delay.assert_called_once()
+        # Once run, the analysis is up to date with the results of the other taxonomy
+        curr_analysis = CurriculumAnalysis.objects.get(pk=self.curr_analysis.pk)
+        AnalysisEngine(curr_analysis).run(incremental=True)
+        self.assertEqual(sorted(curr_analysis.strand_analyses.first().get_category_hit_counts()), sorted(verb_cat.title for verb_cat in other_tax.verb_categories.all()))
+        caches[settings.ANALYSIS_CACHE_ALIAS].clear()
+        with mock.patch('analyses.views.analyse_curriculum.delay') as mock_delay:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        mock_delay.assert_not_called()
+
+
+class TestCurriculumDashboardDataView(SetUp):
+
+    chart_url_names = {
+            'hitCount': 'curriculum_hit_count_data',
+            'diversity': 'curriculum_diversity_data',
+            'averageVerbs': 'curriculum_average_verbs_data',
+            'averageCategories': 'curriculum_average_categories_data',
+            }
+
+    def setUp(self):
+        super().setUp()
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        self.client.force_login(self.author)
+        self.url = reverse('curricula:analyses:curriculum_dashboard_data', kwargs={'slug_curriculum': self.curr.slug, 'pk_curriculum': self.curr.pk})
+
+    def test_matches_chart_data_views(self):
+        analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        AnalysisEngine(analysis).run()
+        data = json.loads(self.client.get(self.url).content)['analyses']
+        self.assertEqual(sorted(data), sorted([str(self.curr_analysis.pk), str(analysis.pk)]))
+        for curr_analysis in (self.curr_analysis, analysis):
+            for key, url_name in self.chart_url_names.items():
+                url = reverse(f'curricula:analyses:{url_name}', kwargs={'slug_curriculum': self.curr.slug, 'pk_curriculum': self.curr.pk, 'slug_curriculum_analysis': curr_analysis.slug})
+                self.assertEqual(data[str(curr_analysis.pk)][key], json.loads(self.client.get(url).content))
+
+    def test_num_queries(self):
+        # The data of all analyses is read from their summaries in one query (besides their dates for the ETag)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        for _ in range(3):
+            AnalysisEngine(CurriculumAnalysis.objects.create(**self.curr_analysis_params)).run()
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(len(json.loads(response.content)['analyses']), 4)
+
+    def test_summaries_not_written(self):
+        # An analysis created before summaries were stored is served without writing its summary
+        analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        AnalysisEngine(analysis).run()
+        analysis.summary.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(len(json.loads(response.content)['analyses']), 2)
+        self.assertFalse(AnalysisSummary.objects.filter(curriculum_analysis=analysis).exists())
+        # Until the summaries are backfilled
+        call_command('write_analysis_summaries', stdout=io.StringIO())
+        self.assertTrue(AnalysisSummary.objects.filter(curriculum_analysis=analysis).exists())
+
+    def test_new_analysis_has_summary(self):
+        analysis = CurriculumAnalysis.objects.create(**self.curr_analysis_params)
+        self.assertTrue(AnalysisSummary.objects.filter(curriculum_analysis=analysis).exists())
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        # Session, user, curriculum and summary dates only, the summaries are not read
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_after_new_analysis(self):
+        etag = self.client.get(self.url)['ETag']
+        AnalysisEngine(CurriculumAnalysis.objects.create(**self.curr_analysis_params)).run()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['analyses']), 2)
+
+    def test_private_curriculum(self):
+        self.client.logout()
+        self.curr.public = False
+        self.curr.save()
+        # Anonymous users are redirected to the login page
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class TestCurriculumChartDataViews(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.generate_children()
+        AnalysisEngine(self.curr_analysis).run()
+        self.client.force_login(self.author)
+        self.url = reverse('curricula:analyses:curriculum_hit_count_data', kwargs={'slug_curriculum': self.curr.slug, 'pk_curriculum': self.curr.pk, 'slug_curriculum_analysis': self.curr_analysis.slug})
+
+    def test_hit_count_data(self):
+        data = json.loads(self.client.get(self.url).content)
+        self.assertEqual(data['colours'], [strand.colour for strand in self.strands])
+        self.assertEqual(data['data'][0], [self.curr_analysis.strand_analyses.get(strand=self.strands[0]).get_category_hit_counts()[label] for label in data['labels']])
+        self.assertEqual(data['numLOs'], 59)
+
+    def test_served_from_summary(self):
+        # One query for the analysis, its curriculum and summary, and one for the document of the
+        # summary on a chart cache miss, besides the session and user
+        caches[settings.CHART_CACHE_ALIAS].clear()
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+    def test_strand_colour_change(self):
+        self.strands[0].colour = '#123456'
+        self.strands[0].save()
+        data = json.loads(self.client.get(self.url).content)
+        self.assertEqual(data['colours'][0], '#123456')
+
+    def test_strand_added_after_run(self):
+        # The new strand has no results until the next run, so it is not labelled either
+        Strand.objects.create(title='New strand', curriculum=self.curr, learning_outcome_list="Can use skills of logic")
+        data = json.loads(self.client.get(self.url).content)
+        self.assertEqual(data['colours'], [strand.colour for strand in self.strands])
+        self.assertEqual(len(data['data']), len(self.strands))
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        # Session, user and analysis only, the summary is not decoded
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_after_run(self):
+        etag = self.client.get(self.url)['ETag']
+        AnalysisEngine(self.curr_analysis).run()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_modified_after_strand_colour_change(self):
+        etag = self.client.get(self.url)['ETag']
+        self.strands[0].colour = '#123456'
+        self.strands[0].save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_served_from_chart_cache(self):
+        self.client.get(self.url)
+        self.strands[0].colour = '#123456'
+        self.strands[0].save()
+        caches[settings.CHART_CACHE_ALIAS].clear()
+        # A miss reads the document of the summary
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        with self.assertNumQueries(3):
+            data = json.loads(self.client.get(self.url).content)
+        self.assertEqual(data['colours'][0], '#123456')
+
+    def test_chart_cache_invalidated_on_run(self):
+        self.client.get(self.url)
+        self.curr_analysis.strand_analyses.get(strand=self.strands[0]).strand_category_hit_counts.update(hit_count=100)
+        self.curr_analysis.write_summary()
+        data = json.loads(self.client.get(self.url).content)
+        self.assertEqual(data['data'][0], [100] * 6)
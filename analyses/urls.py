@@ -3,18 +3,22 @@ from django.urls import path
 from .views import (
         CurriculumAnalysisCreateView,
         CurriculumAnalysisProgressView,
+        CurriculumAnalysisProgressStreamView,
         CurriculumAnalysisUpdateView,
         CurriculumAnalysisDeleteView,
         CurriculumHitCountDataView,
         CurriculumDiversityDataView,
         CurriculumAverageVerbsDataView,
         CurriculumAverageCategoriesDataView,
+        CurriculumDashboardDataView,
         )
 from . import views
 
 urlpatterns = [
         path('<int:pk_curriculum>/analysis/new/', CurriculumAnalysisCreateView.as_view(), name='create'),
+        path('<int:pk_curriculum>/dashboard_data/', CurriculumDashboardDataView.as_view(), name='curriculum_dashboard_data'),
         path('<int:pk_curriculum>/<slug:slug_curriculum_analysis>/start_analysis', CurriculumAnalysisProgressView.as_view(), name='progress'),
+        path('<int:pk_curriculum>/<slug:slug_curriculum_analysis>/progress_stream/', CurriculumAnalysisProgressStreamView.as_view(), name='progress_stream'),
         path('<int:pk_curriculum>/<slug:slug_curriculum_analysis>/update/', CurriculumAnalysisUpdateView.as_view(), name='update'),
         path('<int:pk_curriculum>/<slug:slug_curriculum_analysis>/delete/', CurriculumAnalysisDeleteView.as_view(), name='delete'),
         path('<int:pk_curriculum>/<slug:slug_curriculum_analysis>/curriculum_hit_count_data/', CurriculumHitCountDataView.as_view(), name='curriculum_hit_count_data'),
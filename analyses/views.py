@@ -1,6 +1,7 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
-from django.http import Http404, JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
@@ -16,14 +17,18 @@ from django.views.generic import (
         DeleteView
         )
 
+from utils.views import ConditionalDataMixin
+
 from curricula.models import Curriculum
 from .models import CurriculumAnalysis
-from taxonomies.models import CustomUserTaxonomy as Taxonomy
+from .progress import AnalysisProgress
 
-import collections
+import hashlib
+import json
+import time
 
-from .tasks import analyse_curriculum, task_complete
-from celery import chord
+from .tasks import analyse_curriculum
+from celery.utils import uuid
 from celery.result import AsyncResult
 
 from .forms import CurriculumAnalysisCreateForm, CurriculumAnalysisUpdateForm
@@ -84,11 +89,21 @@ class CurriculumAnalysisProgressView(LoginRequiredMixin, UserPassesTestMixin, Te
         except Curriculum.DoesNotExist:
             raise Http404("The curriculum does not exist!")
         else:
-            task = analyse_curriculum.si(target_analysis.pk)
-            callback = task_complete.si()
-            callback_task_id = chord(task)(callback)
+            # Nothing to run if the inputs of the analysis are unchanged since its latest run
+            fingerprint = target_analysis.get_fingerprint()
+            latest_run = target_analysis.get_latest_run()
+            if latest_run is not None and latest_run.fingerprint == fingerprint:
+                messages.info(request, "The analysis is already up to date!")
+                return redirect(curriculum)
+            # The task graph of the run ends with a final callback which only completes once all
+            # the results are saved. Its id is allocated here, so that its status can be followed.
+            # A run of the same inputs already queued or running is followed rather than duplicated,
+            # unless its final task failed without releasing the claim
+            final_task_id, claimed = AnalysisProgress(target_analysis.pk).claim(fingerprint, uuid(), is_failed=lambda task_id: AsyncResult(task_id).failed())
+            if claimed:
+                analyse_curriculum.delay(target_analysis.pk, incremental=True, final_task_id=final_task_id)
             context = {
-                'task_id': callback_task_id,
+                'task_id': final_task_id,
                 'analysis': target_analysis,
                 }
             return render(request, template_name="curriculum_analysis_progress.html", context=context)
@@ -103,6 +118,48 @@ class CurriculumAnalysisProgressView(LoginRequiredMixin, UserPassesTestMixin, Te
         return self.request.user == target_curriculum.author
 
 
+class CurriculumAnalysisProgressStreamView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """ A view streaming the progress of a curriculum analysis run as server-sent events, with one
+    event each time the progress changes, until the run is done or failed. The progress is read from
+    the analysis cache, shared with the workers, so with Redis the stream makes no database query
+    after the permission check """
+
+    def get_curriculum_analysis(self):
+        """ Get the target curriculum analysis with its curriculum """
+        if not hasattr(self, 'curriculum_analysis'):
+            analyses = CurriculumAnalysis.objects.select_related('curriculum')
+            self.curriculum_analysis = get_object_or_404(analyses, slug=self.kwargs.get('slug_curriculum_analysis'))
+        return self.curriculum_analysis
+
+    def test_func(self):
+        """ Ensure the user requesting the view is the author of the curriculum """
+        return self.request.user.pk == self.get_curriculum_analysis().curriculum.author_id
+
+    def get(self, request, **kwargs):
+        progress = AnalysisProgress(self.get_curriculum_analysis().pk)
+        response = StreamingHttpResponse(self.stream(progress), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Prevent proxies from buffering the events
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, progress):
+        """ Yields the progress of the run as server-sent events. The stream ends when the run ends
+        (or is unknown) or after ANALYSIS_PROGRESS_STREAM_TIMEOUT seconds, in which case the
+        browser reconnects """
+        deadline = time.monotonic() + settings.ANALYSIS_PROGRESS_STREAM_TIMEOUT
+        yield "retry: 1000\n\n"
+        previous = None
+        while True:
+            state = progress.get()
+            if state != previous:
+                yield f"data: {json.dumps(state)}\n\n"
+                previous = state
+            if state['status'] in ('done', 'failed', None) or time.monotonic() >= deadline:
+                return
+            time.sleep(settings.ANALYSIS_PROGRESS_STREAM_INTERVAL)
+
+
 class CurriculumAnalysisUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = CurriculumAnalysis
     form_class = CurriculumAnalysisUpdateForm
@@ -148,182 +205,120 @@ class CurriculumAnalysisDeleteView(LoginRequiredMixin, UserPassesTestMixin, Dele
 
 
 class CurriculumDataMixin:
-    """ A mixin for curriculum analysis data  aggregation views """
+    """ A mixin for curriculum analysis data views, whose data is served from the summary of the analysis """
 
     def test_permissions(self):
-        """ Ensure the curriculum is public """
-        curriculum_analysis = self.get_curriculum_analysis()
-        return True if self.request.user == curriculum_analysis.get_author() else curriculum_analysis.get_curriculum().public
+        """ Ensure the user is the author or the curriculum is public """
+        curriculum = self.get_curriculum_analysis().curriculum
+        return True if self.request.user.pk == curriculum.author_id else curriculum.public
 
     def get_curriculum_analysis(self, **kwargs):
-        """ Get the target curriculum analysis """
-        slug_analysis = self.kwargs.get('slug_curriculum_analysis', None)
-        if slug_analysis is not None:
-            analysis = get_object_or_404(CurriculumAnalysis, slug=slug_analysis)
-        return analysis
+        """ Get the target curriculum analysis, with its curriculum and summary """
+        if not hasattr(self, 'curriculum_analysis'):
+            # The document of the summary is only read when the data is not in the chart cache
+            analyses = CurriculumAnalysis.objects.select_related('curriculum', 'summary').defer('summary__document')
+            self.curriculum_analysis = get_object_or_404(analyses, slug=self.kwargs.get('slug_curriculum_analysis'))
+        return self.curriculum_analysis
 
-    def get_ordered_verb_categories(self, taxonomy, **kwargs):
-        """ Get the verb categories of a taxonomy ordered by level of abstraction """
-        return [verb_cat.title for verb_cat in taxonomy.verb_categories.all().order_by('level')]
+    def get_summary(self):
+        """ Get the summary of the target curriculum analysis """
+        return self.get_curriculum_analysis().get_summary()
 
-    def get_ordered_strands(self, curriculum_analysis, **kwargs):
-        """ Get the strands ordered by strand date creation """
-        return curriculum_analysis.curriculum.strands.all().order_by('date_created')
+    def get_etag(self):
+        """ The summary of the analysis is rewritten whenever its results change """
+        summary = self.get_summary()
+        return f"analysis-{summary.curriculum_analysis_id}-{summary.date_updated.timestamp()}"
 
-    def get_ordered_strand_analyses(self, curriculum_analysis, ordered_strands, **kwargs):
-        """ Get the strand analyses of a curricuum analysis ordered by strand date creation """
-        return [strand_analysis for strand in ordered_strands for strand_analysis in curriculum_analysis.strand_analyses.all() if strand_analysis.strand == strand]
+    def get_last_modified(self):
+        """ The date the summary of the analysis was last written """
+        return self.get_summary().date_updated
 
-    def get_ordered_strand_colours(self, ordered_strands, **kwargs):
-        """ Get the ordered strand colours """
-        return [strand.colour for strand in ordered_strands]
+    def get_cache_object(self):
+        """ The chart cache entries of the analysis are invalidated when its summary is written """
+        return ('analysis', self.get_curriculum_analysis().pk)
 
-class CurriculumHitCountDataView(CurriculumDataMixin, UserPassesTestMixin, View):
+class CurriculumHitCountDataView(CurriculumDataMixin, ConditionalDataMixin, UserPassesTestMixin, View):
 
     """ Aggregate data and return a JSON response for curriculum analysis chart rendering """
 
     def test_func(self):
         return self.test_permissions()
 
-    def get(self, request, **kwargs):
-        # Get the target curriculum analysis and taxonomy
-        curriculum_analysis = self.get_curriculum_analysis()
-        taxonomy = curriculum_analysis.get_taxonomy()
+    def get_data(self):
+        # The category hits of each strand (ordered by creation date) and verb category (ordered by level)
+        return self.get_summary().get_hit_count_data()
 
-        # Order the verb categories by level of abstraction
-        verb_cats = self.get_ordered_verb_categories(taxonomy)
-
-        strands = self.get_ordered_strands(curriculum_analysis)
-
-        # Order the strand analyses by strand date creation (inverse to curriculum grid side-bar)
-        strand_analyses = self.get_ordered_strand_analyses(curriculum_analysis, strands)
-
-        # Get the total num of los and strand colours (ordered as above)
-        num_los = curriculum_analysis.get_num_learning_outcomes()
-        colours = self.get_ordered_strand_colours(strands)
-
-        # Order the category occurrences for each strand in the same order as above
-        category_hit_counts = [strand_analysis.get_category_hit_counts() for strand_analysis in strand_analyses]
-
-        # Get the category hits for each strand and verb category, ordered by strand (creation date) and cat level
-        data = []
-        for index, strand in enumerate(category_hit_counts):
-            data.append([])
-            data[index] = [strand.get(cat) for cat in verb_cats]
-
-        return JsonResponse(data={
-            'labels': verb_cats,
-            'colours': colours,
-            'data': data,
-            'numLOs': num_los,
-            'analysisPk': curriculum_analysis.pk,
-            })
-
-class CurriculumDiversityDataView(CurriculumDataMixin, UserPassesTestMixin, View):
+class CurriculumDiversityDataView(CurriculumDataMixin, ConditionalDataMixin, UserPassesTestMixin, View):
     """ Aggregate data and return a JSON response for curriculum diversity chart rendering """
 
     def test_func(self):
         return self.test_permissions()
 
-    def get(self, request, **kwargs):
-        # Get the target curriculum analysis and total number of verb categories
-        curriculum_analysis = self.get_curriculum_analysis()
-        num_categories = curriculum_analysis.get_taxonomy().verb_categories.count()
-
-        # Order the strand analyses by strand date creation (inverse to curriculum grid side-bar)
-        strands = self.get_ordered_strands(curriculum_analysis)
-        strand_analyses = self.get_ordered_strand_analyses(curriculum_analysis, strands)
+    def get_data(self):
+        # The category diversities of each strand (ordered by creation date) and number of categories
+        return self.get_summary().get_diversity_data()
 
-        # Get the total number of los and strand colours (ordered as above)
-        num_los = curriculum_analysis.get_num_learning_outcomes()
-        colours = self.get_ordered_strand_colours(strands)
 
-        # Order the category diversities for each strand in the same order as above
-        category_diversities = [strand_analysis.get_category_diversities() for strand_analysis in strand_analyses]
-
-        # Labels are numbers of verb categories
-        labels = [i for i in range(0, num_categories + 1)]
-
-        # Get the category diversities for each strand and category number, ordered by strand (creation date) and cat number
-        data = []
-        for index, strand in enumerate(category_diversities):
-            data.append([])
-            data[index] = [strand.get(label) for label in labels]
-
-        return JsonResponse(data={
-            'labels': labels,
-            'colours': colours,
-            'data': data,
-            'numLOs': num_los,
-            'analysisPk': curriculum_analysis.pk,
-            })
-
-
-class CurriculumAverageVerbsDataView(CurriculumDataMixin, UserPassesTestMixin, View):
+class CurriculumAverageVerbsDataView(CurriculumDataMixin, ConditionalDataMixin, UserPassesTestMixin, View):
     """ Return a JSON response giving the average verbs per lo (over each strand) of a curriculum analysis """
 
     def test_func(self):
         return self.test_permissions()
 
-    def get(self, request, **kwargs):
-        # Get the target curriculum analysis
-        curriculum_analysis = self.get_curriculum_analysis()
-
-        # Order the strand analyses by strand date creation (inverse to curriculum grid side-bar)
-        strands = self.get_ordered_strands(curriculum_analysis)
-        strand_analyses = self.get_ordered_strand_analyses(curriculum_analysis, strands)
-
-        # Get the strand colours (ordered as above)
-        colours = self.get_ordered_strand_colours(strands)
-
-        # Order the verb averages averages for each strand in the same order as above
-        verb_averages = [strand_analysis.get_verb_average() for strand_analysis in strand_analyses] # A list of average verb number in each strand
-
-        # Labels are blank but needed for chartjs (length equal to num of strands)
-        labels = ["" for _ in range(len(strand_analyses))]
+    def get_data(self):
+        # The verb averages of each strand, ordered by strand creation date
+        return self.get_summary().get_average_verbs_data()
 
-        # Get the averages for each strand, ordered by strand creation date
-        data = [strand_average.get(average) for strand_average in verb_averages for average in strand_average]
-
-        return JsonResponse(data={
-            'colours': colours,
-            'labels': labels,
-            'data': data,
-            'analysisPk': curriculum_analysis.pk,
-            })
-
-class CurriculumAverageCategoriesDataView(CurriculumDataMixin, UserPassesTestMixin, View):
+class CurriculumAverageCategoriesDataView(CurriculumDataMixin, ConditionalDataMixin, UserPassesTestMixin, View):
     """ Return a JSON response giving the average categories per lo (over each strand) of a curriculum analysis """
     def test_func(self):
         return self.test_permissions()
 
-    def get(self, request, **kwargs):
-        # Get the target curriculum analysis
-        curriculum_analysis = self.get_curriculum_analysis()
-
-        # Order the strand analyses by strand date creation (inverse to curriculum grid side-bar)
-        strands = self.get_ordered_strands(curriculum_analysis)
-        strand_analyses = self.get_ordered_strand_analyses(curriculum_analysis, strands)
-
-        # Get the strand colours (ordered as above)
-        colours = self.get_ordered_strand_colours(strands)
+    def get_data(self):
+        # The category averages of each strand, ordered by strand creation date
+        return self.get_summary().get_average_categories_data()
 
-        # Order the category averages for each strand in the same order as above
-        category_averages = [strand_analysis.get_category_average() for strand_analysis in strand_analyses] # A list of average category number in each strand
+class CurriculumDashboardDataView(ConditionalDataMixin, UserPassesTestMixin, View):
+    """ Return a JSON response giving the data of the four charts of every analysis of a curriculum,
+    in the same format as the chart data views of a single analysis. The curriculum dashboard makes
+    this single request instead of four requests per analysis, and the data of all analyses is read
+    from their summaries in one query """
 
+    def get_curriculum(self):
+        """ Get the target curriculum from the url """
+        if not hasattr(self, 'curriculum'):
+            self.curriculum = get_object_or_404(Curriculum, pk=self.kwargs.get('pk_curriculum'))
+        return self.curriculum
 
-        # Labels are blank but needed for chartjs (length equal to num of strands)
-        labels = ["" for _ in range(len(strand_analyses))]
-
-        # Get the averages for each strand, ordered by strand creation date
-        data = [strand_average.get(average) for strand_average in category_averages for average in strand_average]
-
-        return JsonResponse(data={
-            'colours': colours,
-            'labels': labels,
-            'data': data,
-            'analysisPk': curriculum_analysis.pk,
-            })
+    def test_func(self):
+        """ Ensure the user is the author or the curriculum is public """
+        curriculum = self.get_curriculum()
+        return True if self.request.user.pk == curriculum.author_id else curriculum.public
+
+    def get_summary_dates(self):
+        """ Get the (analysis pk, summary date) pairs of the analyses of the curriculum, without their summaries """
+        if not hasattr(self, 'summary_dates'):
+            self.summary_dates = list(self.get_curriculum().curriculum_analyses.order_by('-date_created').values_list('pk', 'summary__date_updated'))
+        return self.summary_dates
+
+    def get_etag(self):
+        """ The data changes when an analysis is added or deleted, or when the summary of an analysis is rewritten """
+        stamps = ''.join(f"{analysis_pk}:{date.timestamp() if date is not None else ''}\n" for analysis_pk, date in self.get_summary_dates())
+        return f"curriculum-{self.get_curriculum().pk}-{hashlib.sha256(stamps.encode('utf-8')).hexdigest()}"
+
+    def get_last_modified(self):
+        """ The date the most recent summary of the analyses was written """
+        return max((date for analysis_pk, date in self.get_summary_dates() if date is not None), default=None)
+
+    def get_cache_object(self):
+        """ The chart cache entries of the curriculum are invalidated when the summary of one of its analyses is written """
+        return ('curriculum', self.get_curriculum().pk)
+
+    def get_data(self):
+        analyses = self.get_curriculum().curriculum_analyses.select_related('summary').order_by('-date_created')
+        return {
+            'analyses': {analysis.pk: analysis.get_summary().get_chart_data() for analysis in analyses},
+            }
 
 def curriculum_analysis_progress_data(request, **kwargs):
     """ Return a JSON response giving the status of a curriculum analysis task """
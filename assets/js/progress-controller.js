@@ -1,15 +1,19 @@
 export default class ProgressController{
-    contructor(dataUrl=null, successUrl=null, analysisPk=null, taskStatus=null){
-        this.dataUrl = url;
+    constructor(dataUrl=null, streamUrl=null, successUrl=null, taskStatus=null){
+        this.dataUrl = dataUrl;
+        this.streamUrl = streamUrl; // The url streaming the progress of the analysis run
         this.successUrl = successUrl;
-        this.analyisPk = analysisPk; // The primary key of the analysis in process
-        this.taskStatus = taskStatus; // The percentage completion of the back-end tasks
+        this.taskStatus = taskStatus; // The status of the analysis run, e.g. 'running' or 'done'
     }
 
     getDataUrl(element){
         /* grabs the url containing the json data from a DOM element */
         this.dataUrl = element.getAttribute('data-url');
     }
+    getStreamUrl(element){
+        /* grabs the url streaming the progress events from a DOM element */
+        this.streamUrl = element.getAttribute('data-stream-url');
+    }
     getSuccessUrl(element){
         /* grabs the success url to redirect to */
         this.successUrl = element.getAttribute('success-url');
@@ -36,6 +40,39 @@ export default class ProgressController{
             .catch( error => console.log(`Error: ${error.message}`));
     }
 
+    listen(heading, progressBar){
+        /* Listens to the progress events streamed by the server and updates the view accordingly,
+         * until the analysis run is done or failed */
+        const source = new EventSource(this.streamUrl);
+        source.addEventListener('message', event => {
+            const progress = JSON.parse(event.data);
+            this.taskStatus = progress.status;
+            this.renderProgress(progressBar, progress);
+            if (progress.status === 'done'){
+                source.close();
+                this.renderPendingView(heading);
+                this.renderSuccessView(heading);
+            }
+            else if (progress.status === 'failed' || progress.status === null){
+                source.close();
+                this.renderFailureView(heading);
+            }
+            else
+                this.renderPendingView(heading);
+        });
+    }
+
+    renderProgress(progressBar, progress){
+        /* Sets the width and label of the progress bar from the processed and total LOs of the run */
+        const percentComplete = progress.total ? Math.floor(100 * progress.done / progress.total) : (progress.status === 'done' ? 100 : 0);
+        progressBar.style.setProperty('--width', percentComplete);
+        const stage = progress.stages.find(stage => stage.done < stage.total);
+        let label = stage ? `${stage.name}: ${stage.done}/${stage.total} LOs` : `${percentComplete}%`;
+        if (progress.eta)
+            label += ` (about ${Math.ceil(progress.eta)}s left)`;
+        progressBar.setAttribute('text-label', label);
+    }
+
     renderInitialView(heading){
         /* Injects an initial analysis successfully created message into the DOM */
 
@@ -65,6 +102,16 @@ export default class ProgressController{
             heading.appendChild(infoMsg)
         }
     }
+    renderFailureView(heading){
+        /* Replaces the current message with an error alert msg */
+        const currentMsg = heading.querySelector('div.alert');
+        if (currentMsg)
+            currentMsg.remove()
+        const errorMsg = document.createElement('div');
+        errorMsg.classList.add('alert', 'alert-danger');
+        errorMsg.textContent = "The analysis could not be completed, please try again later."
+        heading.appendChild(errorMsg)
+    }
     renderSuccessView(heading){
         /* Removes the info message and replaces it with a success alert msg
          * and a link to the analysis */
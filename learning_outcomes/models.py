@@ -1,6 +1,5 @@
 from django.db import models
 from utils.slugs import unique_slugify
-import spacy
 
 class LearningOutcome(models.Model):
     """
@@ -1,3 +1,5 @@
+import fetchDashboardData from './curriculum_dashboard_data.js';
+
 export default class ChartRender {
     constructor(url=null, colours=null, chartTitle=null, analysisPk=null, chartLabelString=null){
         this.dataUrl = url;
@@ -10,8 +12,19 @@ export default class ChartRender {
     }
 
     setDataUrl(chartDivBox){
-        /* grabs the url containing the json data */
+        /* grabs the url containing the json data, or for the charts of the curriculum dashboard
+         * the analysis and chart keys of its data in the batched dashboard data */
         this.dataUrl = chartDivBox.getAttribute('data-url');
+        this.dashboardAnalysisPk = chartDivBox.getAttribute('data-analysis-pk');
+        this.dashboardKey = chartDivBox.getAttribute('data-dashboard-key');
+    }
+
+    fetchData(){
+        /* Returns a promise of the json data of the chart. The charts of the curriculum dashboard
+         * share a single request for the data of all the analyses of the curriculum */
+        if (this.dashboardKey)
+            return fetchDashboardData().then(data => data.analyses[this.dashboardAnalysisPk][this.dashboardKey]);
+        return fetch(this.dataUrl).then(response => response.json());
     }
 
     extractUrlData(data){
@@ -26,8 +39,7 @@ export default class ChartRender {
     }
     fetchFormatRender(){
     /* Fetch the json url data, format the data and plot the chart */
-        fetch(this.dataUrl)
-            .then(response => response.json())
+        this.fetchData()
             .then(data => {
                 this.extractUrlData(data);
                 this.formatDataChart();     // Each subclass has their own version of this method
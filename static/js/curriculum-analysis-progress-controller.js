@@ -9,14 +9,16 @@ import ProgressController from './progress-controller.js';
     // The progress controller fetches analysis task info and renders appropriate view
     const progressController = new ProgressController();
 
-    // Get the data-url for the controller from the heading element
+    // The progress bar of the analysis run
+    const progressBar = document.getElementById('analysis-progress-bar');
+
+    // Get the data-url and the progress stream url for the controller from the heading element
     progressController.getDataUrl(heading);
+    progressController.getStreamUrl(heading);
 
     // Render the initial success view
     progressController.renderInitialView(heading);
 
-    // Update the view periodically
-    setInterval(() => {
-        progressController.updateView(heading);
-    }, 100)
+    // Update the view as the progress events are streamed by the server
+    progressController.listen(heading, progressBar);
 })();
@@ -0,0 +1,13 @@
+let dashboardData = null;
+
+export default function fetchDashboardData(){
+    /* Fetches the chart data of all the analyses of the curriculum dashboard, from the url given
+     * by the data-url attribute of the dashboard element. The data is only requested once per
+     * page, the promise being shared by all the charts (including when they are re-rendered
+     * after a strand colour change) */
+    if (dashboardData === null){
+        const url = document.querySelector('#curriculum-dashboard').getAttribute('data-url');
+        dashboardData = fetch(url).then(response => response.json());
+    }
+    return dashboardData;
+};
@@ -1,19 +1,25 @@
 from django.urls import reverse
-from utils.slugs import unique_slugify
+from utils.slugs import unique_slugify, unique_slugify_batch
 
-from django.db import models
+from django.db import models, transaction
 
 from utils.get import CurriculumGetMethods, AuthorGetMethods
+from utils.models import TrackedFieldsMixin
 
 from accounts.models import CustomUser
 from curricula.models import Curriculum
 from learning_outcomes.models import LearningOutcome
 
-class Strand(models.Model, CurriculumGetMethods, AuthorGetMethods):
+from .signals import strand_saved
+
+class Strand(TrackedFieldsMixin, models.Model, CurriculumGetMethods, AuthorGetMethods):
     """
 
     A class to manage the learning outcome strands of a curriculum.
     A curriculum is connected with a collection of strands which are tied to no other curriculum.
+    The LOs of a strand are only regenerated when its learning_outcome_list is changed, e.g. not
+    when its colour is updated. Changes to its title or colour are picked up by the summaries of
+    the curriculum analyses (see analyses.signals).
 
     """
 
@@ -24,6 +30,7 @@ class Strand(models.Model, CurriculumGetMethods, AuthorGetMethods):
     learning_outcome_list = models.TextField(default='')
     slug = models.SlugField(max_length=200, unique=True, blank=True)
 
+    tracked_fields = ('title', 'colour', 'learning_outcome_list')
 
     class Meta:
         verbose_name = 'Strand'
@@ -34,13 +41,15 @@ class Strand(models.Model, CurriculumGetMethods, AuthorGetMethods):
         return self.title
 
     def save(self, *args, **kwargs):
-        created = self.pk is None
+        created = self._state.adding
         slug_str = f"{self.curriculum.pk} {self.title}"
         unique_slugify(self, slug_str)
         super(Strand, self).save(*args, **kwargs)
-        if created or not self._state.adding: # Second for updating
+        if self.has_changed('learning_outcome_list'): # Always True for a new strand
             cleaned_learning_outcomes = self.get_cleaned_learning_outcomes()
             self.generate_learning_outcomes(cleaned_learning_outcomes)
+        strand_saved.send(sender=self.__class__, instance=self, created=created)
+        self.record_tracked_fields()
 
 
     def get_absolute_url(self):
@@ -60,16 +69,34 @@ class Strand(models.Model, CurriculumGetMethods, AuthorGetMethods):
         return learning_outcomes
 
     def generate_learning_outcomes(self, cleaned_learning_outcomes):
-        """ Deletes any pre-existing LOs in the strand and creates a fresh collection of LOs from a cleaned LO list """
-        LearningOutcome.objects.filter(strand=self).delete()
-        for learning_outcome in cleaned_learning_outcomes:
-            self.add_learning_outcome(learning_outcome)
+        """ Synchronises the LOs of the strand with a cleaned LO list, in which duplicate LOs are ignored.
+        LOs whose text is still in the list are kept (with their analyses), with their index updated,
+        LOs whose text is no longer in the list are deleted and new LOs are created. The changes are
+        applied with one delete, one bulk update and one bulk create """
+        indexes = {text: index for index, text in enumerate(dict.fromkeys(cleaned_learning_outcomes), 1)}
+        kept_los = {}
+        deleted_lo_pks = []
+        for learning_outcome in LearningOutcome.objects.filter(strand=self):
+            if learning_outcome.text in indexes and learning_outcome.text not in kept_los:
+                kept_los[learning_outcome.text] = learning_outcome
+            else:
+                deleted_lo_pks.append(learning_outcome.pk)
+        moved_los = [learning_outcome for text, learning_outcome in kept_los.items() if learning_outcome.index != indexes[text]]
+        for learning_outcome in moved_los:
+            learning_outcome.index = indexes[learning_outcome.text]
+        new_los = [LearningOutcome(index=index, strand=self, text=text) for text, index in indexes.items() if text not in kept_los]
+        with transaction.atomic():
+            if deleted_lo_pks:
+                LearningOutcome.objects.filter(pk__in=deleted_lo_pks).delete()
+            LearningOutcome.objects.bulk_update(moved_los, ['index'])
+            unique_slugify_batch(new_los, [f"{self.title} {learning_outcome.index}" for learning_outcome in new_los])
+            LearningOutcome.objects.bulk_create(new_los)
 
     def add_learning_outcome(self, learning_outcome_text):
         """ Creates a learning outcome object and appends it to the strand """
         # Ensure LO is not already in the strand
         LO_queryset = LearningOutcome.objects.filter(strand=self)
-        if learning_outcome_text not in [LO.text for LO in LO_queryset]:
+        if not LO_queryset.filter(text=learning_outcome_text).exists():
             LearningOutcome.objects.create(index=LO_queryset.count()+1, strand=self, text=learning_outcome_text)
 
     def remove_learning_outcome(self, index):
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by Strand.save once the LOs of the strand are generated (unlike post_save, sent before),
+# with the arguments instance and created
+strand_saved = Signal()
@@ -72,3 +72,64 @@ class StrandTests(TestCase):
 
 
 
+
+    def test_generate_learning_outcomes_keeps_surviving_learning_outcomes(self):
+        self.strand.generate_learning_outcomes(self.strand.get_cleaned_learning_outcomes())
+        los = list(LearningOutcome.objects.filter(strand=self.strand).order_by('index'))
+        new_los = [los[2].text, "Can use skills of logic", los[0].text]
+        self.strand.generate_learning_outcomes(new_los)
+        strand_los = LearningOutcome.objects.filter(strand=self.strand).order_by('index')
+        self.assertEqual([lo.text for lo in strand_los], new_los)
+        self.assertEqual([lo.index for lo in strand_los], [1, 2, 3])
+        # Surviving LOs are not recreated
+        self.assertEqual(strand_los[0].pk, los[2].pk)
+        self.assertEqual(strand_los[2].pk, los[0].pk)
+
+    def test_generate_learning_outcomes_ignores_duplicates(self):
+        new_los = ["Left alone", "Can use skills of logic", "Left alone"]
+        self.strand.generate_learning_outcomes(new_los)
+        strand_los = LearningOutcome.objects.filter(strand=self.strand).order_by('index')
+        self.assertEqual([(lo.index, lo.text) for lo in strand_los], [(1, "Left alone"), (2, "Can use skills of logic")])
+
+    def test_generate_learning_outcomes_num_queries(self):
+        self.strand.generate_learning_outcomes(self.strand.get_cleaned_learning_outcomes())
+        # Reordering the LOs of the strand takes a constant number of queries
+        cleaned_los = self.strand.get_cleaned_learning_outcomes()
+        with self.assertNumQueries(4):
+            self.strand.generate_learning_outcomes(list(reversed(cleaned_los)))
+        self.assertEqual(LearningOutcome.objects.get(strand=self.strand, text=cleaned_los[0]).index, len(cleaned_los))
+
+    def test_save_without_list_change_keeps_learning_outcomes(self):
+        self.strand.generate_learning_outcomes(self.strand.get_cleaned_learning_outcomes())
+        strand = Strand.objects.get(pk=self.strand.pk)
+        strand.colour = '#123456'
+        # Slug lookup, curriculum, update and analysis summaries lookup only, the LOs are not regenerated
+        with self.assertNumQueries(4):
+            strand.save()
+
+    def test_save_with_list_change_regenerates_learning_outcomes(self):
+        strand = Strand.objects.get(pk=self.strand.pk)
+        strand.learning_outcome_list = "Left alone\r\nCan use skills of logic"
+        strand.save()
+        self.assertEqual(list(strand.learning_outcomes.order_by('index').values_list('text', flat=True)), ["Left alone", "Can use skills of logic"])
+        # Saving again does not regenerate the LOs
+        with self.assertNumQueries(2):
+            strand.save()
+
+    def test_create_generates_learning_outcomes(self):
+        strand = Strand.objects.create(title='New strand', curriculum=self.curriculum, learning_outcome_list="Left alone\r\nCan use skills of logic")
+        self.assertEqual(strand.get_num_learning_outcomes(), 2)
+
+    def test_save_with_deferred_list_keeps_learning_outcomes(self):
+        self.strand.generate_learning_outcomes(self.strand.get_cleaned_learning_outcomes())
+        strand = Strand.objects.defer('learning_outcome_list').get(pk=self.strand.pk)
+        strand.colour = '#123456'
+        # The deferred list is neither loaded nor taken as changed, the LOs are not regenerated
+        with self.assertNumQueries(4):
+            strand.save()
+
+    def test_save_with_deferred_list_change_regenerates_learning_outcomes(self):
+        strand = Strand.objects.defer('learning_outcome_list').get(pk=self.strand.pk)
+        strand.learning_outcome_list += "\r\nCan use skills of logic"
+        strand.save()
+        self.assertEqual(strand.get_num_learning_outcomes(), 24)
@@ -0,0 +1,104 @@
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+
+from verbs.models import Verb, NonVerb
+
+
+class TaxonomyMembership:
+    """
+
+    A class to represent the memberships of the verbs and allowed non-verbs of a taxonomy as
+    boolean matrices, with one row per verb category (ordered by level) and one column per element
+    title, the columns being shared by the verb and the non-verb matrices.
+    The overlap analytics of the taxonomy are derived from the matrices with matrix products,
+    rather than by comparing the verbs of each pair of categories.
+
+    """
+    def __init__(self, categories, verb_memberships, non_verb_memberships):
+        self.category_pks = [category_pk for category_pk, title in categories]
+        self.category_titles = [title for category_pk, title in categories]
+        rows = {category_pk: row for row, category_pk in enumerate(self.category_pks)}
+        columns = {}
+        for memberships in (verb_memberships, non_verb_memberships):
+            for category_pk, title in memberships:
+                columns.setdefault(title, len(columns))
+        self.titles = list(columns)
+        self.verbs = self.build_matrix(verb_memberships, rows, columns)
+        self.non_verbs = self.build_matrix(non_verb_memberships, rows, columns)
+
+    @classmethod
+    def from_taxonomy(cls, taxonomy):
+        """ Returns the membership matrices of a taxonomy, fetching its categories and the
+        (category, element) membership pairs of its verbs and non-verbs with one query each """
+        categories = list(taxonomy.verb_categories.order_by('level').values_list('pk', 'title'))
+        verb_memberships = Verb.verb_categories.through.objects.filter(verbcategory__taxonomy=taxonomy).values_list('verbcategory_id', 'verb__title')
+        non_verb_memberships = NonVerb.verb_categories.through.objects.filter(verbcategory__taxonomy=taxonomy).values_list('verbcategory_id', 'nonverb__title')
+        return cls(categories, list(verb_memberships), list(non_verb_memberships))
+
+    @staticmethod
+    def build_matrix(memberships, rows, columns):
+        """ Returns the boolean category x element matrix of a list of (category pk, title) pairs """
+        matrix = np.zeros((len(rows), len(columns)), dtype=bool)
+        for category_pk, title in memberships:
+            matrix[rows[category_pk], columns[title]] = True
+        return matrix
+
+    def get_category_index(self, category):
+        """ Returns the row of a verb category in the matrices """
+        return self.category_pks.index(category.pk)
+
+    def get_overlap_matrix(self):
+        """ Returns the number of verbs shared by each pair of categories. The diagonal holds the
+        number of verbs of each category """
+        verbs = self.verbs.astype(np.int64)
+        return verbs @ verbs.T
+
+    def get_diagonal_verbs(self):
+        """ Returns, for each category, its number of verbs minus the number of its verbs shared
+        with each other category (as VerbCategory.diagonal_verbs) """
+        overlap = self.get_overlap_matrix()
+        return 2 * np.diag(overlap) - overlap.sum(axis=1)
+
+    def get_chord_matrix(self):
+        """ Returns the overlap matrix with the diagonal verbs on its diagonal, as nested lists """
+        chord = self.get_overlap_matrix()
+        np.fill_diagonal(chord, self.get_diagonal_verbs())
+        return chord.tolist()
+
+    def get_overlap(self):
+        """ Returns the number of times a verb appears simultaneously in 2 categories """
+        overlap = self.get_overlap_matrix()
+        return int((overlap.sum() - np.trace(overlap)) // 2)
+
+    def get_num_unique_elements(self):
+        """ Returns the number of unique verbs and allowed non-verbs (by title) """
+        return int((self.verbs | self.non_verbs).any(axis=0).sum())
+
+    def get_stats(self):
+        """ Returns the statistics of the taxonomy shown in its dashboards, per category (ordered
+        by level) and overall """
+        num_verbs = self.verbs.sum(axis=1).tolist()
+        num_non_verbs = self.non_verbs.sum(axis=1).tolist()
+        return {
+                'labels': self.category_titles,
+                'num_verbs': num_verbs,
+                'num_non_verbs': num_non_verbs,
+                'num_elements': [verbs + non_verbs for verbs, non_verbs in zip(num_verbs, num_non_verbs)],
+                'num_unique_elements': self.get_num_unique_elements(),
+                'overlap': self.get_overlap(),
+                'chord_matrix': self.get_chord_matrix(),
+                }
+
+
+def get_taxonomy_stats(taxonomy):
+    """ Returns the statistics snapshot of the current version of a taxonomy. Snapshots are kept in
+    the cache under the version of the taxonomy, which is bumped whenever one of its verb categories
+    changes, so that a snapshot is only computed once per version """
+    key = f"taxonomy-stats-{taxonomy.pk}-{taxonomy.version}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = TaxonomyMembership.from_taxonomy(taxonomy).get_stats()
+        cache.set(key, stats, settings.TAXONOMY_STATS_CACHE_TIMEOUT)
+    return stats
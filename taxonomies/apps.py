@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TaxonomiesConfig(AppConfig):
     name = 'taxonomies'
+
+    def ready(self):
+        import taxonomies.signals
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxonomies', '0009_customusertaxonomy_public'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customusertaxonomy',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
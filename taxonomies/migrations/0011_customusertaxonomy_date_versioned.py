@@ -0,0 +1,19 @@
+# Generated by Django 3.0.5 on 2026-10-18 10:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxonomies', '0010_customusertaxonomy_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customusertaxonomy',
+            name='date_versioned',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import F
 from django.urls import reverse
+from django.utils import timezone
 from utils.slugs import unique_slugify
+from utils.cache import chart_cache
 
 from accounts.models import CustomUser
+from .analytics import TaxonomyMembership, get_taxonomy_stats
 
 
 class CustomUserTaxonomy(models.Model):
@@ -22,6 +26,8 @@ class CustomUserTaxonomy(models.Model):
     slug = models.SlugField(max_length=150, blank=True, unique=True)
     public = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)  # Change stamp, bumped whenever a verb category changes
+    date_versioned = models.DateTimeField(default=timezone.now)  # Date the change stamp was last bumped
 
     class Meta:
         verbose_name = 'User Taxonomy'
@@ -40,28 +46,39 @@ class CustomUserTaxonomy(models.Model):
             self.is_staff = True
         super().save(*args, **kwargs)
 
+    def bump_version(self):
+        """ Increments the change stamp of the taxonomy, invalidating anything compiled or cached from its verb categories """
+        CustomUserTaxonomy.objects.filter(pk=self.pk).update(version=F('version') + 1, date_versioned=timezone.now())
+        self.refresh_from_db(fields=['version', 'date_versioned'])
+        chart_cache.invalidate(('taxonomy', self.pk))
+
     def get_num_verb_categories(self):
         """ Returns the number of verb categories in the taxonomy """
-        return self.verb_categories.count()
+        return len(self.get_stats()['labels'])
+
+    def get_stats(self):
+        """ Returns the (cached) statistics snapshot of the current version of the taxonomy """
+        return get_taxonomy_stats(self)
 
     def get_num_verbs(self):
         """ Returns the total number of verbs in the taxonomy """
-        return sum(verb_cat.get_num_verbs() for verb_cat in self.verb_categories.all())
+        return sum(self.get_stats()['num_verbs'])
 
     def get_num_non_verbs(self):
         """ Returns the total number of allowed non-verbs in the taxonomy """
-        return sum(verb_cat.get_num_non_verbs() for verb_cat in self.verb_categories.all())
+        return sum(self.get_stats()['num_non_verbs'])
 
     def get_num_elements(self):
         """ Returns the total number of verbs and allowed non-verbs in the taxonomy """
-        return sum(len(verb_cat) for verb_cat in self.verb_categories.all())
+        return sum(self.get_stats()['num_elements'])
 
     def get_num_unique_elements(self):
         """ Returns the number of unique elements in the taxonomy """
-        verbs = [verb.title for verb_cat in self.verb_categories.all() for verb in verb_cat.verbs.all()]
-        non_verbs = [verb.title for verb_cat in self.verb_categories.all() for verb in verb_cat.non_verbs.all()]
+        return self.get_stats()['num_unique_elements']
 
-        return len(set(verbs + non_verbs))
+    def get_membership(self):
+        """ Returns the verb and non-verb membership matrices of the verb categories of the taxonomy """
+        return TaxonomyMembership.from_taxonomy(self)
 
     def has_verb_category(self):
         """ Returns True if the taxonomy has at least one verb category """
@@ -69,5 +86,4 @@ class CustomUserTaxonomy(models.Model):
 
     def overlap(self):
         """ Returns the number of time a verb appears simultaneously in 2 categories """
-        return int(0.5 * sum(VC_i.overlap(VC_j) for VC_i in self.verb_categories.all()\
-                for VC_j in self.verb_categories.all() if VC_i != VC_j))
+        return self.get_stats()['overlap']
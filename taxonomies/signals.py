@@ -0,0 +1,15 @@
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from utils.cache import chart_cache
+from verb_categories.models import VerbCategory
+from .models import CustomUserTaxonomy
+
+
+@receiver(post_delete, sender=VerbCategory)
+def bump_taxonomy_version(sender, instance, **kwargs):
+    """ Signal to update the change stamp of the taxonomy when one of its verb categories is deleted """
+    CustomUserTaxonomy.objects.filter(pk=instance.taxonomy_id).update(version=F('version') + 1, date_versioned=timezone.now())
+    chart_cache.invalidate(('taxonomy', instance.taxonomy_id))
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from taxonomies.analytics import TaxonomyMembership
+from taxonomies.models import CustomUserTaxonomy as Taxonomy
+from verb_categories.models import VerbCategory
+
+
+class TestTaxonomyMembership(TestCase):
+
+    def setUp(self):
+        # 3 categories: 'describe' in all, 'solve' in 1 and 2, 'who' an allowed non-verb of 3
+        verb_memberships = [(1, 'describe'), (2, 'describe'), (3, 'describe'), (1, 'solve'), (2, 'solve'), (3, 'judge')]
+        non_verb_memberships = [(3, 'who'), (1, 'describe')]
+        self.membership = TaxonomyMembership([(1, 'Knowledge'), (2, 'Comprehension'), (3, 'Application')], verb_memberships, non_verb_memberships)
+
+    def test_overlap_matrix(self):
+        self.assertEqual(self.membership.get_overlap_matrix().tolist(), [[2, 2, 1], [2, 2, 1], [1, 1, 2]])
+
+    def test_chord_matrix(self):
+        self.assertEqual(self.membership.get_chord_matrix(), [[-1, 2, 1], [2, -1, 1], [1, 1, 0]])
+
+    def test_overlap(self):
+        self.assertEqual(self.membership.get_overlap(), 4)
+
+    def test_num_unique_elements(self):
+        self.assertEqual(self.membership.get_num_unique_elements(), 4)
+
+    def test_stats(self):
+        stats = self.membership.get_stats()
+        self.assertEqual(stats['labels'], ['Knowledge', 'Comprehension', 'Application'])
+        self.assertEqual(stats['num_verbs'], [2, 2, 2])
+        self.assertEqual(stats['num_non_verbs'], [1, 0, 1])
+        self.assertEqual(stats['num_elements'], [3, 2, 3])
+
+    def test_empty(self):
+        membership = TaxonomyMembership([(1, 'Knowledge'), (2, 'Comprehension')], [], [])
+        self.assertEqual(membership.get_chord_matrix(), [[0, 0], [0, 0]])
+        self.assertEqual(membership.get_overlap(), 0)
+        self.assertEqual(membership.get_num_unique_elements(), 0)
+
+
+class TestTaxonomyMembershipQueries(TestCase):
+
+    fixtures = [
+            "yvan.json",
+            "blooms_updated.json",
+            "blooms_updated_knowledge.json",
+            "blooms_updated_comprehension.json",
+            "blooms_updated_application.json",
+            "blooms_updated_analysis.json",
+            "blooms_updated_synthesis.json",
+            "blooms_updated_evaluation.json",
+            ]
+
+    def setUp(self):
+        # Snapshots are cached by taxonomy version, which is reset by the rollback of each test
+        cache.clear()
+        self.tax = Taxonomy.objects.get(pk=1)
+        self.verb_categories = list(self.tax.verb_categories.order_by('level'))
+        for verb_category in self.verb_categories:
+            verb_category.generate_verb_objects(verb_category.get_cleaned_verbs())
+
+    def test_matches_category_overlaps(self):
+        with self.assertNumQueries(3):
+            chord_matrix = self.tax.get_membership().get_chord_matrix()
+        for i, verb_cat_i in enumerate(self.verb_categories):
+            for j, verb_cat_j in enumerate(self.verb_categories):
+                if i != j:
+                    self.assertEqual(chord_matrix[i][j], verb_cat_i.overlap(verb_cat_j))
+            self.assertEqual(chord_matrix[i][i], verb_cat_i.diagonal_verbs())
+
+    def test_overlap(self):
+        self.assertEqual(self.tax.overlap(), sum(verb_cat_i.overlap(verb_cat_j) for verb_cat_i in self.verb_categories for verb_cat_j in self.verb_categories if verb_cat_i != verb_cat_j) // 2)
+
+    def test_num_unique_elements(self):
+        titles = {verb.title for verb_cat in self.verb_categories for verb in list(verb_cat.verbs.all()) + list(verb_cat.non_verbs.all())}
+        self.assertEqual(self.tax.get_num_unique_elements(), len(titles))
+
+    def test_stats_cached_by_version(self):
+        stats = self.tax.get_stats()
+        self.assertEqual(stats['num_elements'], [verb_cat.get_num_elements() for verb_cat in self.verb_categories])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tax.get_stats(), stats)
+            self.assertEqual(self.tax.get_num_verbs(), sum(stats['num_verbs']))
+
+    def test_stats_invalidated_on_verb_category_change(self):
+        num_verbs = self.tax.get_num_verbs()
+        verb_cat = VerbCategory.objects.get(pk=self.verb_categories[0].pk)
+        verb_cat.verb_list += ', frobnicate'
+        verb_cat.save()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.get_num_verbs(), num_verbs + 1)
+        verb_cat.title = 'Remembering'
+        verb_cat.save()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.get_stats()['labels'][0], 'Remembering')
+        verb_cat.delete()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.get_num_verb_categories(), 5)
@@ -1,9 +1,14 @@
+import json
+
 from django.test import TestCase
+from django.core.cache import cache, caches
+from django.conf import settings
 
 from django.urls import reverse
 
 from django.contrib.auth import get_user_model
 from taxonomies.models import CustomUserTaxonomy as Taxonomy
+from verb_categories.models import VerbCategory
 from strands.models import Strand
 
 
@@ -319,3 +324,50 @@ class UserTaxonomyListViewTests(TestCase):
         self.assertTemplateUsed(response, 'user_taxonomy_list.html')
 
 
+class TaxonomyDataViewConditionalTests(TestCase):
+    """ Conditional requests to the taxonomy chart data """
+    def setUp(self):
+        """ Create a user (for taxonomy) and taxonomy """
+        self.credentials = {
+                'username': 'newuser',
+                'email': 'newuser@email.com',
+                'password': 'secret',
+                }
+        self.new_user = get_user_model().objects.create_user(**self.credentials)
+        self.new_taxonomy = Taxonomy.objects.create(
+                title='test taxonomy',
+                author=self.new_user,
+                )
+        self.client.login(**self.credentials)
+        self.url = reverse('taxonomies:verb_number_data', kwargs={'slug_taxonomy': self.new_taxonomy.slug})
+        cache.clear()
+        caches[settings.CHART_CACHE_ALIAS].clear()
+
+    def test_etag_and_last_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"taxonomy-{self.new_taxonomy.pk}-{self.new_taxonomy.version}"')
+        self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        # Session, user and taxonomy only, the statistics are not computed
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_modified_after_version_bump(self):
+        etag = self.client.get(self.url)['ETag']
+        self.new_taxonomy.bump_version()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_chart_cache_invalidated_on_verb_category_save(self):
+        self.assertEqual(json.loads(self.client.get(self.url).content)['data'], [])
+        verb_category = VerbCategory.objects.create(title='knowledge', taxonomy=self.new_taxonomy, verb_list='define, list')
+        self.assertEqual(json.loads(self.client.get(self.url).content)['data'], [2])
+        verb_category.verb_list = 'define, list, state'
+        verb_category.save()
+        self.assertEqual(json.loads(self.client.get(self.url).content)['data'], [3])
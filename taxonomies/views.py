@@ -18,6 +18,8 @@ from django.views.generic import (
         DeleteView
         )
 
+from utils.views import ConditionalDataMixin
+
 from .models import CustomUserTaxonomy as Taxonomy
 from accounts.models import CustomUser
 
@@ -107,71 +109,69 @@ class TaxonomyDataMixin:
     def test_permissions(self):
         """ Ensure the taxonomy is public """
         taxonomy = self.get_taxonomy()
-        return True if self.request.user == taxonomy.author else taxonomy.public
+        return True if self.request.user.pk == taxonomy.author_id else taxonomy.public
 
     def get_taxonomy(self, **kwargs):
         """ Get the target taxonomy from the url """
-        slug_taxonomy = self.kwargs.get('slug_taxonomy', None)
-        if slug_taxonomy is not None:
-            taxonomy = get_object_or_404(Taxonomy, slug=slug_taxonomy)
-        return taxonomy
+        if not hasattr(self, 'taxonomy'):
+            self.taxonomy = get_object_or_404(Taxonomy, slug=self.kwargs.get('slug_taxonomy'))
+        return self.taxonomy
 
     def get_ordered_verb_categories(self, taxonomy, **kwargs):
         """ Get the verb categories of a taxonomy ordered by level of abstraction """
         return [verb_cat for verb_cat in taxonomy.verb_categories.all().order_by('level')]
 
+    def get_etag(self):
+        """ The data of a taxonomy only changes with its version """
+        taxonomy = self.get_taxonomy()
+        return f"taxonomy-{taxonomy.pk}-{taxonomy.version}"
+
+    def get_last_modified(self):
+        """ The date the version of the taxonomy was last bumped """
+        return self.get_taxonomy().date_versioned
 
-class VerbNumberDataView(TaxonomyDataMixin, UserPassesTestMixin, View):
+    def get_cache_object(self):
+        """ The chart cache entries of the taxonomy are invalidated when its version is bumped """
+        return ('taxonomy', self.get_taxonomy().pk)
+
+
+class VerbNumberDataView(TaxonomyDataMixin, ConditionalDataMixin, UserPassesTestMixin, View):
     """ Returns a JSON response giving the number of elements(verbs and non-verbs)
     in each category """
 
     def test_func(self):
         return self.test_permissions()
 
-    def get(self, request, **kwargs):
+    def get_data(self):
         # Get the target taxonomy
         taxonomy = self.get_taxonomy()
 
-        # Order the verb categories by level of abstraction
-        verb_cats = self.get_ordered_verb_categories(taxonomy)
+        # Statistics snapshot of the taxonomy, with the verb categories ordered by level of abstraction
+        stats = taxonomy.get_stats()
 
-        # Get the number of elements in each category
-        num_elements = [verb_cat.get_num_elements() for verb_cat in verb_cats]
-
-        # Define the labels
-        labels = [verb_cat.title for verb_cat in verb_cats]
-
-        return JsonResponse(data={
-            'labels': labels,
-            'data': num_elements,
+        return {
+            'labels': stats['labels'],
+            'data': stats['num_elements'],
             'analysisPk': taxonomy.pk,
-            })
+            }
 
-class TaxonomyOverlapDataView(TaxonomyDataMixin, UserPassesTestMixin, View):
+class TaxonomyOverlapDataView(TaxonomyDataMixin, ConditionalDataMixin, UserPassesTestMixin, View):
     """ Returns a JSON response for chord charts relating to the overlap of the taxonomy  """
     def test_func(self):
         return self.test_permissions()
 
-    def get(self, request, **kwargs):
+    def get_data(self):
         # Get the target taxonomy
         taxonomy = self.get_taxonomy()
 
-        # Order the verb categories by level of abstraction
-        verb_cats = self.get_ordered_verb_categories(taxonomy)
-
-        # Define the labels
-        labels = [verb_cat.title for verb_cat in verb_cats]
-
-        # Generate the chord flow matrix data
-        data = []
-        for cat_i in verb_cats:
-            data.append([cat_i.diagonal_verbs() if cat_i == cat_j else cat_i.overlap(cat_j) for cat_j in verb_cats])
+        # Statistics snapshot of the taxonomy, with the verb categories ordered by level of abstraction
+        stats = taxonomy.get_stats()
 
-        return JsonResponse(data={
-            'labels': labels,
-            'data': data,
+        return {
+            'labels': stats['labels'],
+            'data': stats['chord_matrix'],
             'analysisPk': taxonomy.pk,
-            })
+            }
 
 
 @method_decorator(csrf_exempt, name='dispatch')
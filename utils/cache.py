@@ -0,0 +1,63 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class ChartCache:
+    """
+
+    A class to manage the cache of the JSON data of the chart views, stored in the cache backend
+    named by CHART_CACHE_ALIAS (Redis in production, local memory in development and tests).
+    Entries are keyed by (view, object, version), where the version is a token of the object (an
+    analysis, curriculum or taxonomy) which is replaced to invalidate all the entries of the object
+    at once, e.g. when an analysis run completes or a verb category of a taxonomy is saved.
+    The tokens are random, so that an evicted token never brings back the entries of a previous one.
+
+    """
+    # Hit/miss counters of the current process
+    hits = 0
+    misses = 0
+
+    @property
+    def backend(self):
+        return caches[settings.CHART_CACHE_ALIAS]
+
+    @staticmethod
+    def get_version_key(scope, pk):
+        """ Returns the cache key of the version token of an object, e.g. ('analysis', 1) """
+        return f"chart-version-{scope}-{pk}"
+
+    def get_version(self, scope, pk):
+        """ Returns the version token of an object, creating it if it was invalidated """
+        return self.backend.get_or_set(self.get_version_key(scope, pk), uuid.uuid4().hex, None)
+
+    def get_or_set(self, view, scope, pk, get_data):
+        """ Returns the data of a view for an object from the cache, calling get_data on a miss """
+        key = f"chart-{view}-{scope}-{pk}-{self.get_version(scope, pk)}"
+        data = self.backend.get(key)
+        if data is None:
+            ChartCache.misses += 1
+            data = get_data()
+            self.backend.set(key, data, settings.CHART_CACHE_TIMEOUT)
+        else:
+            ChartCache.hits += 1
+        return data
+
+    def invalidate(self, *objects):
+        """ Invalidates the entries of a collection of (scope, pk) objects. The entries are invalidated
+        again when the current transaction commits, so that data read before the commit is not kept """
+        keys = [self.get_version_key(scope, pk) for scope, pk in objects]
+        self.backend.delete_many(keys)
+        transaction.on_commit(lambda: self.backend.delete_many(keys))
+
+    def get_stats(self):
+        """ Returns the hit/miss counters of the current process """
+        return {
+                'hits': ChartCache.hits,
+                'misses': ChartCache.misses,
+                }
+
+
+chart_cache = ChartCache()
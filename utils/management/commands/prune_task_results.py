@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.results import TaskResultRetention
+
+
+class Command(BaseCommand):
+    """
+
+    Reports the size of the celery results table and prunes its expired results in batches, e.g.
+        python manage.py prune_task_results --ttl 3600 --batch-size 500
+        python manage.py prune_task_results --report
+
+    """
+    help = 'Reports the size of the celery results table and prunes its expired results in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=settings.TASK_RESULT_TTL, help='Number of seconds results are kept')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_RESULT_PRUNE_BATCH_SIZE, help='Number of results deleted by each query')
+        parser.add_argument('--max-batches', type=int, default=None, help='Maximum number of batches deleted (default: all)')
+        parser.add_argument('--report', action='store_true', help='Only report the size of the table')
+
+    def handle(self, *args, **options):
+        retention = TaskResultRetention(ttl=options['ttl'], batch_size=options['batch_size'])
+        self.report(retention.get_stats())
+        if options['report']:
+            return
+        num_deleted = retention.prune(max_batches=options['max_batches'])
+        self.stdout.write(f"Deleted {num_deleted} results")
+        self.report(retention.get_stats())
+
+    def report(self, stats):
+        """ Writes the size of the results table """
+        table_size = 'unknown size' if stats['table_bytes'] is None else f"{stats['table_bytes'] / 1024 / 1024:.1f} MiB"
+        oldest = 'none' if stats['oldest'] is None else f"{stats['oldest']:%Y-%m-%d %H:%M}"
+        self.stdout.write(f"{stats['rows']} results ({stats['expired_rows']} expired), {table_size}, oldest: {oldest}")
@@ -1,3 +1,38 @@
-from django.db import models
+class TrackedFieldsMixin:
+    """
 
+    A mixin recording the values of some fields of a model when an instance is loaded from (or
+    saved to) the database, so that save() can tell which of them were changed in between.
+    Classes using this mixin should list the names of the fields in tracked_fields, and should
+    inherit the mixin before models.Model so that its from_db is called.
 
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.record_tracked_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        """ Records the values of the tracked fields reloaded, e.g. a deferred field loaded on access """
+        super().refresh_from_db(using=using, fields=fields)
+        if hasattr(self, '_tracked_values'):
+            self._tracked_values.update({name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__ and (fields is None or name in fields)})
+
+    def record_tracked_fields(self):
+        """ Records the current values of the (loaded) tracked fields """
+        self._tracked_values = {name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__}
+
+    def get_changed_fields(self):
+        """ Returns the names of the tracked fields changed since the instance was loaded or saved.
+        All the tracked fields are changed for an instance which is not in the database yet, while
+        the fields deferred when the instance was loaded (.only()/.defer()) and not loaded since are unchanged """
+        if not hasattr(self, '_tracked_values'):
+            return list(self.tracked_fields)
+        return [name for name in self.tracked_fields if name in self._tracked_values and self._tracked_values[name] != getattr(self, name)]
+
+    def has_changed(self, field_name):
+        """ Returns True if a tracked field was changed since the instance was loaded or saved """
+        return field_name in self.get_changed_fields()
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+
+class TaskResultRetention:
+    """
+
+    A class to keep the celery results table (django_celery_results) to a bounded size, in the
+    database serving the site. The results done more than TASK_RESULT_TTL seconds ago are pruned in
+    batches of TASK_RESULT_PRUNE_BATCH_SIZE rows, each deleted by its own short query, rather than
+    all at once, so that pruning a large backlog never holds long locks on the table.
+
+    """
+    def __init__(self, ttl=None, batch_size=None):
+        self.ttl = settings.TASK_RESULT_TTL if ttl is None else ttl
+        self.batch_size = settings.TASK_RESULT_PRUNE_BATCH_SIZE if batch_size is None else batch_size
+
+    def get_expired(self):
+        """ Returns the queryset of the results older than the TTL """
+        return TaskResult.objects.filter(date_done__lt=timezone.now() - timedelta(seconds=self.ttl))
+
+    def get_table_size(self):
+        """ Returns the size of the results table and its indexes in bytes (PostgreSQL only, else None) """
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_total_relation_size(%s)', [TaskResult._meta.db_table])
+            return cursor.fetchone()[0]
+
+    def get_stats(self):
+        """ Returns the number of results, of expired results, the date of the oldest result and the
+        size of the table """
+        oldest = TaskResult.objects.order_by('date_done').values_list('date_done', flat=True).first()
+        return {
+                'rows': TaskResult.objects.count(),
+                'expired_rows': self.get_expired().count(),
+                'oldest': oldest,
+                'table_bytes': self.get_table_size(),
+                }
+
+    def prune(self, max_batches=None):
+        """ Deletes the expired results batch by batch (at most max_batches) and returns the number of
+        deleted results """
+        num_deleted = 0
+        num_batches = 0
+        while max_batches is None or num_batches < max_batches:
+            pks = list(self.get_expired().order_by('date_done').values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+            num_deleted += TaskResult.objects.filter(pk__in=pks).delete()[0]
+            num_batches += 1
+        return num_deleted
@@ -1,4 +1,6 @@
 import re
+
+from django.db.models import Q
 from django.template.defaultfilters import slugify
 
 
@@ -47,6 +49,72 @@ def unique_slugify(instance, value, slug_field_name='slug', queryset=None,
     setattr(instance, slug_field.attname, slug)
 
 
+def unique_slugify_batch(instances, values, slug_field_name='slug', queryset=None,
+                         slug_separator='-', lookup_batch_size=400):
+    """
+    Calculates and stores unique slugs for a list of instances of the same
+    model, the slug of each instance being built from the value at the same
+    position in ``values``, as ``unique_slugify`` would for each instance.
+
+    The existing slugs which may collide (each distinct original slug and its
+    suffixed forms) are fetched with one query per ``lookup_batch_size``
+    distinct original slugs, and the suffixes are allocated in memory (taking
+    into account the slugs allocated earlier in the batch), so that the
+    instances can then be saved with ``bulk_create``.
+    """
+    instances = list(instances)
+    if not instances:
+        return
+    slug_field = instances[0]._meta.get_field(slug_field_name)
+    slug_len = slug_field.max_length
+
+    original_slugs = []
+    for value in values:
+        slug = slugify(value)
+        if slug_len:
+            slug = slug[:slug_len]
+        original_slugs.append(_slug_strip(slug, slug_separator))
+
+    if queryset is None:
+        queryset = instances[0].__class__._default_manager.all()
+    queryset = queryset.exclude(pk__in=[instance.pk for instance in instances if instance.pk])
+
+    # Any suffixed slug is its original slug followed by the separator and
+    # the suffix, so the taken slugs are looked up for each original slug
+    # only. The original slugs long enough to be truncated by a suffix are
+    # looked up by their prefix, kept short enough to allow for truncation.
+    taken = set()
+    distinct_slugs = sorted(set(original_slugs))
+    for start in range(0, len(distinct_slugs), lookup_batch_size):
+        exact = []
+        lookups = Q()
+        for original_slug in distinct_slugs[start:start + lookup_batch_size]:
+            if slug_len and len(original_slug) > slug_len - 10:
+                lookups |= Q(**{f'{slug_field_name}__startswith': original_slug[:max(slug_len - 10, 0)]})
+            else:
+                exact.append(original_slug)
+                lookups |= Q(**{f'{slug_field_name}__startswith': original_slug + slug_separator})
+        lookups |= Q(**{f'{slug_field_name}__in': exact})
+        taken.update(queryset.filter(lookups).values_list(slug_field_name, flat=True))
+
+    # Next suffix to try for each original slug, all lower suffixes being taken
+    next_suffixes = {}
+    for instance, original_slug in zip(instances, original_slugs):
+        slug = original_slug
+        next = next_suffixes.get(original_slug, 2)
+        while not slug or slug in taken:
+            slug = original_slug
+            end = '%s%s' % (slug_separator, next)
+            if slug_len and len(slug) + len(end) > slug_len:
+                slug = slug[:slug_len-len(end)]
+                slug = _slug_strip(slug, slug_separator)
+            slug = '%s%s' % (slug, end)
+            next += 1
+        next_suffixes[original_slug] = next
+        taken.add(slug)
+        setattr(instance, slug_field.attname, slug)
+
+
 def _slug_strip(value, separator='-'):
     """
     Cleans up a slug by removing slug separator characters that occur at the
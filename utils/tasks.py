@@ -0,0 +1,10 @@
+from __future__ import absolute_import, unicode_literals
+
+from LO_analysis_project.celery import app
+
+from .results import TaskResultRetention
+
+@app.task(ignore_result=True)
+def prune_task_results():
+    # Delete the celery results older than TASK_RESULT_TTL, run periodically by celery beat
+    return TaskResultRetention().prune()
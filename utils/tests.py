@@ -1,3 +1,135 @@
+import io
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import caches
+from django.core.management import call_command
+from django.conf import settings
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+from utils.cache import ChartCache, chart_cache
+from utils.results import TaskResultRetention
+from utils.slugs import unique_slugify, unique_slugify_batch
+from verbs.models import NonCatVerb
+
+
+class UniqueSlugifyBatchTests(TestCase):
+
+    def setUp(self):
+        NonCatVerb.objects.create(title='walk')
+        NonCatVerb.objects.create(title='walk')
+
+    def test_slugs_match_unique_slugify(self):
+        titles = ['walk', 'walk', 'run', 'Walk', 'run', '']
+        verbs = [NonCatVerb(title=title) for title in titles]
+        unique_slugify_batch(verbs, titles)
+        self.assertEqual([verb.slug for verb in verbs], ['walk-3', 'walk-4', 'run', 'walk-5', 'run-2', '-2'])
+        # Same slugs as saving the verbs one by one
+        self.assertEqual([NonCatVerb.objects.create(title=title).slug for title in titles], [verb.slug for verb in verbs])
+
+    def test_single_query(self):
+        verbs = [NonCatVerb(title=f"verb {index}") for index in range(100)]
+        with self.assertNumQueries(1):
+            unique_slugify_batch(verbs, [verb.title for verb in verbs] * 2)
+        NonCatVerb.objects.bulk_create(verbs)
+        self.assertEqual(NonCatVerb.objects.filter(title__startswith='verb ').count(), 100)
+
+    def test_only_candidate_slugs_are_fetched(self):
+        NonCatVerb.objects.create(title='jump')
+        NonCatVerb.objects.create(title='walking')
+        verbs = [NonCatVerb(title=title) for title in ('walk', 'run')]
+        with CaptureQueriesContext(connection) as queries:
+            unique_slugify_batch(verbs, [verb.title for verb in verbs])
+        # The unrelated slugs, such as 'jump' or 'walking', are not fetched
+        sql = queries[0]['sql']
+        self.assertNotIn("LIKE '%'", sql)
+        self.assertIn("walk-%", sql)
+        self.assertEqual([verb.slug for verb in verbs], ['walk-3', 'run'])
+
+    def test_lookup_batches(self):
+        verbs = [NonCatVerb(title=f"verb {index}") for index in range(10)]
+        with self.assertNumQueries(3):
+            unique_slugify_batch(verbs, [verb.title for verb in verbs], lookup_batch_size=4)
+
+    def test_truncated_slugs(self):
+        title = 'a' * 200
+        NonCatVerb.objects.create(title=title)
+        verbs = [NonCatVerb(title=title) for _ in range(2)]
+        unique_slugify_batch(verbs, [title] * 2)
+        self.assertEqual([verb.slug for verb in verbs], ['a' * 148 + '-2', 'a' * 148 + '-3'])
+
+    def test_excludes_own_slugs(self):
+        verb = NonCatVerb.objects.get(slug='walk')
+        unique_slugify_batch([verb], ['walk'])
+        self.assertEqual(verb.slug, 'walk')
+
+
+class ChartCacheTests(TestCase):
+
+    def setUp(self):
+        caches[settings.CHART_CACHE_ALIAS].clear()
+        self.computed = []
+
+    def get_data(self):
+        self.computed.append(True)
+        return {'data': len(self.computed)}
+
+    def test_hit_and_miss(self):
+        hits, misses = ChartCache.hits, ChartCache.misses
+        self.assertEqual(chart_cache.get_or_set('View', 'analysis', 1, self.get_data), {'data': 1})
+        self.assertEqual(chart_cache.get_or_set('View', 'analysis', 1, self.get_data), {'data': 1})
+        self.assertEqual(chart_cache.get_stats(), {'hits': hits + 1, 'misses': misses + 1})
+
+    def test_keyed_by_view_and_object(self):
+        chart_cache.get_or_set('View', 'analysis', 1, self.get_data)
+        chart_cache.get_or_set('OtherView', 'analysis', 1, self.get_data)
+        chart_cache.get_or_set('View', 'analysis', 2, self.get_data)
+        chart_cache.get_or_set('View', 'taxonomy', 1, self.get_data)
+        self.assertEqual(len(self.computed), 4)
+
+    def test_invalidate(self):
+        chart_cache.get_or_set('View', 'analysis', 1, self.get_data)
+        chart_cache.get_or_set('View', 'analysis', 2, self.get_data)
+        chart_cache.invalidate(('analysis', 1))
+        self.assertEqual(chart_cache.get_or_set('View', 'analysis', 1, self.get_data), {'data': 3})
+        self.assertEqual(chart_cache.get_or_set('View', 'analysis', 2, self.get_data), {'data': 2})
+
+
+class TaskResultRetentionTests(TestCase):
+
+    def setUp(self):
+        # 5 results done 2 days ago and 2 recent ones
+        for index in range(7):
+            TaskResult.objects.create(task_id=f"task-{index}")
+        expired_pks = TaskResult.objects.order_by('pk').values_list('pk', flat=True)[:5]
+        TaskResult.objects.filter(pk__in=list(expired_pks)).update(date_done=timezone.now() - timedelta(days=2))
+        self.retention = TaskResultRetention(ttl=24 * 60 * 60, batch_size=2)
+
+    def test_stats(self):
+        stats = self.retention.get_stats()
+        self.assertEqual((stats['rows'], stats['expired_rows']), (7, 5))
+        self.assertLess(stats['oldest'], timezone.now() - timedelta(days=1))
+
+    def test_prune_in_batches(self):
+        # One select and one delete per batch, and a last select finding no expired result
+        with self.assertNumQueries(7):
+            self.assertEqual(self.retention.prune(), 5)
+        self.assertEqual(sorted(TaskResult.objects.values_list('task_id', flat=True)), ['task-5', 'task-6'])
+
+    def test_prune_max_batches(self):
+        self.assertEqual(self.retention.prune(max_batches=2), 4)
+        self.assertEqual(TaskResult.objects.count(), 3)
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command('prune_task_results', '--batch-size', '2', stdout=stdout)
+        self.assertIn('7 results (5 expired)', stdout.getvalue())
+        self.assertIn('Deleted 5 results', stdout.getvalue())
+        self.assertEqual(TaskResult.objects.count(), 2)
 
-# Create your tests here.
+    def test_command_report(self):
+        call_command('prune_task_results', '--report', stdout=io.StringIO())
+        self.assertEqual(TaskResult.objects.count(), 7)
@@ -1,3 +1,56 @@
-from django.shortcuts import render
+from calendar import timegm
 
-# Create your views here.
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cache import chart_cache
+
+
+class ConditionalDataMixin:
+    """
+
+    A mixin for JSON data views whose data only changes with a version stamp, e.g. the summary of
+    an analysis or the version of a taxonomy. Responses carry a strong ETag and a Last-Modified
+    header derived from the stamp, and a conditional request whose ETag (or date) still matches gets
+    a 304 response without the data being computed. Otherwise the data is read from the chart cache,
+    under the object returned by get_cache_object, and only computed on a miss.
+    Classes using this mixin should implement get_etag, get_last_modified, get_cache_object and
+    get_data, and should inherit the mixin after the classes implementing them.
+
+    """
+
+    def get_etag(self):
+        """ Returns the (unquoted) strong ETag of the current version of the data """
+        raise NotImplementedError
+
+    def get_last_modified(self):
+        """ Returns the datetime at which the data last changed, None if unknown """
+        return None
+
+    def get_data(self):
+        """ Returns the data of the JSON response """
+        raise NotImplementedError
+
+    def get_cache_object(self):
+        """ Returns the (scope, pk) of the object whose chart cache entries hold the data, e.g. ('taxonomy', 1) """
+        raise NotImplementedError
+
+    def get_cached_data(self):
+        """ Returns the data from the chart cache, computing it on a miss """
+        scope, pk = self.get_cache_object()
+        return chart_cache.get_or_set(self.__class__.__name__, scope, pk, self.get_data)
+
+    def get(self, request, **kwargs):
+        etag = quote_etag(self.get_etag())
+        last_modified = self.get_last_modified()
+        last_modified = timegm(last_modified.utctimetuple()) if last_modified is not None else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = JsonResponse(data=self.get_cached_data())
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # The data is private to the user and revalidated on every request
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -1,22 +1,24 @@
 from django.urls import reverse
-from utils.slugs import unique_slugify
+from utils.slugs import unique_slugify, unique_slugify_batch
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
 
 from accounts.models import CustomUser
 from taxonomies.models import CustomUserTaxonomy
 from verbs.models import Verb, NonVerb
 
 from utils.get import VerbCategoryMixin
+from utils.models import TrackedFieldsMixin
 
 
-class VerbCategory(models.Model, VerbCategoryMixin):
+class VerbCategory(TrackedFieldsMixin, models.Model, VerbCategoryMixin):
     """
 
     A class to manage the verb categories of a given taxonomy.
     The level field represents the level of abstraction of the
     verb category within the taxonomy, e.g. in Bloom Knowledge=1
     Comprehension=2, ..., Evaluation=6
+    The verbs of a category are only regenerated when its verb_list is changed.
 
     """
 
@@ -27,6 +29,8 @@ class VerbCategory(models.Model, VerbCategoryMixin):
     verb_list = models.TextField(default='')
     slug = models.SlugField(max_length=150, blank=True, unique=True)
 
+    tracked_fields = ('title', 'level', 'verb_list')
+
     class Meta:
         verbose_name = 'Verb Category'
         verbose_name_plural = 'Verb Categories'
@@ -57,13 +61,17 @@ class VerbCategory(models.Model, VerbCategoryMixin):
         return reverse('taxonomies:verb_categories:detail', kwargs={'pk_taxonomy': self.get_taxonomy_pk(), 'slug_taxonomy': self.get_taxonomy_slug(),  'slug_verb_category': self.slug})
 
     def save(self, *args, **kwargs):
-        created = self.pk is None
         slug_str = f"{self.taxonomy.pk} {self.title}"
         unique_slugify(self, slug_str)
         super().save(*args, **kwargs)
-        if created or not self._state.adding: # Second for updating
+        changed_fields = self.get_changed_fields()  # All fields for a new category
+        if 'verb_list' in changed_fields:
             cleaned_verbs = self.get_cleaned_verbs()
             self.generate_verb_objects(cleaned_verbs)
+        elif changed_fields:
+            # The lexicons and statistics of the taxonomy depend on the title and level of its categories
+            self.taxonomy.bump_version()
+        self.record_tracked_fields()
 
     def get_taxonomy(self):
         return self.taxonomy
@@ -84,45 +92,53 @@ class VerbCategory(models.Model, VerbCategoryMixin):
         # Remove the non_verbs from the cleaned_verbs
         cleaned_verbs = self.remove_non_verbs(cleaned_verbs, allowed_non_verbs)
 
-        # Remove (not delete as many-to-many field) any pre-existing verbs from the verb category
-        for verb in self.verbs.all():
-            self.verbs.remove(verb)
-        # Remove (not delete as many-to-many field) any pre-existing non_verbs from the verb category
-        for non_verb in self.non_verbs.all():
-            self.non_verbs.remove(non_verb)
-
-        # Create or add the verb and non_verb objects
-        for non_verb in allowed_non_verbs:
-            self.add_non_verb(non_verb)
-        for verb in cleaned_verbs:
-            self.add_verb(verb)
+        # Replace (not delete as many-to-many field) any pre-existing verbs and non-verbs of the verb category
+        with transaction.atomic():
+            self.set_verb_objects(NonVerb, allowed_non_verbs)
+            self.set_verb_objects(Verb, cleaned_verbs)
+            self.taxonomy.bump_version()
+
+    def set_verb_objects(self, model, titles):
+        """ Replaces the verbs (or non-verbs, depending on the model) of the verb category with
+        those of a list of titles, creating the missing objects. The links of the category are
+        rewritten with one delete and one bulk insert in the many-to-many through table """
+        verb_pks = self.get_or_create_verb_objects(model, titles)
+        through_model = model.verb_categories.through
+        verb_field = f"{model._meta.model_name}_id"
+        through_model.objects.filter(verbcategory=self).delete()
+        through_model.objects.bulk_create([through_model(verbcategory=self, **{verb_field: verb_pk}) for verb_pk in verb_pks])
+
+    def get_or_create_verb_objects(self, model, titles, max_attempts=3):
+        """ Returns the primary keys of the verb (or non-verb) objects of a list of titles, without
+        duplicates. Existing objects are looked up with a single query and the missing ones are
+        bulk created, ignoring the conflicts with objects created concurrently: a title created
+        concurrently is looked up, while a title whose slug was taken concurrently is created
+        again with a freshly allocated slug, up to max_attempts times """
+        titles = list(dict.fromkeys(title.lower() for title in titles))
+        verb_pks = dict(model.objects.filter(title__in=titles).values_list('title', 'pk'))
+        missing_titles = [title for title in titles if title not in verb_pks]
+        for attempt in range(max_attempts):
+            if not missing_titles:
+                break
+            new_verbs = [model(title=title) for title in missing_titles]
+            unique_slugify_batch(new_verbs, missing_titles)
+            model.objects.bulk_create(new_verbs, ignore_conflicts=True)
+            # The primary keys of bulk created rows are not set on all databases
+            verb_pks.update(model.objects.filter(title__in=missing_titles).values_list('title', 'pk'))
+            missing_titles = [title for title in missing_titles if title not in verb_pks]
+        if missing_titles:
+            raise IntegrityError(f"Could not allocate unique slugs to the {model._meta.verbose_name_plural} {', '.join(missing_titles)}")
+        return [verb_pks[title] for title in titles]
 
     def add_non_verb(self, non_verb_text):
-        """ Creates a non_verb object and attaches it to the verb category """
-        non_verb_text = non_verb_text.lower()
-
-        # Create new object if it does not exist in the db
-        if non_verb_text not in [non_verb.title for non_verb in NonVerb.objects.all()]:
-            new_non_verb = NonVerb.objects.create(title=non_verb_text)
-            new_non_verb.verb_categories.add(self)
-        # If it exists in another category, connect it with the current category
-        elif non_verb_text not in [non_verb.title for non_verb in self.non_verbs.all()]:
-            target_non_verb = NonVerb.objects.filter(title=non_verb_text).first()
-            target_non_verb.verb_categories.add(self)
-        else:
-            pass
+        """ Creates a non_verb object if it does not exist in the db and attaches it to the verb category """
+        self.non_verbs.add(*self.get_or_create_verb_objects(NonVerb, [non_verb_text]))
+        self.taxonomy.bump_version()
 
     def add_verb(self, verb_text):
-        """ Creates a verb object and attaches it to the verb category """
-        verb_text = verb_text.lower()
-        if verb_text not in [verb.title for verb in Verb.objects.all()]:
-            new_verb = Verb.objects.create(title=verb_text)
-            new_verb.verb_categories.add(self)
-        elif verb_text not in [verb.title for verb in self.verbs.all()]:
-            target_verb = Verb.objects.filter(title=verb_text).first()
-            target_verb.verb_categories.add(self)
-        else:
-            pass
+        """ Creates a verb object if it does not exist in the db and attaches it to the verb category """
+        self.verbs.add(*self.get_or_create_verb_objects(Verb, [verb_text]))
+        self.taxonomy.bump_version()
 
     def has_verb(self):
         """ Retruns true if a verb exists in the db else false """
@@ -174,5 +190,5 @@ class VerbCategory(models.Model, VerbCategoryMixin):
 
     def diagonal_verbs(self):
         """ Returns the number of verbs appearing exclusively in the category """
-        return sum(self.overlap(other) if self == other else -self.overlap(other) \
-                for other in self.taxonomy.verb_categories.all())
+        membership = self.taxonomy.get_membership()
+        return int(membership.get_diagonal_verbs()[membership.get_category_index(self)])
@@ -1,11 +1,14 @@
+from unittest import mock
+
 from django.test import TestCase
 
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from taxonomies.models import CustomUserTaxonomy as Taxonomy
+from utils.slugs import unique_slugify_batch
 from verb_categories.models import VerbCategory
-from verbs.models import Verb
+from verbs.models import Verb, NonVerb
 
 
 class VerbCategoryModelTests(TestCase):
@@ -85,3 +88,85 @@ class VerbCategoryModelTests(TestCase):
 
     def test_get_num_verbs(self):
         self.assertEqual(self.verb_cat.get_num_verbs(), 22)
+
+    def test_generate_verb_objects_reuses_existing_verbs(self):
+        verb = Verb.objects.create(title="forsee")
+        self.verb_cat.generate_verb_objects(["read", "think", "forsee", "think", "(who)"])
+        self.assertEqual(sorted(self.verb_cat.verbs.values_list('title', flat=True)), ["forsee", "read", "think"])
+        self.assertEqual(list(self.verb_cat.non_verbs.values_list('title', flat=True)), ["who"])
+        self.assertEqual(Verb.objects.filter(title="forsee").get(), verb)
+
+    def test_generate_verb_objects_removes_verbs_from_category_only(self):
+        self.verb_cat.generate_verb_objects(["read", "think"])
+        self.verb_cat.generate_verb_objects(["read"])
+        self.assertEqual(list(self.verb_cat.verbs.values_list('title', flat=True)), ["read"])
+        self.assertTrue(Verb.objects.filter(title="think").exists())
+
+    def test_generate_verb_objects_bumps_taxonomy_version(self):
+        version = self.tax.version
+        self.verb_cat.generate_verb_objects(["read", "think"])
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.version, version + 1)
+
+    def test_generate_verb_objects_num_queries(self):
+        # The number of queries does not depend on the number of verbs
+        self.verb_cat.taxonomy  # Load the taxonomy, whose version is bumped
+        for num_verbs in (10, 100):
+            cleaned_verbs = [f"verb{index}" for index in range(num_verbs)] + [f"(nonverb{index})" for index in range(num_verbs)]
+            with self.assertNumQueries(16):
+                self.verb_cat.generate_verb_objects(cleaned_verbs)
+            self.assertEqual(self.verb_cat.get_num_verbs(), num_verbs)
+            self.assertEqual(self.verb_cat.get_num_non_verbs(), num_verbs)
+        self.assertEqual(NonVerb.objects.count(), 100)
+
+    def test_get_or_create_verb_objects_slug_taken_concurrently(self):
+        def take_first_slug(instances, values):
+            # Another transaction creates a different verb with the slug allocated to the first new verb
+            unique_slugify_batch(instances, values)
+            if not Verb.objects.filter(title='concurrent').exists():
+                Verb.objects.bulk_create([Verb(title='concurrent', slug=instances[0].slug)])
+        with mock.patch('verb_categories.models.unique_slugify_batch', side_effect=take_first_slug):
+            verb_pks = self.verb_cat.get_or_create_verb_objects(Verb, ["read", "think"])
+        self.assertEqual(verb_pks, [Verb.objects.get(title=title).pk for title in ("read", "think")])
+        self.assertEqual(Verb.objects.get(title='read').slug, 'read-2')
+
+    def test_save_without_changes(self):
+        self.verb_cat.generate_verb_objects(self.verb_cat.get_cleaned_verbs())
+        self.tax.refresh_from_db()
+        version = self.tax.version
+        verb_cat = VerbCategory.objects.get(pk=self.verb_cat.pk)
+        # Slug lookup, taxonomy and update only, the verbs are not regenerated
+        with self.assertNumQueries(3):
+            verb_cat.save()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.version, version)
+        self.assertEqual(verb_cat.get_num_verbs(), 22)
+
+    def test_save_with_deferred_verb_list(self):
+        self.verb_cat.generate_verb_objects(self.verb_cat.get_cleaned_verbs())
+        self.tax.refresh_from_db()
+        version = self.tax.version
+        verb_cat = VerbCategory.objects.only('pk', 'title', 'slug', 'taxonomy').get(pk=self.verb_cat.pk)
+        verb_cat.save()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.version, version)
+        self.assertEqual(verb_cat.get_num_verbs(), 22)
+
+    def test_save_with_title_change(self):
+        version = self.tax.version
+        verb_cat = VerbCategory.objects.get(pk=self.verb_cat.pk)
+        verb_cat.title = 'Remembering'
+        verb_cat.save()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.version, version + 1)
+        self.assertEqual(verb_cat.get_num_verbs(), 0)
+
+    def test_save_with_verb_list_change(self):
+        version = self.tax.version
+        verb_cat = VerbCategory.objects.get(pk=self.verb_cat.pk)
+        verb_cat.verb_list = 'read, think, (who)'
+        verb_cat.save()
+        self.tax.refresh_from_db()
+        self.assertEqual(self.tax.version, version + 1)
+        self.assertEqual(sorted(verb_cat.verbs.values_list('title', flat=True)), ['read', 'think'])
+        self.assertEqual(list(verb_cat.non_verbs.values_list('title', flat=True)), ['who'])
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.5 on 2026-10-18 10:20
+
+from django.db import migrations
+
+
+def merge_duplicate_titles(apps, schema_editor):
+    """ Merges the verbs (and non-verbs) sharing the same title into the first one created,
+    moving the verb category links of the duplicates to it """
+    for model_name in ('Verb', 'NonVerb'):
+        model = apps.get_model('verbs', model_name)
+        through_model = model.verb_categories.through
+        verb_field = f"{model._meta.model_name}_id"
+        kept_pks = {}           # {title: pk of the first verb with the title}
+        duplicate_pks = {}      # {pk of a duplicate verb: pk of the verb it is merged into}
+        for pk, title in model.objects.order_by('pk').values_list('pk', 'title'):
+            if title in kept_pks:
+                duplicate_pks[pk] = kept_pks[title]
+            else:
+                kept_pks[title] = pk
+        if not duplicate_pks:
+            continue
+        links = set(through_model.objects.values_list(verb_field, 'verbcategory_id'))
+        merged_links = {(duplicate_pks[verb_pk], verb_category_pk) for verb_pk, verb_category_pk in links if verb_pk in duplicate_pks}
+        through_model.objects.bulk_create([through_model(**{verb_field: verb_pk, 'verbcategory_id': verb_category_pk}) for verb_pk, verb_category_pk in merged_links - links])
+        pks = list(duplicate_pks)
+        for start in range(0, len(pks), 500):
+            model.objects.filter(pk__in=pks[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verb_categories', '0005_auto_20200603_1324'),
+        ('verbs', '0005_auto_20200922_1110'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_titles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('verbs', '0006_merge_duplicate_verb_titles'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='nonverb',
+            name='title',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='verb',
+            name='title',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
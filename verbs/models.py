@@ -8,7 +8,7 @@ class Verb(models.Model):
 
     """
 
-    title = models.CharField(max_length=100)
+    title = models.CharField(max_length=100, unique=True)
     date_created = models.DateTimeField(auto_now_add=True)
     verb_categories = models.ManyToManyField('verb_categories.VerbCategory', related_name='verbs')
     slug = models.SlugField(max_length=150, blank=True, unique=True)
@@ -38,7 +38,7 @@ class NonVerb(models.Model):
     category of Blooms taxonomy.
 
     """
-    title = models.CharField(max_length=100)
+    title = models.CharField(max_length=100, unique=True)
     date_created = models.DateTimeField(auto_now_add=True)
     verb_categories = models.ManyToManyField('verb_categories.VerbCategory', related_name='non_verbs')
     slug = models.SlugField(max_length=150, blank=True, unique=True)